@@ -0,0 +1,130 @@
+import math
+
+import pandas as pd
+from dateutil import tz
+
+BAR_FIELDS = ("bid_price", "ask_price", "bid_iv", "ask_iv", "mark_iv")
+DEFAULT_RESOLUTIONS = (1, 20, 60)
+BAR_COLUMNS = tuple(f"{field}_{stat}" for field in BAR_FIELDS for stat in ("last", "min", "max"))
+# Bar columns read by `leg_frames`
+LEG_BAR_COLUMNS = ['bar_timestamp', 'expiration_timestamp', 'option_type',
+                   'bid_price_last', 'ask_price_last', 'bid_iv_last', 'ask_iv_last']
+
+
+class Bar:
+    """
+    Last/min/max of each BAR_FIELDS value within one bucket; None until a value is seen.
+    """
+    __slots__ = ("bucket", "tick_count", "values")
+
+    def __init__(self, bucket: int) -> None:
+        self.bucket: int = bucket
+        self.tick_count: int = 0
+        self.values: list = [None] * len(BAR_COLUMNS)
+
+    def update(self, fields: dict) -> None:
+        self.tick_count += 1
+        for i, field in enumerate(BAR_FIELDS):
+            value = fields.get(field)
+            if value is None or (isinstance(value, float) and math.isnan(value)):
+                continue
+            j = 3 * i
+            self.values[j] = value
+            if self.values[j + 1] is None or value < self.values[j + 1]:
+                self.values[j + 1] = value
+            if self.values[j + 2] is None or value > self.values[j + 2]:
+                self.values[j + 2] = value
+
+
+class BarAggregator:
+    """
+    Per-instrument OHLC-style bars at several resolutions, maintained from live ticks.
+    `update` returns the rows of bars closed by the tick; `close_stale` closes bars
+    of instruments that stopped ticking. Rows are in btc_options_bar column order.
+    """
+    def __init__(self, resolutions: tuple = DEFAULT_RESOLUTIONS) -> None:
+        self.resolutions: tuple = tuple(sorted(resolutions))
+        self.open_bars: dict = {}  # (instrument_name, resolution) -> Bar
+        self.instruments: dict = {}  # instrument_name -> (expiration_timestamp, option_type)
+        self.late_ticks: int = 0
+
+    def update(self, instrument_name: str, expiration_timestamp: int, option_type: str,
+               timestamp_ms: int, fields: dict) -> list:
+        self.instruments[instrument_name] = (expiration_timestamp, option_type)
+        closed = []
+        for resolution in self.resolutions:
+            bucket = timestamp_ms // (resolution * 1000)
+            key = (instrument_name, resolution)
+            bar = self.open_bars.get(key)
+            if bar is not None and bucket < bar.bucket:
+                # Out-of-order tick for a bar already closed; the finest resolution decides the count
+                if resolution == self.resolutions[0]:
+                    self.late_ticks += 1
+                continue
+            if bar is None or bucket > bar.bucket:
+                if bar is not None:
+                    closed.append(self._row(key, bar))
+                bar = self.open_bars[key] = Bar(bucket)
+            bar.update(fields)
+        return closed
+
+    def close_stale(self, now_ms: int, grace_ms: int = 2000) -> list:
+        """
+        Closes bars whose bucket ended at least `grace_ms` before `now_ms`.
+        """
+        closed = []
+        for key, bar in list(self.open_bars.items()):
+            if (bar.bucket + 1) * key[1] * 1000 + grace_ms <= now_ms:
+                closed.append(self._row(key, bar))
+                del self.open_bars[key]
+        return closed
+
+    def close_all(self) -> list:
+        closed = [self._row(key, bar) for key, bar in self.open_bars.items()]
+        self.open_bars.clear()
+        return closed
+
+    def _row(self, key: tuple, bar: Bar) -> tuple:
+        instrument_name, resolution = key
+        expiration_timestamp, option_type = self.instruments[instrument_name]
+        return (bar.bucket * resolution * 1000, resolution, instrument_name, expiration_timestamp,
+                option_type, bar.tick_count, *bar.values)
+
+
+def leg_frames(bars: pd.DataFrame, expirations: list, resolution: int = 20, local_time: bool = True):
+    """
+    (near_call, far_call, near_put, far_put) quotes of expirations[0] (near) and
+    expirations[1] (far) from `resolution`-second bars with LEG_BAR_COLUMNS, indexed by
+    the bar close and forward-filled onto the bar grid, with mid_price and mid_iv added.
+    The index is naive local time for charts, or naive UTC if not `local_time`.
+    None if no bar has a quote.
+    """
+    bars = bars[bars['ask_price_last'].notna()]
+    if bars.empty:
+        return None
+
+    # Stamped at the bar close
+    timestamps = pd.to_datetime(bars['bar_timestamp'] + resolution * 1000, unit='ms')
+    if local_time:
+        timestamps = timestamps.dt.tz_localize('UTC').dt.tz_convert(tz.tzlocal()).dt.tz_localize(None)
+    df = pd.DataFrame({
+        'timestamp': timestamps,
+        'expiration_timestamp': bars['expiration_timestamp'],
+        'option_type': bars['option_type'],
+        'bid_price': bars['bid_price_last'],
+        'ask_price': bars['ask_price_last'],
+        'bid_iv': bars['bid_iv_last'],
+        'ask_iv': bars['ask_iv_last'],
+    })
+
+    legs = []
+    for option_type in ('call', 'put'):
+        for expiration in expirations[:2]:
+            leg = (df[(df['option_type'] == option_type) & (df['expiration_timestamp'] == expiration)]
+                   .drop_duplicates('timestamp', keep='first').sort_values('timestamp')
+                   .set_index('timestamp').resample(f'{resolution}s').ffill())
+            leg['mid_price'] = (leg['bid_price'] + leg['ask_price']) / 2
+            leg['mid_iv'] = (leg['bid_iv'] + leg['ask_iv']) / 2
+            legs.append(leg)
+    near_call, far_call, near_put, far_put = legs
+    return near_call, far_call, near_put, far_put
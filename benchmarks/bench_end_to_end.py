@@ -0,0 +1,108 @@
+"""
+Benchmark: the strategy against a local Deribit stand-in (deribit_stub.py), end to end
+over a real WebSocket. Reports tick-to-order latency as seen by the exchange side,
+the strategy's tick-to-decision latency and the sustained ingest rate.
+
+    python benchmarks/bench_end_to_end.py --duration 300 --ticker-rate 20 --markprice-rate 2
+
+Orders start after the strategy's warm-up (about two minutes: strikes from the first
+skew computation, then the first margin simulation). Trading is re-enabled after every
+execution so each signal produces orders. Ticks are written to a throwaway SQLite file.
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from deribit_stub import DeribitStub
+from storage import SQLiteStorage
+from websocket_client import Strategy_RR
+
+
+# Two Friday expiries a week and about a month out, in the DDMMMYY form the strategy expects
+def default_expirations() -> list:
+    fridays = [date.today() + timedelta(days=d) for d in range(7, 60) if (date.today() + timedelta(days=d)).weekday() == 4]
+    fridays = [day for day in fridays if day.day >= 10]
+    return [fridays[0].strftime("%d%b%y").upper(), fridays[min(3, len(fridays) - 1)].strftime("%d%b%y").upper()]
+
+
+async def monitor(strategy: Strategy_RR, duration: float, results: dict) -> None:
+    started = time.monotonic()
+    executions = 0
+    while time.monotonic() - started < duration:
+        await asyncio.sleep(0.1)
+        # The strategy disables itself after executing
+        if not strategy.enabled:
+            executions += 1
+            strategy.enabled = True
+    results["executions"] = executions
+    results["client"] = strategy.pipeline_stats()
+    await strategy.websocket_client.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=float, default=300.0, help="seconds to run, including the warm-up")
+    parser.add_argument("--expirations", default=None, help="DDMMMYY dates separated by commas")
+    parser.add_argument("--way", default="SHORT", choices=["SHORT", "LONG"])
+    parser.add_argument("--ticker-rate", type=float, default=10.0)
+    parser.add_argument("--markprice-rate", type=float, default=1.0)
+    parser.add_argument("--iv-noise", type=float, default=3.0, help="wider quotes make signals more frequent")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--verbose", action="store_true", help="keep the strategy's per-tick output")
+    args = parser.parse_args()
+
+    expirations = args.expirations.split(",") if args.expirations else default_expirations()
+    stub = DeribitStub(expirations, args.ticker_rate, args.markprice_rate, iv_noise=args.iv_noise)
+    stub_loop = asyncio.new_event_loop()
+    threading.Thread(target=stub_loop.run_until_complete, args=(stub.serve("localhost", args.port, 3600),),
+                     daemon=True).start()
+    if not stub.listening.wait(10):
+        raise SystemExit(f"The stub did not start on port {args.port}")
+
+    results: dict = {}
+    with tempfile.TemporaryDirectory() as root:
+        storage = SQLiteStorage(os.path.join(root, "bench.db"))
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        strategy = Strategy_RR(f"ws://localhost:{args.port}/ws/api/v2", "stub", private_key,
+                               bot_token=None, chat_id=None, storage=storage, autostart=False)
+        strategy.set_expiration_dates(expirations, [], args.way, True)
+        strategy.loop.create_task(monitor(strategy, args.duration, results))
+
+        output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+        with output:
+            strategy.prepare()
+            try:
+                strategy.run()
+            except SystemExit:
+                pass  # ws_manager exits once the connection is closed
+            pending = asyncio.all_tasks(strategy.loop)
+            for task in pending:
+                task.cancel()
+            strategy.loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+
+    exchange = stub.stats()
+    client = results["client"]
+    market = client["market"]
+    print(f"expirations           {','.join(expirations)}")
+    print(f"frames sent           {exchange['frames_total']} ({exchange['frames_total'] / args.duration:,.0f}/s)")
+    print(f"market frames handled {market['processed']} (dropped {market['dropped']}, max depth {market['max_depth']})")
+    print(f"rows written          {client['db_writer']['rows_total']} (failed {client['db_writer']['failed_rows']})")
+    print(f"executions            {results['executions']} ({exchange['orders']} orders)")
+    print(f"tick-to-order         p50 {exchange['tick_to_order_p50']}  p99 {exchange['tick_to_order_p99']}  "
+          f"max {exchange['tick_to_order_max']}")
+    print(f"tick-to-decision      p50 {client['signal_latency']['p50']}  p99 {client['signal_latency']['p99']}")
+    print(f"market processing     p50 {market['processing_p50']}  p99 {market['processing_p99']}")
+
+
+if __name__ == "__main__":
+    main()
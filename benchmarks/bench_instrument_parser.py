@@ -0,0 +1,68 @@
+"""
+Micro-benchmark: cost of parsing the instrument names of one
+`markprice.options.btc_usd` payload, uncached vs. InstrumentNameCache.
+
+    python benchmarks/bench_instrument_parser.py
+"""
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from instrument_cache import InstrumentNameCache, parse_instrument_name
+
+
+# Roughly the shape of the BTC chain: ~12 expiries x ~35 strikes x call/put
+def make_instrument_names(n_expiries: int = 12, n_strikes: int = 35) -> list:
+    first_expiry = datetime(2025, 3, 28)
+    names = []
+    for i in range(n_expiries):
+        date_str = (first_expiry + timedelta(days=7 * i)).strftime("%d%b%y").upper()
+        for k in range(n_strikes):
+            strike = 50000 + 2000 * k
+            names.append(f"BTC-{date_str}-{strike}-C")
+            names.append(f"BTC-{date_str}-{strike}-P")
+    return names
+
+
+def main(repeat: int = 200) -> None:
+    names = make_instrument_names()
+    tracked_dates = {names[0].split('-')[1], names[-1].split('-')[1]}
+
+    def uncached():
+        for name in names:
+            parse_instrument_name(name)
+
+    cache = InstrumentNameCache()
+    tracked_cache = InstrumentNameCache(tracked_dates=tracked_dates)
+
+    def cached():
+        for name in names:
+            cache.get(name)
+
+    def cached_tracked():
+        for name in names:
+            tracked_cache.get(name)
+
+    print(f"payload size: {len(names)} instruments, {len(tracked_dates)} tracked expiries")
+    for label, fn in (("uncached regex + strptime", uncached),
+                      ("LRU cache", cached),
+                      ("LRU cache + untracked rejection", cached_tracked)):
+        fn()  # warm the caches, as in steady state
+        per_payload = min(timeit.repeat(fn, number=1, repeat=repeat))
+        print(f"{label:<34} {per_payload * 1e6:10.1f} us/payload")
+
+    # First payload after start-up or a cache clear: only tracked names pay for a full parse
+    def cold_tracked():
+        fresh = InstrumentNameCache(tracked_dates=tracked_dates)
+        for name in names:
+            fresh.get(name)
+
+    per_payload = min(timeit.repeat(cold_tracked, number=1, repeat=repeat))
+    print(f"{'cold cache + untracked rejection':<34} {per_payload * 1e6:10.1f} us/payload")
+
+
+if __name__ == "__main__":
+    main()
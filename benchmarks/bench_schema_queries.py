@@ -0,0 +1,220 @@
+"""
+Query benchmark: the original (unindexed) schema vs. create_tables.sql, on a
+synthetic multi-million-row dataset in scratch databases.
+
+    python benchmarks/bench_schema_queries.py --rows 2000000
+
+Needs a MySQL server; creates and drops `btc_bench_old` and `btc_bench_new`.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import mysql.connector
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from manage_partitions import ensure_daily_partitions
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+OLD_SCHEMA = """
+CREATE TABLE btc_iv_spd_skewness (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    timestamp BIGINT NOT NULL,
+    expiration_timestamp INT NOT NULL,
+    atm_slope FLOAT
+);
+CREATE TABLE btc_options_raw (
+    timestamp BIGINT NOT NULL,
+    instrument_name VARCHAR(50) NOT NULL,
+    expiration_timestamp BIGINT NOT NULL,
+    option_type ENUM('call', 'put') NOT NULL,
+    bid_price FLOAT,
+    ask_price FLOAT,
+    bid_iv FLOAT,
+    ask_iv FLOAT,
+    underlying_price FLOAT,
+    strike_price FLOAT,
+    log_moneyness FLOAT,
+    delta FLOAT,
+    vega FLOAT,
+    theta FLOAT
+);
+CREATE TABLE btc_options_tick (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    timestamp BIGINT NOT NULL,
+    instrument_name VARCHAR(50) NOT NULL,
+    underlying_price FLOAT,
+    strike_price FLOAT,
+    mid_price FLOAT,
+    mark_iv FLOAT,
+    expiration_timestamp BIGINT NOT NULL,
+    option_type ENUM('call', 'put') NOT NULL,
+    log_moneyness FLOAT,
+    collected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+# The read paths of websocket_client.py, the chart scripts and get_spd_pdf_log.py
+QUERIES = {
+    "fetch_data (raw, last 12h)": """
+        SELECT timestamp, expiration_timestamp, option_type, bid_price, ask_price, bid_iv, ask_iv, log_moneyness, delta, theta
+        FROM btc_options_raw
+        WHERE timestamp >= UNIX_TIMESTAMP(NOW() - INTERVAL 0.5 DAY) * 1000
+        ORDER BY timestamp DESC
+    """,
+    "curve fallback (tick, expiry, 1d)": """
+        SELECT timestamp, strike_price, mark_iv, option_type, underlying_price
+        FROM btc_options_tick
+        WHERE expiration_timestamp = %(expiration)s
+        AND timestamp >= UNIX_TIMESTAMP(NOW() - INTERVAL 1 DAY) * 1000
+        ORDER BY timestamp DESC
+    """,
+    "fetch_spd_data (tick, expiry, window)": """
+        SELECT strike_price, mark_iv, option_type, underlying_price
+        FROM btc_options_tick
+        WHERE (%(at)s - 86400000) <= timestamp AND timestamp <= %(at)s AND expiration_timestamp = %(expiration)s
+        ORDER BY timestamp DESC
+    """,
+    "fetch_spd_skewness (skew, last 12h)": """
+        SELECT timestamp, expiration_timestamp, atm_slope
+        FROM btc_iv_spd_skewness
+        WHERE timestamp >= UNIX_TIMESTAMP(NOW() - INTERVAL 0.5 DAY) * 1000
+        ORDER BY timestamp DESC
+    """,
+}
+
+
+def execute_script(cursor, script: str) -> None:
+    for statement in script.split(";"):
+        lines = [line for line in statement.splitlines() if not line.strip().startswith("--")]
+        if "".join(lines).strip():
+            cursor.execute("\n".join(lines))
+
+
+def make_rows(n_rows: int, days: int, n_expiries: int = 8, n_strikes: int = 40, seed: int = 0) -> dict:
+    """
+    Synthetic ticks spread uniformly over the last `days` days, `n_expiries` weekly expiries.
+    """
+    rng = np.random.default_rng(seed)
+    now_ms = int(time.time() * 1000)
+    timestamps = np.sort(rng.integers(now_ms - days * 86400000, now_ms, n_rows))
+    first_expiry = int(time.time()) // 86400 * 86400 + 8 * 3600
+    expirations = first_expiry + 7 * 86400 * rng.integers(0, n_expiries, n_rows)
+    strikes = 50000.0 + 2000.0 * rng.integers(0, n_strikes, n_rows)
+    option_types = np.where(rng.random(n_rows) < 0.5, "call", "put")
+    return {
+        "timestamps": timestamps,
+        "expirations": expirations,
+        "strikes": strikes,
+        "option_types": option_types,
+        "underlying": 90000.0 + rng.normal(0, 500, n_rows),
+        "iv": 50.0 + rng.normal(0, 5, n_rows),
+        "first_expiry": first_expiry,
+    }
+
+
+def load(conn, data: dict, chunk: int = 20000) -> None:
+    cursor = conn.cursor()
+    n_rows = len(data["timestamps"])
+    for start in range(0, n_rows, chunk):
+        end = min(start + chunk, n_rows)
+        raw, tick = [], []
+        for i in range(start, end):
+            ts, exp = int(data["timestamps"][i]), int(data["expirations"][i])
+            strike, option_type = float(data["strikes"][i]), str(data["option_types"][i])
+            name = f"BTC-{datetime.fromtimestamp(exp, tz=timezone.utc):%d%b%y}-{int(strike)}-{option_type[0].upper()}"
+            iv, underlying = float(data["iv"][i]), float(data["underlying"][i])
+            raw.append((ts, name, exp, option_type, 0.01, 0.012, iv - 0.5, iv + 0.5,
+                        underlying, strike, 0.0, 0.5, 10.0, -5.0))
+            tick.append((ts, name, underlying, strike, 0.011, iv, exp, option_type, 0.0))
+        cursor.executemany("""
+            INSERT INTO btc_options_raw (timestamp, instrument_name, expiration_timestamp, option_type, bid_price, ask_price,
+                                         bid_iv, ask_iv, underlying_price, strike_price, log_moneyness, delta, vega, theta)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, raw)
+        cursor.executemany("""
+            INSERT INTO btc_options_tick (timestamp, instrument_name, underlying_price, strike_price, mid_price, mark_iv,
+                                          expiration_timestamp, option_type, log_moneyness)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, tick)
+        conn.commit()
+
+    # One skew row per expiry every 20 seconds
+    skew_times = np.arange(int(data["timestamps"][0]), int(data["timestamps"][-1]), 20000)
+    expiries = np.unique(data["expirations"])
+    skew_rows = [(int(ts), int(exp), 0.1) for ts in skew_times for exp in expiries]
+    for start in range(0, len(skew_rows), chunk):
+        cursor.executemany(
+            "INSERT IGNORE INTO btc_iv_spd_skewness (timestamp, expiration_timestamp, atm_slope) VALUES (%s, %s, %s)",
+            skew_rows[start:start + chunk])
+        conn.commit()
+    cursor.close()
+
+
+def time_query(cursor, sql: str, params: dict, repeat: int) -> tuple:
+    best, n_rows = float("inf"), 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cursor.execute(sql, params)
+        n_rows = len(cursor.fetchall())
+        best = min(best, time.perf_counter() - start)
+    return best, n_rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default="1234")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch databases")
+    args = parser.parse_args()
+
+    data = make_rows(args.rows, args.days)
+    params = {
+        "expiration": data["first_expiry"] + 7 * 86400,
+        "at": int(data["timestamps"][-1]) - 3 * 86400000,
+    }
+    with open(os.path.join(ROOT, "create_tables.sql")) as f:
+        new_schema = f.read()
+
+    results = {}
+    for database, schema in (("btc_bench_old", OLD_SCHEMA), ("btc_bench_new", new_schema)):
+        conn = mysql.connector.connect(host=args.host, user=args.user, password=args.password)
+        cursor = conn.cursor()
+        cursor.execute(f"DROP DATABASE IF EXISTS {database}")
+        cursor.execute(f"CREATE DATABASE {database}")
+        cursor.execute(f"USE {database}")
+        execute_script(cursor, schema)
+        if database == "btc_bench_new":
+            today = datetime.now(timezone.utc).date()
+            for table in ("btc_options_raw", "btc_options_tick"):
+                ensure_daily_partitions(cursor, table, today - timedelta(days=args.days + 1), today + timedelta(days=1))
+
+        start = time.perf_counter()
+        load(conn, data)
+        print(f"{database}: loaded {args.rows} rows per tick table in {time.perf_counter() - start:.1f}s")
+
+        for label, sql in QUERIES.items():
+            results[(database, label)] = time_query(cursor, sql, params, args.repeat)
+
+        if not args.keep:
+            cursor.execute(f"DROP DATABASE {database}")
+        conn.close()
+
+    print(f"\n{'query':<40} {'rows':>8} {'old (ms)':>10} {'new (ms)':>10} {'speedup':>8}")
+    for label in QUERIES:
+        old_time, n_rows = results[("btc_bench_old", label)]
+        new_time, _ = results[("btc_bench_new", label)]
+        print(f"{label:<40} {n_rows:>8} {old_time * 1e3:>10.1f} {new_time * 1e3:>10.1f} {old_time / new_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark: append rate and time-range scan speed of the storage backends
+(memmap, SQLite and optionally MySQL), using the batch size of the live writer.
+
+    python benchmarks/bench_tick_store.py --rows 1000000
+    python benchmarks/bench_tick_store.py --rows 1000000 --mysql   # also MySQL, in a scratch database
+
+The MySQL run creates and drops `btc_bench_store`.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import TICK_TABLE, MySQLStorage, SQLiteStorage
+from tick_store import MemmapTickStore
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COLUMNS = ['timestamp', 'strike_price', 'mark_iv', 'option_type', 'underlying_price']
+
+
+# markprice-like rows: one payload of `n_strikes` rows per expiry every `interval_ms`
+def make_rows(n_rows: int, n_expiries: int = 4, n_strikes: int = 40, interval_ms: int = 5000, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    start_ms = int(time.time() * 1000) - n_rows // (n_expiries * n_strikes) * interval_ms
+    expiries = [int(time.time()) // 86400 * 86400 + 8 * 3600 + 7 * 86400 * (i + 1) for i in range(n_expiries)]
+    rows = []
+    for i in range(n_rows):
+        payload, position = divmod(i, n_expiries * n_strikes)
+        expiry, strike = divmod(position, n_strikes)
+        option_type = "call" if strike % 2 else "put"
+        rows.append((start_ms + payload * interval_ms, f"BTC-X-{50000 + 2000 * strike}-{option_type[0].upper()}",
+                     90000.0 + rng.normal(0, 100), 50000.0 + 2000 * strike, 0.01, 50.0 + rng.normal(0, 2),
+                     expiries[expiry], option_type, 0.0))
+    return rows
+
+
+def bench(label: str, storage, rows: list, batch_size: int, scans: int) -> None:
+    started = time.perf_counter()
+    for i in range(0, len(rows), batch_size):
+        storage.insert(TICK_TABLE, rows[i:i + batch_size])
+        storage.commit()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<8} append: {len(rows) / elapsed:12,.0f} rows/s")
+
+    end_ms = rows[-1][0] + 1
+    expiry = rows[0][6]
+    for hours in (1, 6, 24):
+        start_ms = end_ms - hours * 3600 * 1000
+        best, n_rows = float("inf"), 0
+        for _ in range(scans):
+            started = time.perf_counter()
+            n_rows = len(storage.query_range(TICK_TABLE, COLUMNS, start_ms, end_ms, expirations=[expiry]))
+            best = min(best, time.perf_counter() - started)
+        print(f"{label:<8} scan {hours:>2}h of one expiry: {best * 1e3:9.1f} ms ({n_rows} rows)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--scans", type=int, default=5)
+    parser.add_argument("--mysql", action="store_true")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default="1234")
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+
+    with tempfile.TemporaryDirectory() as root:
+        store = MemmapTickStore(os.path.join(root, "memmap"))
+        bench("memmap", store, rows, args.batch_size, args.scans)
+        store.close()
+
+        store = SQLiteStorage(os.path.join(root, "ticks.db"))
+        bench("sqlite", store, rows, args.batch_size, args.scans)
+        store.close()
+
+    if args.mysql:
+        import mysql.connector
+        conn = mysql.connector.connect(host=args.host, user=args.user, password=args.password)
+        cursor = conn.cursor()
+        cursor.execute("DROP DATABASE IF EXISTS btc_bench_store")
+        cursor.execute("CREATE DATABASE btc_bench_store")
+        cursor.execute("USE btc_bench_store")
+        with open(os.path.join(ROOT, "create_tables.sql")) as f:
+            for statement in f.read().split(";"):
+                lines = [line for line in statement.splitlines() if not line.strip().startswith("--")]
+                if "".join(lines).strip():
+                    cursor.execute("\n".join(lines))
+        store = MySQLStorage(host=args.host, user=args.user, password=args.password, database="btc_bench_store")
+        bench("mysql", store, rows, args.batch_size, args.scans)
+        store.close()
+        cursor.execute("DROP DATABASE btc_bench_store")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+Benchmark suite for the ingest and analytics hot paths, on synthetic data:
+
+    ingest              frames through parse, dispatch, bar rollup and the batched writer (replay.py)
+    skewness_live       Strategy_RR.update_skewness from the live IV curves
+    skewness_cold       the same with empty curves, reading btc_options_tick
+    fetch_data          the 12 hours of 20s bars behind the spread history
+    seed_spread_history fetch_data plus merging the four legs into the spread history
+    compute_spd         spd.compute_spd on one chain snapshot
+    compute_spd_batch   spd.compute_spd_batch over many (timestamp, expiry) snapshots
+
+Each stage reports p50/p99/mean latency in milliseconds and its throughput. Results are
+written as JSON with the commit they were measured on; --compare prints the change
+against an earlier result file.
+
+    python benchmarks/run_benchmarks.py --strikes 60 --history-hours 12
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/<earlier>.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import synthetic
+from clock import SimulatedClock
+from iv_curves import ExpiryCurve
+from replay import ReplayStrategy, replay
+from spd import compute_spd, compute_spd_batch
+from storage import BAR_TABLE, TICK_TABLE, open_storage
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+
+def summarize(durations: list, items_per_run: int = 1) -> dict:
+    durations = np.asarray(durations)
+    return {
+        "runs": len(durations),
+        "items_per_run": items_per_run,
+        "p50_ms": float(np.percentile(durations, 50) * 1e3),
+        "p99_ms": float(np.percentile(durations, 99) * 1e3),
+        "mean_ms": float(durations.mean() * 1e3),
+        "throughput_per_sec": float(items_per_run / durations.mean()),
+    }
+
+
+def time_calls(function, repeat: int, warmup: int = 1) -> list:
+    for _ in range(warmup):
+        function()
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+def make_strategy(storage, dates: list, now: datetime) -> ReplayStrategy:
+    strategy = ReplayStrategy(storage, SimulatedClock(now.timestamp()))
+    strategy.set_expiration_dates(dates, [], "SHORT", False)
+    strategy.prepare()
+    return strategy
+
+
+async def flush_writer(writer) -> None:
+    # Writes the rows the stages queued, as the runner does on shutdown
+    task = asyncio.ensure_future(writer.run())
+    await writer.drain()
+    task.cancel()
+
+
+def bench_ingest(args, dates: list, now: datetime, storage_url: str) -> dict:
+    frames = synthetic.frame_stream(dates, args.strikes, args.ingest_seconds, args.tick_rate, args.markprice_rate,
+                                    start=now, seed=args.seed)
+    storage = open_storage(storage_url)
+    strategy = make_strategy(storage, dates, now)
+    result = strategy.loop.run_until_complete(replay(strategy, frames))
+    storage.close()
+    processing = strategy.market_queue.processing_latency
+    # Per-frame times are histogram bucket bounds; the throughput covers storage as well
+    return {
+        "runs": result["frames"],
+        "items_per_run": 1,
+        "p50_ms": processing.quantile(0.5) * 1e3,
+        "p99_ms": processing.quantile(0.99) * 1e3,
+        "mean_ms": processing.mean() * 1e3,
+        "throughput_per_sec": result["messages_per_sec"],
+        "rows_written": result["rows_written"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--expiries", type=int, default=4, help="expiries in the chain; the first two are traded")
+    parser.add_argument("--strikes", type=int, default=40, help="strikes per expiry")
+    parser.add_argument("--tick-rate", type=float, default=10.0, help="ticker frames per second per channel")
+    parser.add_argument("--markprice-rate", type=float, default=1.0, help="markprice payloads per second")
+    parser.add_argument("--ingest-seconds", type=float, default=120.0, help="seconds of market data to ingest")
+    parser.add_argument("--history-hours", type=float, default=12.0, help="hours of stored ticks and bars")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--storage", default=None, help="storage URL prefix, e.g. memmap:// (default: SQLite files)")
+    parser.add_argument("--stages", nargs="+", default=None, help="run only these stages")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="result file (default: benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--compare", default=None, help="earlier result file to compare against")
+    args = parser.parse_args()
+
+    now = datetime.now().replace(microsecond=0)
+    dates = synthetic.expiry_dates(args.expiries, now)
+    end_ms = int(now.timestamp() * 1000)
+    stages: dict = {}
+
+    def wanted(stage: str) -> bool:
+        return args.stages is None or stage in args.stages
+
+    with tempfile.TemporaryDirectory() as scratch, contextlib.redirect_stdout(open(os.devnull, "w")):
+        def storage_url(name: str) -> str:
+            if args.storage:
+                return f"{args.storage.rstrip('/')}/{name}" if args.storage.startswith("memmap") else args.storage
+            return f"sqlite://{os.path.join(scratch, name + '.db')}"
+
+        if wanted("ingest"):
+            stages["ingest"] = bench_ingest(args, dates, now, storage_url("ingest"))
+
+        storage = open_storage(storage_url("history"))
+        for table, rows in ((TICK_TABLE, synthetic.curve_rows(dates, args.strikes, min(args.history_hours, 24), end_ms,
+                                                              seed=args.seed)),
+                            (BAR_TABLE, synthetic.bar_rows(dates[:2], args.strikes, args.history_hours, end_ms,
+                                                           seed=args.seed))):
+            for i in range(0, len(rows), 5000):
+                storage.insert(table, rows[i:i + 5000])
+                storage.commit()
+        strategy = make_strategy(storage, dates, now)
+        run = strategy.loop.run_until_complete
+
+        if wanted("skewness_live"):
+            payload = synthetic.markprice_payload(dates, synthetic.strike_grid(90000.0, args.strikes), 90000.0, end_ms,
+                                                  np.random.default_rng(args.seed))
+            for element in payload:
+                _, date, strike, letter = element["instrument_name"].split("-")
+                option_type = "call" if letter == "C" else "put"
+                if (option_type == "call") == (float(strike) >= 90000.0):
+                    strategy.iv_curves[synthetic.expiration_timestamp(date)].update(
+                        float(strike), option_type, element["iv"], 90000.0, element["timestamp"])
+            stages["skewness_live"] = summarize(time_calls(lambda: run(strategy.update_skewness()), args.repeat),
+                                                len(dates))
+
+        if wanted("skewness_cold"):
+            live_curves = strategy.iv_curves
+
+            def cold():
+                strategy.iv_curves = {exp_ts: ExpiryCurve() for exp_ts in strategy.selected_expirations}
+                run(strategy.update_skewness())
+            stages["skewness_cold"] = summarize(time_calls(cold, max(1, args.repeat // 10)), len(dates))
+            strategy.iv_curves = live_curves
+
+        if wanted("fetch_data"):
+            stages["fetch_data"] = summarize(time_calls(lambda: run(strategy.fetch_data()), max(1, args.repeat // 5)))
+
+        if wanted("seed_spread_history"):
+            stages["seed_spread_history"] = summarize(time_calls(lambda: run(strategy.seed_spread_history()),
+                                                                 max(1, args.repeat // 5)))
+
+        if wanted("compute_spd"):
+            df = synthetic.spd_frame(args.strikes, seed=args.seed)
+            stages["compute_spd"] = summarize(time_calls(lambda: compute_spd(df, 90000.0, 0.1), args.repeat))
+
+        if wanted("compute_spd_batch"):
+            # One snapshot per minute of the last two hours, for every expiry
+            ticks = pd.DataFrame(synthetic.curve_rows(dates, args.strikes, 2, end_ms, interval_seconds=60,
+                                                      seed=args.seed),
+                                 columns=["timestamp", "instrument_name", "underlying_price", "strike_price",
+                                          "mid_price", "mark_iv", "expiration_timestamp", "option_type",
+                                          "log_moneyness"])
+            pairs = [(int(timestamp), int(exp_ts)) for timestamp in ticks["timestamp"].unique()
+                     for exp_ts in ticks["expiration_timestamp"].unique()]
+            stages["compute_spd_batch"] = summarize(
+                time_calls(lambda: compute_spd_batch(ticks, pairs), max(1, args.repeat // 10)), len(pairs))
+
+        run(flush_writer(strategy.db_writer))
+        storage.close()
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True).stdout.strip() or "unknown"
+    except OSError:
+        commit = "unknown"
+    result = {"commit": commit, "time": now.isoformat(), "params": vars(args), "stages": stages}
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{now:%Y%m%d-%H%M%S}-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)["stages"]
+
+    print(f"{'stage':<20}{'p50 ms':>10}{'p99 ms':>10}{'mean ms':>10}{'per sec':>12}")
+    for name, stage in stages.items():
+        line = (f"{name:<20}{stage['p50_ms']:>10.3f}{stage['p99_ms']:>10.3f}{stage['mean_ms']:>10.3f}"
+                f"{stage['throughput_per_sec']:>12,.1f}")
+        if previous and name in previous:
+            line += f"   p50 {(stage['p50_ms'] / previous[name]['p50_ms'] - 1) * 100:+.1f}%"
+        print(line)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
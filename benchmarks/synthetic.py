@@ -0,0 +1,197 @@
+"""
+Synthetic market data for the benchmarks: option chains, WebSocket frames in the
+shape Deribit sends them, and stored tick/bar history. Everything is seeded, so the
+same arguments give the same data.
+"""
+import json
+import math
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from bar_rollup import BAR_FIELDS
+
+YEAR_SECONDS = 365 * 24 * 60 * 60
+
+
+# Weekly expiries from a week after `start`, in the DDMMMYY form the strategy expects
+def expiry_dates(n_expiries: int, start: datetime) -> list:
+    first = start + timedelta(days=7 + (4 - start.weekday()) % 7)
+    return [(first + timedelta(days=7 * i)).strftime("%d%b%y").upper() for i in range(n_expiries)]
+
+
+def expiration_timestamp(date_str: str) -> int:
+    return int(datetime.strptime(date_str, "%d%b%y").timestamp())
+
+
+def strike_grid(underlying_price: float, n_strikes: int, step: int = 1000) -> np.ndarray:
+    center = round(underlying_price / step) * step
+    return center + step * (np.arange(n_strikes) - n_strikes // 2)
+
+
+# Upward-sloping BTC-like smile, as a fraction
+def smile(log_moneyness, years: float):
+    return 0.5 + 0.1 * math.sqrt(years) * log_moneyness + 0.6 * np.square(log_moneyness)
+
+
+def mark_price(underlying_price: float, strike, option_type: str):
+    # Intrinsic value plus a flat time value, in BTC; only needs to be positive and plausible
+    intrinsic = np.maximum(underlying_price - strike, 0) if option_type == "call" else np.maximum(strike - underlying_price, 0)
+    return intrinsic / underlying_price + 0.005
+
+
+def underlying_path(n_steps: int, underlying_price: float, step_seconds: float, rng) -> np.ndarray:
+    returns = rng.normal(0.0, 0.6 * math.sqrt(step_seconds / YEAR_SECONDS), n_steps)
+    return underlying_price * np.exp(np.cumsum(returns))
+
+
+def markprice_payload(dates: list, strikes: np.ndarray, underlying_price: float, timestamp_ms: int, rng) -> list:
+    """
+    One `markprice.options.btc_usd` payload: calls and puts of every strike of every expiry.
+    """
+    payload = []
+    for date in dates:
+        years = max(expiration_timestamp(date) - timestamp_ms / 1000, 86400) / YEAR_SECONDS
+        ivs = smile(np.log(strikes / underlying_price), years) + rng.normal(0.0, 0.002, len(strikes))
+        for option_type, letter in (("call", "C"), ("put", "P")):
+            prices = mark_price(underlying_price, strikes, option_type)
+            payload.extend({"instrument_name": f"BTC-{date}-{int(strike)}-{letter}", "timestamp": timestamp_ms,
+                            "mark_price": float(price), "iv": float(iv)}
+                           for strike, price, iv in zip(strikes, prices, ivs))
+    return payload
+
+
+def leg_strikes(strikes: np.ndarray, underlying_price: float) -> tuple:
+    # The OTM call/put pair update_subscribe picks
+    call = int(min(strikes, key=lambda x: abs(x - underlying_price * np.exp(0.1))))
+    put = int(min(strikes, key=lambda x: abs(x - underlying_price ** 2 / call)))
+    return call, put
+
+
+def option_ticker(date: str, strike: int, letter: str, underlying_price: float, timestamp_ms: int, rng) -> dict:
+    years = max(expiration_timestamp(date) - timestamp_ms / 1000, 86400) / YEAR_SECONDS
+    iv = float(smile(math.log(strike / underlying_price), years)) * 100 + rng.normal(0.0, 1.0)
+    price = float(mark_price(underlying_price, strike, "call" if letter == "C" else "put"))
+    return {
+        "instrument_name": f"BTC-{date}-{strike}-{letter}", "timestamp": timestamp_ms,
+        "best_bid_price": round(price - 0.0005, 4), "best_ask_price": round(price + 0.0005, 4),
+        "bid_iv": iv - 1.0, "ask_iv": iv + 1.0, "mark_iv": iv, "mark_price": price,
+        "underlying_price": underlying_price,
+        "greeks": {"delta": 0.25 if letter == "C" else -0.25, "vega": 50.0, "theta": -40.0, "gamma": 0.0, "rho": 0.0},
+    }
+
+
+def frame_stream(dates: list, n_strikes: int, seconds: float, tick_rate: float = 10.0, markprice_rate: float = 1.0,
+                 underlying_price: float = 90000.0, start: datetime = None, seed: int = 0) -> list:
+    """
+    (received_at, frame) pairs as a live session journals them: the acknowledgement of
+    the four leg subscriptions, then futures and leg tickers at `tick_rate` per channel,
+    the whole chain at `markprice_rate` and a heartbeat every 10 seconds.
+    """
+    rng = np.random.default_rng(seed)
+    start = start or datetime.now()
+    t0 = start.timestamp()
+    strikes = strike_grid(underlying_price, n_strikes)
+    call, put = leg_strikes(strikes, underlying_price)
+    legs = [(date, strike, letter) for date in dates[:2] for strike, letter in ((call, "C"), (put, "P"))]
+
+    frames = [(t0, json.dumps({"jsonrpc": "2.0", "id": 1, "testnet": False,
+                               "result": [f"ticker.BTC-{d}-{k}-{c}.100ms" for d, k, c in legs]}))]
+    n_ticks = int(seconds * tick_rate)
+    prices = underlying_path(n_ticks, underlying_price, 1.0 / tick_rate, rng)
+    markprice_every = max(1, int(tick_rate / markprice_rate))
+    heartbeat_every = max(1, int(tick_rate * 10))
+
+    def subscription(channel: str, data) -> str:
+        return json.dumps({"jsonrpc": "2.0", "method": "subscription", "params": {"channel": channel, "data": data}})
+
+    for i in range(n_ticks):
+        received_at = t0 + (i + 1) / tick_rate
+        timestamp_ms = int(received_at * 1000)
+        price = float(prices[i])
+        for date in dates:
+            frames.append((received_at, subscription(f"ticker.BTC-{date}.100ms", {
+                "instrument_name": f"BTC-{date}", "timestamp": timestamp_ms, "mark_price": price})))
+        for date, strike, letter in legs:
+            frames.append((received_at, subscription(f"ticker.BTC-{date}-{strike}-{letter}.100ms",
+                                                     option_ticker(date, strike, letter, price, timestamp_ms, rng))))
+        if i % markprice_every == 0:
+            frames.append((received_at, subscription("markprice.options.btc_usd",
+                                                     markprice_payload(dates, strikes, price, timestamp_ms, rng))))
+        if i % heartbeat_every == 0:
+            frames.append((received_at, json.dumps({"jsonrpc": "2.0", "method": "heartbeat",
+                                                    "params": {"type": "test_request"}})))
+    return frames
+
+
+def curve_rows(dates: list, n_strikes: int, hours: float, end_ms: int, interval_seconds: float = 5.0,
+               underlying_price: float = 90000.0, seed: int = 0) -> list:
+    """
+    btc_options_tick rows: the OTM half of the chain every `interval_seconds` over `hours` up to `end_ms`.
+    """
+    rng = np.random.default_rng(seed)
+    strikes = strike_grid(underlying_price, n_strikes)
+    n_steps = int(hours * 3600 / interval_seconds)
+    prices = underlying_path(n_steps, underlying_price, interval_seconds, rng)
+    rows = []
+    for i in range(n_steps):
+        timestamp_ms = end_ms - int((n_steps - i) * interval_seconds * 1000)
+        price = float(prices[i])
+        for element in markprice_payload(dates, strikes, price, timestamp_ms, rng):
+            _, date, strike, letter = element["instrument_name"].split("-")
+            strike, option_type = float(strike), "call" if letter == "C" else "put"
+            if (option_type == "call") != (strike >= price):
+                continue
+            rows.append((timestamp_ms, element["instrument_name"], price, strike, element["mark_price"],
+                         element["iv"], expiration_timestamp(date), option_type, math.log(strike / price)))
+    return rows
+
+
+def bar_rows(dates: list, n_strikes: int, hours: float, end_ms: int, resolution: int = 20,
+             underlying_price: float = 90000.0, seed: int = 0) -> list:
+    """
+    btc_options_bar rows at `resolution` seconds over `hours` up to `end_ms`, as the runner writes them:
+    quotes for the four leg instruments, mark IV only for the rest of the chain.
+    """
+    rng = np.random.default_rng(seed)
+    strikes = strike_grid(underlying_price, n_strikes)
+    legs = {(int(strike), option_type)
+            for strike, option_type in zip(leg_strikes(strikes, underlying_price), ("call", "put"))}
+    n_bars = int(hours * 3600 / resolution)
+    first_bar = (end_ms // (resolution * 1000) - n_bars) * resolution * 1000
+    rows = []
+    for date in dates:
+        exp_ts = expiration_timestamp(date)
+        for strike in strikes:
+            for option_type, letter in (("call", "C"), ("put", "P")):
+                price = float(mark_price(underlying_price, strike, option_type))
+                iv = float(smile(math.log(strike / underlying_price), 0.1)) * 100
+                bids = price - 0.0005 + rng.normal(0.0, 0.0002, n_bars)
+                bid_ivs = iv - 1.0 + rng.normal(0.0, 0.5, n_bars)
+                quoted = (int(strike), option_type) in legs
+                for j in range(n_bars):
+                    values = {"bid_price": bids[j], "ask_price": bids[j] + 0.001, "bid_iv": bid_ivs[j],
+                              "ask_iv": bid_ivs[j] + 2.0, "mark_iv": bid_ivs[j] + 1.0}
+                    if not quoted:
+                        values = {field: (values[field] if field == "mark_iv" else None) for field in values}
+                    rows.append((first_bar + j * resolution * 1000, resolution, f"BTC-{date}-{int(strike)}-{letter}",
+                                 exp_ts, option_type, 10,
+                                 *[values[field] and float(values[field]) for field in BAR_FIELDS for _ in range(3)]))
+    return rows
+
+
+def spd_frame(n_strikes: int, snapshots: int = 5, underlying_price: float = 90000.0, years: float = 0.1,
+              seed: int = 0) -> pd.DataFrame:
+    """
+    Input of spd.compute_spd: `snapshots` copies of the OTM chain, newest first.
+    """
+    rng = np.random.default_rng(seed)
+    strikes = strike_grid(underlying_price, n_strikes)
+    frames = []
+    for _ in range(snapshots):
+        ivs = smile(np.log(strikes / underlying_price), years) * 100 + rng.normal(0.0, 0.2, len(strikes))
+        option_type = np.where(strikes >= underlying_price, "call", "put")
+        frames.append(pd.DataFrame({"strike_price": strikes.astype(float), "mark_iv": ivs,
+                                    "option_type": option_type, "underlying_price": underlying_price}))
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,60 @@
+import asyncio
+import heapq
+import itertools
+import time
+from datetime import datetime
+
+
+class Clock:
+    """
+    Wall clock used by the live runner. The strategy reads time and sleeps through
+    a clock so a replay can run it on recorded time instead.
+    """
+    def time(self) -> float:
+        return time.time()
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    def now(self) -> datetime:
+        return datetime.fromtimestamp(self.time())
+
+    async def sleep(self, seconds: float) -> None:
+        await asyncio.sleep(seconds)
+
+
+class SimulatedClock(Clock):
+    """
+    Clock that only moves when `advance_to` is called. Sleepers wake in deadline
+    order as simulated time passes their deadline, however fast that happens in real time.
+    """
+    def __init__(self, start: float) -> None:
+        self.current: float = start
+        self._sleepers: list = []  # heap of (deadline, sequence, future)
+        self._sequence = itertools.count()
+
+    def time(self) -> float:
+        return self.current
+
+    def monotonic(self) -> float:
+        return self.current
+
+    async def sleep(self, seconds: float) -> None:
+        if seconds <= 0:
+            await asyncio.sleep(0)
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._sleepers, (self.current + seconds, next(self._sequence), future))
+        await future
+
+    async def advance_to(self, timestamp: float) -> None:
+        """
+        Moves to `timestamp`, stopping at every earlier deadline to let its sleeper run.
+        """
+        while self._sleepers and self._sleepers[0][0] <= timestamp:
+            deadline, _, future = heapq.heappop(self._sleepers)
+            self.current = max(self.current, deadline)
+            if not future.done():
+                future.set_result(None)
+                await asyncio.sleep(0)
+        self.current = max(self.current, timestamp)
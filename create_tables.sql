@@ -1,13 +1,19 @@
 -- Table 1: btc_iv_spd_skewness
+-- One row per (snapshot time, expiry); the unique key makes INSERT IGNORE deduplicate
 CREATE TABLE btc_iv_spd_skewness (
     id INT AUTO_INCREMENT PRIMARY KEY,
     timestamp BIGINT NOT NULL,
     expiration_timestamp INT NOT NULL,
-    atm_slope FLOAT
+    atm_slope FLOAT,
+    UNIQUE KEY uq_skew_time_expiration (timestamp, expiration_timestamp),
+    KEY idx_skew_expiration_time (expiration_timestamp, timestamp)
 );
 
 -- Table 2: btc_options_raw
+-- Read by time range (fetch_data, chart scripts), optionally narrowed by expiry and type.
+-- Partitioned by day on the millisecond timestamp; run manage_partitions.py daily to add partitions.
 CREATE TABLE btc_options_raw (
+    id BIGINT NOT NULL AUTO_INCREMENT,
     timestamp BIGINT NOT NULL,
     instrument_name VARCHAR(50) NOT NULL,
     expiration_timestamp BIGINT NOT NULL,
@@ -21,12 +27,20 @@ CREATE TABLE btc_options_raw (
     log_moneyness FLOAT,
     delta FLOAT,
     vega FLOAT,
-    theta FLOAT
+    theta FLOAT,
+    PRIMARY KEY (id, timestamp),
+    KEY idx_raw_time (timestamp),
+    KEY idx_raw_expiration_type_time (expiration_timestamp, option_type, timestamp)
+)
+PARTITION BY RANGE (timestamp) (
+    PARTITION p_history VALUES LESS THAN (1735689600000),  -- before 2025-01-01 UTC
+    PARTITION p_future VALUES LESS THAN MAXVALUE
 );
 
 -- Table 3: btc_options_tick
+-- Read by expiry and time range (compute_spd_skewness fallback, get_spd_pdf_log.py)
 CREATE TABLE btc_options_tick (
-    id INT AUTO_INCREMENT PRIMARY KEY,
+    id BIGINT NOT NULL AUTO_INCREMENT,
     timestamp BIGINT NOT NULL,
     instrument_name VARCHAR(50) NOT NULL,
     underlying_price FLOAT,
@@ -36,5 +50,41 @@ CREATE TABLE btc_options_tick (
     expiration_timestamp BIGINT NOT NULL,
     option_type ENUM('call', 'put') NOT NULL,
     log_moneyness FLOAT,
-    collected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    collected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, timestamp),
+    KEY idx_tick_expiration_time (expiration_timestamp, timestamp),
+    KEY idx_tick_time (timestamp)
+)
+PARTITION BY RANGE (timestamp) (
+    PARTITION p_history VALUES LESS THAN (1735689600000),  -- before 2025-01-01 UTC
+    PARTITION p_future VALUES LESS THAN MAXVALUE
+);
+
+-- Table 4: btc_options_bar
+-- 1s/20s/1m bars per instrument, written by websocket_client.py as bars close (bar_rollup.py).
+-- bar_timestamp is the bar open in ms; the bar covers [bar_timestamp, bar_timestamp + resolution_seconds * 1000).
+CREATE TABLE btc_options_bar (
+    bar_timestamp BIGINT NOT NULL,
+    resolution_seconds SMALLINT NOT NULL,
+    instrument_name VARCHAR(50) NOT NULL,
+    expiration_timestamp BIGINT NOT NULL,
+    option_type ENUM('call', 'put') NOT NULL,
+    tick_count INT NOT NULL,
+    bid_price_last FLOAT,
+    bid_price_min FLOAT,
+    bid_price_max FLOAT,
+    ask_price_last FLOAT,
+    ask_price_min FLOAT,
+    ask_price_max FLOAT,
+    bid_iv_last FLOAT,
+    bid_iv_min FLOAT,
+    bid_iv_max FLOAT,
+    ask_iv_last FLOAT,
+    ask_iv_min FLOAT,
+    ask_iv_max FLOAT,
+    mark_iv_last FLOAT,
+    mark_iv_min FLOAT,
+    mark_iv_max FLOAT,
+    PRIMARY KEY (instrument_name, resolution_seconds, bar_timestamp),
+    KEY idx_bar_resolution_expiration_time (resolution_seconds, expiration_timestamp, option_type, bar_timestamp)
 );
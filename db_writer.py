@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import time
+
+from metrics import LatencyHistogram, RateCounter
+from storage import StorageExecutor
+
+
+class BatchedDBWriter:
+    """
+    Buffers rows on a bounded queue and writes them through a Storage backend,
+    committing once per batch. A batch is flushed when it reaches
+    `max_batch_size` rows or `flush_interval` seconds after its first row.
+    Inserts and commits run on the executor's writer thread, off the event loop.
+    """
+    def __init__(self, storage, max_batch_size: int = 500, flush_interval: float = 0.25,
+                 max_queue_size: int = 50000, log_interval: float = 60.0,
+                 executor: StorageExecutor = None) -> None:
+        self.storage = storage
+        self.executor = executor or StorageExecutor(storage)
+        self.max_batch_size: int = max_batch_size
+        self.flush_interval: float = flush_interval
+        self.log_interval: float = log_interval
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self.rows_written = RateCounter()
+        self.flush_latency = LatencyHistogram()
+        self.failed_rows: int = 0
+        self._last_log: float = time.monotonic()
+
+    async def put(self, table: str, values: tuple) -> None:
+        # Waits while the queue is full so the producer slows down instead of growing memory
+        await self.queue.put((table, values))
+
+    async def run(self) -> None:
+        while True:
+            batch = await self._collect_batch()
+            await self._flush(batch)
+            self._maybe_log_stats()
+
+    async def _collect_batch(self) -> list:
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.flush_interval
+
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    def _write(self, batch: list) -> None:
+        # Group rows per table while keeping the tables in arrival order
+        grouped: dict = {}
+        for table, values in batch:
+            grouped.setdefault(table, []).append(values)
+        # Insert, commit and rollback must share the calling thread's connection
+        try:
+            for table, rows in grouped.items():
+                self.storage.insert(table, rows)
+            self.storage.commit()
+        except Exception:
+            try:
+                self.storage.rollback()
+            except Exception:
+                pass
+            raise
+
+    async def _flush(self, batch: list) -> None:
+        started = time.perf_counter()
+        try:
+            await self.executor.write(self._write, batch)
+            self.rows_written.add(len(batch))
+        except Exception as e:
+            self.failed_rows += len(batch)
+            logging.error(f"⚠️ Batched insert of {len(batch)} rows failed: {e}")
+        finally:
+            self.flush_latency.observe(time.perf_counter() - started)
+            for _ in batch:
+                self.queue.task_done()
+
+    async def drain(self) -> None:
+        """
+        Waits until every row queued so far has been written (or counted as failed).
+        """
+        await self.queue.join()
+
+    def stats(self) -> dict:
+        latency = self.flush_latency.summary()
+        return {
+            "queue_depth": self.queue.qsize(),
+            "rows_per_sec": self.rows_written.rate(),
+            "rows_total": self.rows_written.total,
+            "failed_rows": self.failed_rows,
+            "flushes": latency["count"],
+            "flush_latency_p50": latency["p50"],
+            "flush_latency_p99": latency["p99"],
+            "flush_latency_max": latency["max"],
+        }
+
+    def _maybe_log_stats(self) -> None:
+        now = time.monotonic()
+        if now - self._last_log >= self.log_interval:
+            self._last_log = now
+            logging.info(f"DB writer stats: {self.stats()}")
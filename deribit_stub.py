@@ -0,0 +1,321 @@
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import math
+import random
+import re
+import secrets
+import threading
+import time
+from datetime import datetime
+
+import websockets
+
+from metrics import LatencyHistogram, RateCounter
+
+FUTURE_CHANNEL_PATTERN = re.compile(r"^ticker\.BTC-(\d{2}[A-Z]{3}\d{2}|PERPETUAL)\.100ms$")
+OPTION_CHANNEL_PATTERN = re.compile(r"^ticker\.(BTC-(\d{2}[A-Z]{3}\d{2})-(\d+)-([CP]))\.100ms$")
+MARKPRICE_CHANNEL = "markprice.options.btc_usd"
+YEAR_SECONDS = 365 * 24 * 60 * 60
+
+
+def norm_cdf(x: float) -> float:
+    return 0.5 * (1.0 + math.erf(x / math.sqrt(2.0)))
+
+
+# Black-76 price in BTC (Deribit options are quoted in the underlying) and the greeks the strategy reads
+def option_quote(forward: float, strike: float, years: float, iv: float, option_type: str) -> tuple:
+    sd = iv * math.sqrt(years)
+    d1 = (math.log(forward / strike) + 0.5 * sd * sd) / sd
+    d2 = d1 - sd
+    if option_type == "call":
+        price, delta = forward * norm_cdf(d1) - strike * norm_cdf(d2), norm_cdf(d1)
+    else:
+        price, delta = strike * norm_cdf(-d2) - forward * norm_cdf(-d1), norm_cdf(d1) - 1.0
+    density = math.exp(-0.5 * d1 * d1) / math.sqrt(2.0 * math.pi)
+    vega = forward * density * math.sqrt(years) / 100
+    theta = -forward * density * iv / (2 * math.sqrt(years)) / 365
+    return max(price / forward, 0.0001), delta, vega, theta
+
+
+class DeribitStub:
+    """
+    Local stand-in for the part of Deribit's JSON-RPC API the strategy uses. Auth and
+    heartbeats are accepted, orders fill immediately at the quoted price and margin
+    checks always pass. Subscribed ticker channels publish `ticker_rate` frames per
+    second each and `markprice.options.btc_usd` the whole chain `markprice_rate` times
+    per second, from a random-walk underlying and a smile per expiry.
+    Tick-to-order latency is the time from the last option ticker sent to an order arriving.
+    """
+    def __init__(self, expirations: list, ticker_rate: float = 10.0, markprice_rate: float = 1.0,
+                 underlying_price: float = 90000.0, strike_step: int = 1000, iv_noise: float = 1.0,
+                 seed: int = 0) -> None:
+        self.expirations: dict = {date.upper(): datetime.strptime(date.upper(), "%d%b%y").timestamp() + 8 * 3600
+                                  for date in expirations}
+        self.ticker_rate: float = ticker_rate
+        self.markprice_rate: float = markprice_rate
+        self.spot: float = underlying_price
+        self.iv_noise: float = iv_noise
+        self.rng = random.Random(seed)
+        self.strikes: list = list(range(int(underlying_price * 0.5) // strike_step * strike_step,
+                                        int(underlying_price * 1.8), strike_step))
+        self.order_ids = itertools.count(1)
+        self.positions: dict = {}
+        self.connections: int = 0
+        self.frames_sent = RateCounter()
+        self.requests = RateCounter()
+        self.orders: int = 0
+        self.order_latency = LatencyHistogram()
+        self.last_option_tick_at = None
+        self.listening = threading.Event()
+
+    # Market model
+
+    def step(self, seconds: float) -> None:
+        self.spot *= math.exp(self.rng.gauss(0.0, 0.6 * math.sqrt(seconds / YEAR_SECONDS)))
+
+    def years_to(self, date: str) -> float:
+        return max(self.expirations[date] - time.time(), 86400) / YEAR_SECONDS
+
+    def forward(self, date: str) -> float:
+        return self.spot * math.exp(0.05 * self.years_to(date))
+
+    def smile(self, date: str, strike: float) -> float:
+        # BTC smiles slope upward and steepen with maturity
+        moneyness = math.log(strike / self.forward(date))
+        years = self.years_to(date)
+        return 0.5 + 0.1 * math.sqrt(years) * moneyness + 0.6 * moneyness * moneyness
+
+    def future_ticker(self, name: str) -> dict:
+        mark_price = self.spot if name == "PERPETUAL" else self.forward(name)
+        return {"instrument_name": f"BTC-{name}", "timestamp": int(time.time() * 1000), "mark_price": mark_price,
+                "index_price": self.spot, "best_bid_price": mark_price - 2.5, "best_ask_price": mark_price + 2.5}
+
+    def option_ticker(self, instrument_name: str, date: str, strike: float, option_type: str) -> dict:
+        forward, years = self.forward(date), self.years_to(date)
+        iv = self.smile(date, strike) * 100 + self.rng.gauss(0.0, self.iv_noise)
+        bid_iv, ask_iv = iv - 0.5 - abs(self.rng.gauss(0.0, self.iv_noise)), iv + 0.5 + abs(self.rng.gauss(0.0, self.iv_noise))
+        mark_price, delta, vega, theta = option_quote(forward, strike, years, iv / 100, option_type)
+        return {
+            "instrument_name": instrument_name, "timestamp": int(time.time() * 1000),
+            "underlying_price": forward, "index_price": self.spot,
+            "mark_price": mark_price, "mark_iv": iv, "bid_iv": bid_iv, "ask_iv": ask_iv,
+            "best_bid_price": option_quote(forward, strike, years, bid_iv / 100, option_type)[0],
+            "best_ask_price": option_quote(forward, strike, years, ask_iv / 100, option_type)[0],
+            "greeks": {"delta": delta, "vega": vega, "theta": theta, "gamma": None, "rho": None},
+        }
+
+    def markprice_chain(self) -> list:
+        timestamp = int(time.time() * 1000)
+        chain = []
+        for date in self.expirations:
+            forward, years = self.forward(date), self.years_to(date)
+            for strike in self.strikes:
+                iv = self.smile(date, strike)
+                for option_type, letter in (("call", "C"), ("put", "P")):
+                    chain.append({"instrument_name": f"BTC-{date}-{strike}-{letter}", "timestamp": timestamp,
+                                  "mark_price": option_quote(forward, strike, years, iv, option_type)[0], "iv": iv})
+        return chain
+
+    # JSON-RPC
+
+    def response(self, request_id, result=None, error: dict = None) -> dict:
+        now_us = int(time.time() * 1e6)
+        message = {"jsonrpc": "2.0", "id": request_id, "usIn": now_us, "usOut": now_us, "usDiff": 0, "testnet": True}
+        if error is not None:
+            message["error"] = error
+        else:
+            message["result"] = result
+        return message
+
+    def fill(self, params: dict, direction: str, received_at: float) -> dict:
+        if self.last_option_tick_at is not None:
+            self.order_latency.observe(received_at - self.last_option_tick_at)
+        self.orders += 1
+        instrument_name, amount = params["instrument_name"], float(params["amount"])
+        date, strike, letter = OPTION_CHANNEL_PATTERN.match(f"ticker.{instrument_name}.100ms").groups()[1:]
+        quote = self.option_ticker(instrument_name, date, float(strike), "call" if letter == "C" else "put")
+        price = quote["best_ask_price"] if direction == "buy" else quote["best_bid_price"]
+        self.positions[instrument_name] = self.positions.get(instrument_name, 0.0) + (amount if direction == "buy" else -amount)
+        order_id = f"stub-{next(self.order_ids)}"
+        return {
+            "order": {"order_id": order_id, "order_state": "filled", "instrument_name": instrument_name,
+                      "direction": direction, "amount": amount, "filled_amount": amount, "average_price": price,
+                      "order_type": params.get("type", "market"), "label": params.get("label", "")},
+            "trades": [{"trade_id": f"{order_id}-1", "order_id": order_id, "state": "filled",
+                        "instrument_name": instrument_name, "direction": direction, "amount": amount,
+                        "contracts": amount, "price": price, "profit_loss": 0.0, "fee": 0.0003 * amount}],
+        }
+
+    def account(self) -> dict:
+        return {"currency": "BTC", "equity": 10.0, "balance": 10.0, "margin_balance": 10.0,
+                "initial_margin": 0.5, "maintenance_margin": 0.25,
+                "projected_initial_margin": 0.5, "projected_maintenance_margin": 0.25, "total_pl": 0.0}
+
+    async def handle_request(self, session: dict, message: dict, received_at: float) -> dict:
+        method, params = message.get("method"), message.get("params") or {}
+        request_id = message.get("id")
+        if method == "public/auth":
+            return self.response(request_id, {"access_token": secrets.token_hex(16), "refresh_token": secrets.token_hex(16),
+                                              "expires_in": 900, "scope": "session:stub", "token_type": "bearer"})
+        if method == "public/set_heartbeat":
+            if session["heartbeat"] is not None:
+                session["heartbeat"].cancel()
+            session["heartbeat"] = asyncio.create_task(self.send_heartbeats(session, float(params.get("interval", 10))))
+            return self.response(request_id, "ok")
+        if method == "public/test":
+            return self.response(request_id, {"version": "stub"})
+        if method in ("private/subscribe", "public/subscribe"):
+            channels = [channel for channel in params.get("channels", []) if self.channel_known(channel)]
+            session["channels"].update(channels)
+            return self.response(request_id, channels)
+        if method in ("private/unsubscribe", "public/unsubscribe"):
+            channels = [channel for channel in params.get("channels", []) if channel in session["channels"]]
+            session["channels"].difference_update(channels)
+            return self.response(request_id, channels)
+        if method in ("private/buy", "private/sell"):
+            return self.response(request_id, self.fill(params, method[len("private/"):], received_at))
+        if method == "private/close_position":
+            size = self.positions.get(params["instrument_name"], 0.0)
+            if size == 0:
+                return self.response(request_id, error={"code": 10009, "message": "not_enough_funds"})
+            return self.response(request_id, self.fill({**params, "amount": abs(size)},
+                                                       "sell" if size > 0 else "buy", received_at))
+        if method == "private/simulate_portfolio":
+            return self.response(request_id, self.account())
+        if method == "private/get_account_summary":
+            return self.response(request_id, self.account())
+        if method == "private/get_positions":
+            return self.response(request_id, [
+                {"instrument_name": name, "kind": "option", "size": size, "direction": "buy" if size > 0 else "sell"}
+                for name, size in self.positions.items() if size != 0])
+        return self.response(request_id, error={"code": -32601, "message": "Method not found"})
+
+    def channel_known(self, channel: str) -> bool:
+        if channel == MARKPRICE_CHANNEL:
+            return True
+        future = FUTURE_CHANNEL_PATTERN.match(channel)
+        if future:
+            return future.group(1) == "PERPETUAL" or future.group(1) in self.expirations
+        option = OPTION_CHANNEL_PATTERN.match(channel)
+        return bool(option) and option.group(2) in self.expirations
+
+    # Streams
+
+    async def send(self, websocket, message: dict) -> None:
+        await websocket.send(json.dumps(message))
+        self.frames_sent.add()
+
+    async def publish(self, websocket, channel: str, data) -> None:
+        await self.send(websocket, {"jsonrpc": "2.0", "method": "subscription",
+                                    "params": {"channel": channel, "data": data}})
+
+    async def send_heartbeats(self, session: dict, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await self.send(session["websocket"], {"jsonrpc": "2.0", "method": "heartbeat",
+                                                   "params": {"type": "test_request"}})
+
+    async def publish_tickers(self, session: dict) -> None:
+        interval = 1.0 / self.ticker_rate
+        next_at = time.monotonic()
+        while True:
+            next_at += interval
+            await asyncio.sleep(max(0.0, next_at - time.monotonic()))
+            self.step(interval)
+            for channel in list(session["channels"]):
+                future = FUTURE_CHANNEL_PATTERN.match(channel)
+                if future:
+                    await self.publish(session["websocket"], channel, self.future_ticker(future.group(1)))
+                    continue
+                option = OPTION_CHANNEL_PATTERN.match(channel)
+                if option:
+                    instrument_name, date, strike, letter = option.groups()
+                    await self.publish(session["websocket"], channel, self.option_ticker(
+                        instrument_name, date, float(strike), "call" if letter == "C" else "put"))
+                    self.last_option_tick_at = time.perf_counter()
+
+    async def publish_markprice(self, session: dict) -> None:
+        interval = 1.0 / self.markprice_rate
+        next_at = time.monotonic()
+        while True:
+            next_at += interval
+            await asyncio.sleep(max(0.0, next_at - time.monotonic()))
+            if MARKPRICE_CHANNEL in session["channels"]:
+                await self.publish(session["websocket"], MARKPRICE_CHANNEL, self.markprice_chain())
+
+    async def handler(self, websocket) -> None:
+        self.connections += 1
+        session = {"websocket": websocket, "channels": set(), "heartbeat": None}
+        publishers = [asyncio.create_task(self.publish_tickers(session)),
+                      asyncio.create_task(self.publish_markprice(session))]
+        logging.info(f"Client connected ({self.connections} so far)")
+        try:
+            async for frame in websocket:
+                received_at = time.perf_counter()
+                message = json.loads(frame)
+                self.requests.add()
+                try:
+                    response = await self.handle_request(session, message, received_at)
+                except Exception as e:
+                    response = self.response(message.get("id"), error={"code": -32602, "message": f"Invalid params: {e}"})
+                await self.send(websocket, response)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            for task in publishers + [session["heartbeat"]]:
+                if task is not None:
+                    task.cancel()
+            logging.info("Client disconnected")
+
+    def stats(self) -> dict:
+        latency = self.order_latency.summary()
+        return {
+            "frames_per_sec": self.frames_sent.rate(),
+            "frames_total": self.frames_sent.total,
+            "requests_total": self.requests.total,
+            "orders": self.orders,
+            "tick_to_order_p50": latency["p50"],
+            "tick_to_order_p99": latency["p99"],
+            "tick_to_order_max": latency["max"],
+        }
+
+    async def log_stats(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            logging.info(f"Stub stats: {self.stats()}")
+
+    async def serve(self, host: str = "localhost", port: int = 8765, stats_interval: float = 10.0) -> None:
+        async with websockets.serve(self.handler, host, port, compression=None, max_size=None):
+            logging.info(f"Deribit stub listening on ws://{host}:{port}/ws/api/v2")
+            self.listening.set()
+            await self.log_stats(stats_interval)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level='INFO',
+        format='%(asctime)s | %(levelname)s | %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+
+    parser = argparse.ArgumentParser(description="Local stand-in for the Deribit WebSocket API.")
+    parser.add_argument("--expirations", required=True, help="DDMMMYY dates the chain is generated for, separated by commas")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--ticker-rate", type=float, default=10.0, help="frames per second per subscribed ticker channel")
+    parser.add_argument("--markprice-rate", type=float, default=1.0, help="markprice.options.btc_usd frames per second")
+    parser.add_argument("--underlying-price", type=float, default=90000.0)
+    parser.add_argument("--iv-noise", type=float, default=1.0, help="standard deviation of quoted IVs, in vol points")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stats-interval", type=float, default=10.0)
+    args = parser.parse_args()
+
+    stub = DeribitStub(args.expirations.split(","), args.ticker_rate, args.markprice_rate,
+                       args.underlying_price, iv_noise=args.iv_noise, seed=args.seed)
+    try:
+        asyncio.run(stub.serve(args.host, args.port, args.stats_interval))
+    except KeyboardInterrupt:
+        print(f"Stub stats: {stub.stats()}")
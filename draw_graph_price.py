@@ -1,4 +1,4 @@
-import mysql.connector
+import argparse
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
@@ -6,9 +6,21 @@ import matplotlib.animation as animation
 from statsmodels.tsa.stattools import adfuller, kpss
 from datetime import datetime
 import matplotlib
+from bar_rollup import LEG_BAR_COLUMNS, leg_frames
+from rolling_stats import BAND_KINDS, rolling_band, to_epoch_seconds
+from spread_history import BAND_WINDOW_SECONDS
+from storage import shared_storage
+from tick_archive import read_history
 
 matplotlib.use("TkAgg")  # Use "QtAgg" for PyQt users
 
+# Look-back of the rolling mean/std bands: the strategy's band unless --band-hours asks for another
+band_window_seconds = BAND_WINDOW_SECONDS
+# Band statistic (see rolling_stats.BAND_KINDS), set by --band
+band_kind = "std"
+# History shown; days older than today can be served from the Parquet archive (tick_archive.py)
+LOOKBACK_HOURS = 12
+
 
 class plot_the_spread:
     def __init__(self) -> None:
@@ -64,58 +76,15 @@ class plot_the_spread:
 
     def fetch_data(self):
 
-        sql = """
-                SELECT timestamp, expiration_timestamp, option_type, bid_price, ask_price, bid_iv, ask_iv, log_moneyness, delta, theta
-                FROM btc_options_raw
-                WHERE timestamp >= UNIX_TIMESTAMP(NOW() - INTERVAL 0.5 DAY) * 1000
-                ORDER BY timestamp DESC;
-        """
-        cursor.execute(sql)
-        rows = cursor.fetchall()
-
-        if not rows:
+        # 20s bars rolled up at ingest; archived days are read from Parquet, the rest from the storage backend
+        end_ms = int(datetime.now().timestamp() * 1000)
+        bars = read_history(storage, "btc_options_bar", LEG_BAR_COLUMNS,
+                            end_ms - LOOKBACK_HOURS * 3600 * 1000, end_ms,
+                            expirations=self.selected_expirations[:2], filters={'resolution_seconds': 20})
+        data = leg_frames(bars, self.selected_expirations)
+        if data is None:
             return None
-
-        df = pd.DataFrame(rows, columns=['timestamp', 'expiration_timestamp', 'option_type','bid_price', 'ask_price', 'bid_iv', 'ask_iv', 'log_moneyness', 'delta', 'theta'])
-        df['timestamp'] = df['timestamp'].apply(lambda x: datetime.fromtimestamp(int(x)/1000).replace(microsecond=0))
-
-        near_call_data = (
-            df[(df['option_type'] == 'call') & (df['expiration_timestamp'] == self.selected_expirations[0])]
-            .drop_duplicates('timestamp', keep='first').sort_values('timestamp'))
-        near_call_data = near_call_data.set_index('timestamp')
-        near_call_data = near_call_data.resample('20S').ffill()
-
-        far_call_data = (
-            df[(df['option_type'] == 'call') & (df['expiration_timestamp'] == self.selected_expirations[1])]
-            .drop_duplicates('timestamp', keep='first').sort_values('timestamp'))
-        far_call_data = far_call_data.set_index('timestamp')
-        far_call_data = far_call_data.resample('20S').ffill()
-
-        near_put_data = (
-            df[(df['option_type'] == 'put') & (df['expiration_timestamp'] == self.selected_expirations[0])]
-            .drop_duplicates('timestamp', keep='first').sort_values('timestamp')
-        )
-        near_put_data = near_put_data.set_index('timestamp')
-        near_put_data = near_put_data.resample('20S').ffill()
-
-        far_put_data = (
-            df[(df['option_type'] == 'put') & (df['expiration_timestamp'] == self.selected_expirations[1])]
-            .drop_duplicates('timestamp', keep='first').sort_values('timestamp')
-        )
-        far_put_data = far_put_data.set_index('timestamp')
-        far_put_data = far_put_data.resample('20S').ffill()
-
-        df['expiration_timestamp'] = df['expiration_timestamp'].apply(lambda x: datetime.fromtimestamp(int(x)))
-
-        near_call_data['mid_price'] = (near_call_data['bid_price'] + near_call_data['ask_price']) / 2
-        far_call_data['mid_price'] = (far_call_data['bid_price'] + far_call_data['ask_price']) / 2
-        near_put_data['mid_price'] = (near_put_data['bid_price'] + near_put_data['ask_price']) / 2
-        far_put_data['mid_price'] = (far_put_data['bid_price'] + far_put_data['ask_price']) / 2
-
-        near_call_data['mid_iv'] = (near_call_data['bid_iv'] + near_call_data['ask_iv']) / 2
-        far_call_data['mid_iv'] = (far_call_data['bid_iv'] + far_call_data['ask_iv']) / 2
-        near_put_data['mid_iv'] = (near_put_data['bid_iv'] + near_put_data['ask_iv']) / 2
-        far_put_data['mid_iv'] = (far_put_data['bid_iv'] + far_put_data['ask_iv']) / 2
+        near_call_data, far_call_data, near_put_data, far_put_data = data
 
         print(near_call_data)
         print(far_call_data)
@@ -149,8 +118,8 @@ class plot_the_spread:
 
             df = df.dropna()
 
-            mean_price = df['mid_price'].mean()
-            std_dev = df['mid_price'].std()
+            band = rolling_band(to_epoch_seconds(df.index), df['mid_price'].to_numpy(dtype=float),
+                                band_window_seconds, width=2, kind=band_kind)
 
             modified_time_stamp = datetime.fromtimestamp(df['expiration_timestamp'].iloc[0])
             option_type = df['option_type'].iloc[0]
@@ -162,14 +131,11 @@ class plot_the_spread:
                               label=f"Exp: {modified_time_stamp.strftime('%d-%b-%Y')} {option_type}")
             legend_handles.append(curve)  # Add only skewness curves to the legend
 
-            # Plot Mean Line (No label for legend)
-            plt.axhline(mean_price, color=color, linestyle='--', alpha=0.5)
+            # Plot Rolling Mean Line (No label for legend)
+            plt.plot(df.index, band['mean'], color=color, linestyle='--', alpha=0.5)
 
             # Plot ±3 Standard Deviation Bands (No label for legend)
-            plt.fill_between(df.index,
-                             mean_price - 2 * std_dev,
-                             mean_price + 2 * std_dev,
-                             color=color, alpha=0.2)
+            plt.fill_between(df.index, band['lower'], band['upper'], color=color, alpha=0.2)
 
         plt.xlabel("Time")
         plt.ylabel("Mid Price")
@@ -209,8 +175,8 @@ class plot_the_spread:
                 print("hello")
                 df = df.dropna()
 
-                mean_price = df['bid_price'].mean()
-                std_dev = df['bid_price'].std()
+                band = rolling_band(to_epoch_seconds(df.index), df['bid_price'].to_numpy(dtype=float),
+                                    band_window_seconds, width=2, kind=band_kind)
 
                 modified_time_stamp = datetime.fromtimestamp(df['expiration_timestamp'].iloc[0])
                 option_type = df['option_type'].iloc[0]
@@ -220,21 +186,18 @@ class plot_the_spread:
                                   label=f"Exp: {modified_time_stamp.strftime('%d-%b-%Y')} {option_type}")
                 legend_handles.append(curve)  # Add only skewness curves to the legend
 
-                # Plot Mean Line (No label for legend)
-                plt.axhline(mean_price, color=color, linestyle='--', alpha=0.5)
+                # Plot Rolling Mean Line (No label for legend)
+                plt.plot(df.index, band['mean'], color=color, linestyle='--', alpha=0.5)
 
                 # Plot ±3 Standard Deviation Bands (No label for legend)
-                plt.fill_between(df.index,
-                                 mean_price - 2 * std_dev,
-                                 mean_price + 2 * std_dev,
-                                 color=color, alpha=0.2)
+                plt.fill_between(df.index, band['lower'], band['upper'], color=color, alpha=0.2)
 
             if title in data_using_ask:
                 print("hello")
                 df = df.dropna()
 
-                mean_price = df['ask_price'].mean()
-                std_dev = df['ask_price'].std()
+                band = rolling_band(to_epoch_seconds(df.index), df['ask_price'].to_numpy(dtype=float),
+                                    band_window_seconds, width=2, kind=band_kind)
 
                 modified_time_stamp = datetime.fromtimestamp(df['expiration_timestamp'].iloc[0])
                 option_type = df['option_type'].iloc[0]
@@ -244,14 +207,11 @@ class plot_the_spread:
                                   label=f"Exp: {modified_time_stamp.strftime('%d-%b-%Y')} {option_type}")
                 legend_handles.append(curve)  # Add only skewness curves to the legend
 
-                # Plot Mean Line (No label for legend)
-                plt.axhline(mean_price, color=color, linestyle='--', alpha=0.5)
+                # Plot Rolling Mean Line (No label for legend)
+                plt.plot(df.index, band['mean'], color=color, linestyle='--', alpha=0.5)
 
                 # Plot ±3 Standard Deviation Bands (No label for legend)
-                plt.fill_between(df.index,
-                                 mean_price - 2 * std_dev,
-                                 mean_price + 2 * std_dev,
-                                 color=color, alpha=0.2)
+                plt.fill_between(df.index, band['lower'], band['upper'], color=color, alpha=0.2)
 
 
         plt.xlabel("Time")
@@ -297,8 +257,8 @@ class plot_the_spread:
             columns = ['far_spread', 'near_spread', 'RR_spread']
 
             for column, color in zip(columns, colors):
-                mean_price = final_df[f'{column}'].mean()
-                std_dev = final_df[f'{column}'].std()
+                band = rolling_band(to_epoch_seconds(final_df.index), final_df[f'{column}'].to_numpy(dtype=float),
+                                    band_window_seconds, width=2, kind=band_kind)
 
                 # Plot SPD Skewness & store the handle for the legend
                 curve, = plt.plot(final_df.index, final_df[f'{column}'], linestyle='-', marker='o', markersize=2,
@@ -306,14 +266,11 @@ class plot_the_spread:
                                   label=f"{column}")
                 legend_handles.append(curve)  # Add only skewness curves to the legend
 
-                # Plot Mean Line (No label for legend)
-                plt.axhline(mean_price, color=color, linestyle='--', alpha=0.5)
+                # Plot Rolling Mean Line (No label for legend)
+                plt.plot(final_df.index, band['mean'], color=color, linestyle='--', alpha=0.5)
 
                 # Plot ±3 Standard Deviation Bands (No label for legend)
-                plt.fill_between(final_df.index,
-                                 mean_price - 2 * std_dev,
-                                 mean_price + 2 * std_dev,
-                                 color=color, alpha=0.2)
+                plt.fill_between(final_df.index, band['lower'], band['upper'], color=color, alpha=0.2)
 
             plt.xlabel("Time")
             plt.ylabel("Spread")
@@ -325,13 +282,16 @@ class plot_the_spread:
 
 # **8. Run Static or Real-Time Graph**
 if __name__ == "__main__":
-    # **1. Connect to MySQL**
-    conn = mysql.connector.connect(
-        host="localhost",
-        user="root",  # Change if needed
-        password="1234",  # Change if needed
-        database="btc_options_db"
-    )
-    cursor = conn.cursor()
+    parser = argparse.ArgumentParser(description="Historical price spreads between expirations with mean/std bands.")
+    parser.add_argument("--band-hours", type=float, default=BAND_WINDOW_SECONDS / 3600,
+                        help="look-back of the band (default: the strategy's; e.g. 2 for a short band)")
+    parser.add_argument("--band", choices=BAND_KINDS, default="std",
+                        help="mean ± std, EWMA (look-back is the half-life) or rolling quantiles")
+    args = parser.parse_args()
+    band_window_seconds = int(args.band_hours * 3600)
+    band_kind = args.band
+
+    # **1. Connect to the shared storage backend (STORAGE_URL, MySQL by default; pooled, prepared queries)**
+    storage = shared_storage()
 
     test = plot_the_spread()
\ No newline at end of file
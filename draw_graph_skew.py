@@ -1,4 +1,5 @@
-import mysql.connector
+import argparse
+import multiprocessing
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
@@ -6,33 +7,53 @@ import matplotlib.animation as animation
 from statsmodels.tsa.stattools import adfuller, kpss
 from datetime import datetime
 import matplotlib
+import spd_surface
+from rolling_stats import BAND_KINDS, rolling_band, to_epoch_seconds
+from spread_history import BAND_WINDOW_SECONDS
+from storage import shared_storage
+from tick_archive import read_history
 
 matplotlib.use("TkAgg")  # Use "QtAgg" for PyQt users
 
-# **1. Connect to MySQL**
-conn = mysql.connector.connect(
-    host="localhost",
-    user="root",  # Change if needed
-    password="1234",  # Change if needed
-    database="btc_options_db"
-)
-cursor = conn.cursor()
+# Look-back of the rolling mean/std bands: the strategy's band unless --band-hours asks for another
+band_window_seconds = BAND_WINDOW_SECONDS
+# Band statistic (see rolling_stats.BAND_KINDS), set by --band
+band_kind = "std"
+# History shown; days older than today can be served from the Parquet archive (tick_archive.py)
+LOOKBACK_HOURS = 12
 
-# **2. Fetch SPD Skewness Data from MySQL**
+# **1. Shared storage backend (STORAGE_URL, MySQL by default; pooled, prepared queries)**
+# Opened under __main__, so spawned surface workers re-importing this script do not connect
+storage = None
+
+# **2. Fetch SPD Skewness Data**
 def fetch_spd_skewness():
-    sql = """
-         SELECT timestamp, expiration_timestamp, atm_slope
-            FROM btc_iv_spd_skewness
-            WHERE timestamp >= UNIX_TIMESTAMP(NOW()-INTERVAL 0.5 DAY) * 1000
-            ORDER BY timestamp DESC; 
-    """
-    cursor.execute(sql)
-    rows = cursor.fetchall()
-
-    if not rows:
+    # Archived days are read from Parquet, the rest from the storage backend
+    end_ms = int(datetime.now().timestamp() * 1000)
+    df = read_history(storage, "btc_iv_spd_skewness", ['timestamp', 'expiration_timestamp', 'atm_slope'],
+                      end_ms - LOOKBACK_HOURS * 3600 * 1000, end_ms)
+
+    if df.empty:
+        return None
+
+    df['timestamp'] = df['timestamp'].apply(lambda x: datetime.fromtimestamp(int(x)/1000))
+
+    return df
+
+
+# **2b. Fetch SPD Moments from the Precomputed Surface (spd_surface.py), filling in missing snapshots first**
+def fetch_spd_moments(column='skewness', workers=None):
+    end_ms = int(datetime.now().timestamp() * 1000)
+    start_ms = end_ms - LOOKBACK_HOURS * 3600 * 1000
+    # Spawned workers: this process already holds a storage connection and pyarrow's threads
+    written = spd_surface.update_surface(storage, start_ms, end_ms, workers=workers,
+                                         mp_context=multiprocessing.get_context("spawn"))
+    print(f"SPD surface: {written} new entries")
+
+    df = spd_surface.read_surface(start_ms=start_ms, end_ms=end_ms, columns=[column]).dropna(subset=[column])
+    if df.empty:
         return None
 
-    df = pd.DataFrame(rows, columns=['timestamp', 'expiration_timestamp', 'atm_slope'])
     df['timestamp'] = df['timestamp'].apply(lambda x: datetime.fromtimestamp(int(x)/1000))
 
     return df
@@ -62,8 +83,8 @@ def generate_colors(n):
 
 
 # **5. Plot SPD Skewness with Stationarity Test & Standard Deviation**
-def plot_skewness_with_std_dev():
-    df = fetch_spd_skewness()
+def plot_skewness_with_std_dev(df=None, column='atm_slope', ylabel="ATM Slope"):
+    df = fetch_spd_skewness() if df is None else df
     if df is None or df.empty:
         print("⚠️ No SPD skewness data found in MySQL.")
         return
@@ -76,15 +97,15 @@ def plot_skewness_with_std_dev():
     legend_handles = []
 
     for exp_ts, color in zip(expirations, colors):
-        exp_df = df[df['expiration_timestamp'] == exp_ts].set_index('timestamp')
+        exp_df = df[df['expiration_timestamp'] == exp_ts].set_index('timestamp').sort_index()
         print(exp_df)
 
         # Calculate mean and standard deviation
-        mean_skewness = exp_df['atm_slope'].mean()
-        std_dev = exp_df['atm_slope'].std()
+        band = rolling_band(to_epoch_seconds(exp_df.index), exp_df[column].to_numpy(dtype=float),
+                            band_window_seconds, width=2.5, kind=band_kind)
 
         # Perform stationarity test
-        stationarity_results = test_stationarity(exp_df['atm_slope'])
+        stationarity_results = test_stationarity(exp_df[column])
         modified_exp_ts = exp_ts
         modified_time_stamp = datetime.fromtimestamp(modified_exp_ts)
 
@@ -94,22 +115,19 @@ def plot_skewness_with_std_dev():
         print(stationarity_results)
 
         # Plot SPD Skewness & store the handle for the legend
-        curve, = plt.plot(exp_df.index, exp_df['atm_slope'], linestyle='-', marker='o', color=color,
+        curve, = plt.plot(exp_df.index, exp_df[column], linestyle='-', marker='o', color=color,
                           label=f"Exp: {modified_time_stamp.strftime('%d-%b-%Y')}")
         legend_handles.append(curve)  # Add only skewness curves to the legend
 
-        # Plot Mean Line (No label for legend)
-        plt.axhline(mean_skewness, color=color, linestyle='--', alpha=0.5)
+        # Plot Rolling Mean Line (No label for legend)
+        plt.plot(exp_df.index, band['mean'], color=color, linestyle='--', alpha=0.5)
 
         # Plot ±3 Standard Deviation Bands (No label for legend)
-        plt.fill_between(exp_df.index,
-                         mean_skewness - 2.5 * std_dev,
-                         mean_skewness + 2.5 * std_dev,
-                         color=color, alpha=0.2)
+        plt.fill_between(exp_df.index, band['lower'], band['upper'], color=color, alpha=0.2)
 
     plt.xlabel("Time")
-    plt.ylabel("ATM Slope")
-    plt.title("ATM Slope Over Time with Mean & ±5 Std Dev Bands")
+    plt.ylabel(ylabel)
+    plt.title(f"{ylabel} Over Time with Mean & ±5 Std Dev Bands")
     plt.legend(handles=legend_handles, loc="lower right")  # ✅ Only skewness curves in legend
     plt.grid(True)
     plt.xticks(rotation=45)
@@ -119,4 +137,21 @@ def plot_skewness_with_std_dev():
 
 # **8. Run Static or Real-Time Graph**
 if __name__ == "__main__":
-    plot_skewness_with_std_dev()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Skewness per expiration with rolling mean/std bands.")
+    parser.add_argument("--spd", choices=spd_surface.MOMENT_COLUMNS, default=None,
+                        help="plot this SPD moment from the precomputed surface instead of the ATM slope")
+    parser.add_argument("--workers", type=int, default=None, help="processes for missing SPD entries")
+    parser.add_argument("--band-hours", type=float, default=BAND_WINDOW_SECONDS / 3600,
+                        help="look-back of the band (default: the strategy's; e.g. 2 for a short band)")
+    parser.add_argument("--band", choices=BAND_KINDS, default="std",
+                        help="mean ± std, EWMA (look-back is the half-life) or rolling quantiles")
+    args = parser.parse_args()
+    band_window_seconds = int(args.band_hours * 3600)
+    band_kind = args.band
+    storage = shared_storage()
+
+    if args.spd:
+        plot_skewness_with_std_dev(fetch_spd_moments(args.spd, args.workers), args.spd,
+                                   f"SPD {args.spd.capitalize()}")
+    else:
+        plot_skewness_with_std_dev()
\ No newline at end of file
@@ -1,43 +1,44 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-import mysql.connector
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-from scipy.interpolate import CubicSpline
-from datetime import datetime
+from datetime import datetime, timedelta
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+import argparse
 import logging
-
-logging.basicConfig(
-    level='DEBUG',
-    format='%(asctime)s | %(levelname)s | %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
-
-# **1. Connect to MySQL**
-def connect_db():
-    return mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="1234",
-        database="btc_options_db"
-    )
-
-
-# **2. Fetch Available Timestamps (Milliseconds to Human-Readable)**
-def fetch_available_timestamps():
-    conn = connect_db()
-    cursor = conn.cursor()
-
-    cursor.execute("SELECT DISTINCT timestamp FROM btc_iv_spd_skewness ORDER BY timestamp DESC")
-    rows = cursor.fetchall()
-    conn.close()
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import spd_surface
+from spd import DEFAULT_GRID_POINTS, LOOKBACK_MS, compute_spd, compute_spd_batch, spd_curves, spd_from_curve
+from storage import SKEW_TABLE, TICK_TABLE, shared_storage
+from tick_archive import read_history
+
+# **1. Shared storage backend (STORAGE_URL, MySQL by default), opened when run as a script**
+storage = None
+grid_points = None
+# Timestamps on each side of the selection loaded ahead of time
+PREFETCH_NEIGHBOURS = 3
+# How often the UI checks on the worker, in ms
+POLL_MS = 30
+# Timestamps listed per page; older pages load on demand
+TIMESTAMP_PAGE = 500
+# Frames of the animation use at most this many grid points, which bounds the cached arrays
+ANIMATION_GRID_POINTS = 400
+# Processes fitting missing animation frames (None: one per CPU)
+animation_workers = None
+
+
+# **2. Fetch Available Timestamps (Milliseconds to Human-Readable), one page below `before` at a time**
+def fetch_available_timestamps(before=None, limit=None):
+    values = storage.distinct_values(SKEW_TABLE, "timestamp", limit=limit or TIMESTAMP_PAGE, before=before)
 
     timestamps = []
-    for row in rows:
+    for value in values:
         try:
-            ts = int(row[0])
+            ts = int(value)
             formatted_time = datetime.fromtimestamp(ts / 1000).strftime('%Y-%m-%d %H:%M:%S')
             timestamps.append((formatted_time, ts))
         except Exception:
@@ -47,17 +48,12 @@ def fetch_available_timestamps():
 
 # **3. Fetch Available Expiration Dates (Seconds to Human-Readable)**
 def fetch_available_expirations():
-    conn = connect_db()
-    cursor = conn.cursor()
-
-    cursor.execute("SELECT DISTINCT expiration_timestamp FROM btc_iv_spd_skewness ORDER BY expiration_timestamp DESC LIMIT 10")
-    rows = cursor.fetchall()
-    conn.close()
+    values = storage.distinct_values(SKEW_TABLE, "expiration_timestamp", limit=10)
 
     expirations = []
-    for row in rows:
+    for value in values:
         try:
-            exp_ts = int(row[0])
+            exp_ts = int(value)
             formatted_exp = datetime.fromtimestamp(exp_ts).strftime('%Y-%m-%d')
             expirations.append((formatted_exp, exp_ts))
         except Exception:
@@ -68,30 +64,19 @@ def fetch_available_expirations():
 
 # **4. Fetch SPD Data for Selected Time & Expiration**
 def fetch_spd_data(selected_timestamp, selected_expiration):
-    conn = connect_db()
-    cursor = conn.cursor()
-
     try:
         unix_timestamp = int(selected_timestamp)
         exp_timestamp = int(selected_expiration)
 
-        # Only considers a 1-day range
-        sql = """
-            SELECT strike_price, mark_iv, option_type, underlying_price
-            FROM btc_options_tick 
-            WHERE (%s - 86400000) <= timestamp
-             AND timestamp <= %s 
-             AND expiration_timestamp = %s
-            ORDER BY timestamp DESC 
-        """
-        cursor.execute(sql, (unix_timestamp, unix_timestamp, exp_timestamp))
-        rows = cursor.fetchall()
-        logging.info(f'rows: {rows}')
-
-        if not rows:
+        # Only considers a 1-day range; archived days are read from Parquet, the rest from the storage backend
+        df = read_history(storage, TICK_TABLE,
+                          ['timestamp', 'strike_price', 'mark_iv', 'option_type', 'underlying_price'],
+                          unix_timestamp - 86400000, unix_timestamp + 1, expirations=[exp_timestamp])
+        df = df.drop(columns='timestamp')
+
+        if df.empty:
             return None, None, None
 
-        df = pd.DataFrame(rows, columns=['strike_price', 'mark_iv', 'option_type', 'underlying_price'])
         logging.info(f'df: {df}')
 
         latest_underlying_price = df['underlying_price'].iloc[0] if not df.empty else None
@@ -103,68 +88,129 @@ def fetch_spd_data(selected_timestamp, selected_expiration):
         print(f"⚠️ Error fetching SPD data: {e}")
         return None, None, None
 
-    finally:
-        conn.close()
 
+# **5. Precomputed SPD entry (spd_surface.py), computed and stored here when missing**
+def fetch_spd_entry(selected_timestamp, selected_expiration):
+    pair = (int(selected_timestamp), int(selected_expiration))
+    try:
+        entry = spd_surface.read_surface([pair[1]], pair[0], pair[0] + 1)
+        if entry.empty:
+            spd_surface.update_surface(storage, pairs=[pair], workers=0)
+            entry = spd_surface.read_surface([pair[1]], pair[0], pair[0] + 1)
+    except Exception as e:
+        print(f"⚠️ Error reading the SPD surface: {e}")
+        return None
+
+    # Snapshots without enough strikes are stored with NaN moments
+    entry = entry.dropna(subset=['skewness'])
+    return None if entry.empty else entry.iloc[-1]
+
+
+class SPDResultCache:
+    """
+    Bounded LRU cache of (timestamp, expiration) -> (moneyness_support, spds, iv_curve, skewness).
+    Filled by the worker thread and read by the UI, hence the lock.
+    """
+    def __init__(self, maxsize: int = 128) -> None:
+        self.maxsize: int = maxsize
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def get(self, key: tuple):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: tuple, entry: tuple) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def __contains__(self, key: tuple) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+spd_cache = SPDResultCache()
+# One thread does all DB reads, fits and surface writes, so the window never blocks on them
+worker = None
+loading: dict = {}  # (timestamp, expiration) -> future of load_spd_result
+requested = None    # the (timestamp, expiration) whose plot the user is waiting for
+paging = None       # future of the timestamp page being loaded, at most one at a time
+
+
+# **6. Load an SPD Result (worker thread)**
+def load_spd_result(unix_time, unix_exp):
+    key = (int(unix_time), int(unix_exp))
+    cached = spd_cache.get(key)  # prefetched after the request was queued
+    if cached is not None:
+        return cached
+
+    if spd_surface.available():
+        entry = fetch_spd_entry(unix_time, unix_exp)
+        if entry is None:
+            raise ValueError("No SPD data found for the selected time and expiration.")
+
+        # Only the density is re-evaluated; the curve points and moments come from the surface
+        iv_curve = pd.DataFrame({'log_moneyness': entry['curve_log_moneyness'], 'mark_iv': entry['curve_iv']})
+        moneyness_support, spds = spd_from_curve(iv_curve['log_moneyness'].to_numpy(), iv_curve['mark_iv'].to_numpy(),
+                                                 entry['underlying_price'], entry['remaining_maturity'],
+                                                 grid_points)[:2]
+        spd_skewness = entry['skewness']
+    else:
+        df, latest_underlying_price, remaining_maturity = fetch_spd_data(unix_time, unix_exp)
+
+        if df is None or df.empty:
+            raise ValueError("No SPD data found for the selected time and expiration.")
+
+        moneyness_support, spds, iv_curve, spd_skewness = compute_spd(df, latest_underlying_price,
+                                                                      remaining_maturity, grid_points)
 
-# **5. Compute SPD & Volatility Curve**
-def compute_spd(df, latest_underlying_price, remaining_maturity):
-    risk_free_rate = 0.043
+    if moneyness_support is None or spds is None:
+        logging.debug(moneyness_support)
+        logging.debug(spds)
+        raise ValueError("SPD calculation failed.")
 
-    call_data = df[df['option_type'] == 'call'].drop_duplicates('strike_price', keep='first').sort_values('strike_price')
-    call_data['log_moneyness'] = np.log(call_data["strike_price"]/latest_underlying_price)
-    put_data = df[df['option_type'] == 'put'].drop_duplicates('strike_price', keep='first').sort_values('strike_price')
-    put_data['log_moneyness'] = np.log(put_data["strike_price"]/latest_underlying_price)
+    result = (moneyness_support, spds, iv_curve, spd_skewness)
+    spd_cache.put(key, result)
+    return result
 
 
-    if len(call_data) < 3 or len(put_data) < 3:
-        return None, None, None, None
+# Main thread only; joins a load of the same key that is already queued or running
+def submit_load(key: tuple):
+    future = loading.get(key)
+    if future is None or future.done():
+        future = loading[key] = worker.submit(load_spd_result, *key)
+    return future
 
-    try:
-        iv_curve = pd.concat([put_data, call_data]).sort_values('log_moneyness')
-        print(f'iv_curve: {iv_curve}')
-        # **Compute average mark_iv for duplicate moneynesss**
-        iv_curve = iv_curve.groupby('log_moneyness', as_index=False)['mark_iv'].mean()
-        print(f'amount of data : {len(iv_curve)}')
-        logging.debug(iv_curve)
-        logging.debug(remaining_maturity)
-        cs_iv_curve = CubicSpline(iv_curve['log_moneyness'].astype(float), iv_curve['mark_iv'].astype(float), extrapolate=True)
-        logging.debug(cs_iv_curve)
-
-        # Generate a fine grid for moneynesss
-        min_moneyness = iv_curve['log_moneyness'].min()
-        max_moneyness = iv_curve['log_moneyness'].max()
-        moneyness_grid = np.linspace(min_moneyness, max_moneyness, 1000)
-
-        # **Calculate SPD Using Volatility-Based Formula**
-        spds, moneyness_support = [], []
-
-        for moneyness in moneyness_grid:
-            sigma = cs_iv_curve(float(moneyness))
-            d2 = (-moneyness + (risk_free_rate - (sigma**2) / 2) * remaining_maturity) / (sigma * np.sqrt(remaining_maturity))
-            spd_value = np.exp(-d2 ** 2 / 2) / (sigma * np.exp(moneyness) * latest_underlying_price * np.sqrt(2 * np.pi * remaining_maturity))
-            spds.append(spd_value)
-            moneyness_support.append(float(moneyness))
-
-        spds_integral = np.trapezoid(spds, moneyness_support)
-        print(f"SPD_Integral_RAW : {spds_integral}")
-        spds /= spds_integral  # Normalize
-
-        # Compute SPD Skewness
-        mean_moneyness = np.trapezoid(spds * moneyness_support, moneyness_support)  # Expected value (mean)
-        print(f"mean_moneyness: {mean_moneyness}")
-        std_moneyness = np.sqrt(np.trapezoid((spds * (moneyness_support - mean_moneyness)**2), moneyness_support))  # Standard deviation
-        spd_skewness = np.trapezoid((spds * (moneyness_support - mean_moneyness)**3), moneyness_support) / std_moneyness**3  # Skewness formula
-
-        return moneyness_support, spds, iv_curve, spd_skewness
 
-    except Exception as e:
-        print(f"⚠️ Error processing SPD: {e}")
-        return None, None, None, None
+# Speculative loads of the timestamps next to the selection, nearest first
+def prefetch_neighbours(unix_time, unix_exp):
+    times = [ts for _, ts in timestamp_options]
+    if unix_time not in times:
+        return
+    index = times.index(unix_time)
+    for offset in range(1, PREFETCH_NEIGHBOURS + 1):
+        for neighbour in (index - offset, index + offset):
+            if 0 <= neighbour < len(times) and (times[neighbour], unix_exp) not in spd_cache:
+                submit_load((times[neighbour], unix_exp))
 
 
-# **6. Update SPD & Volatility Curve Plots**
-def update_spd_plot():
+# **7. Update SPD & Volatility Curve Plots**
+def update_spd_plot(*_):
+    global requested
     selected_time = time_var.get()
     selected_expiration = exp_var.get()
 
@@ -174,23 +220,128 @@ def update_spd_plot():
 
     unix_time = dict(timestamp_options)[selected_time]
     unix_exp = dict(expiration_options)[selected_expiration]
+    requested = (unix_time, unix_exp)
+
+    # Prefetches for the previous selection that have not started yet are no longer useful
+    for key, future in list(loading.items()):
+        if key != requested:
+            future.cancel()
+        if future.done():
+            del loading[key]
+
+    result = spd_cache.get(requested)
+    if result is not None:
+        draw_spd_plot(result, selected_time, selected_expiration)
+    else:
+        status_var.set("Loading…")
+        wait_for_result(requested, submit_load(requested), selected_time, selected_expiration)
+    prefetch_neighbours(unix_time, unix_exp)
+
+
+def wait_for_result(key, future, selected_time, selected_expiration):
+    if not future.done():
+        root.after(POLL_MS, wait_for_result, key, future, selected_time, selected_expiration)
+        return
+    if key != requested or future.cancelled():
+        return  # superseded by a newer selection
+
+    status_var.set("")
+    try:
+        result = future.result()
+    except Exception as e:
+        messagebox.showerror("Error", str(e))
+        return
+    draw_spd_plot(result, selected_time, selected_expiration)
+
 
-    df, latest_underlying_price, remaining_maturity = fetch_spd_data(unix_time, unix_exp)
+# **8. Paging of the Time List (newest first)**
+def show_timestamps(options):
+    global timestamp_options
+    timestamp_options = options
+    time_box['values'] = [label for label, _ in timestamp_options]
+    if timestamp_options and time_var.get() not in dict(timestamp_options):
+        time_var.set(timestamp_options[0][0])
 
-    if df is None or df.empty:
-        messagebox.showerror("Error", "No SPD data found for the selected time and expiration.")
+
+# Main thread only; queries a page of timestamps on the worker and passes it to `on_page` once loaded
+def request_timestamps(before, on_page) -> bool:
+    global paging
+    if paging is not None:
+        return False
+    paging = worker.submit(fetch_available_timestamps, before=before)
+    wait_for_page(paging, on_page)
+    return True
+
+
+def wait_for_page(future, on_page):
+    global paging
+    if not future.done():
+        root.after(POLL_MS, wait_for_page, future, on_page)
         return
+    paging = None
+    try:
+        page = future.result()
+    except Exception as e:
+        messagebox.showerror("Error", str(e))
+        return
+    on_page(page)
 
-    moneyness_support, spds, iv_curve, spd_skewness = compute_spd(df, latest_underlying_price, remaining_maturity)
 
-    if moneyness_support is None or spds is None:
-        messagebox.showerror("Error", "SPD calculation failed.")
-        logging.debug(moneyness_support)
-        logging.debug(spds)
+# Appends the page older than the last listed time; `then(loaded)` runs once it arrived
+def load_older_timestamps(then=None):
+    if not timestamp_options:
+        return
+    before = timestamp_options[-1][1]
+
+    def on_page(page):
+        # A jump to another date while the page was loading replaced the list
+        if page and timestamp_options and timestamp_options[-1][1] == before:
+            show_timestamps(timestamp_options + page)
+        if then is not None:
+            then(bool(page))
+
+    request_timestamps(before, on_page)
+
+
+# Lists the page of timestamps up to the end of the entered date (YYYY-MM-DD), or the newest if empty
+def jump_to_date(*_):
+    text = date_var.get().strip()
+    try:
+        before = int((datetime.strptime(text, '%Y-%m-%d') + timedelta(days=1)).timestamp() * 1000) if text else None
+    except ValueError:
+        messagebox.showerror("Error", "Please enter the date as YYYY-MM-DD.")
+        return
+    request_timestamps(before, show_date_page)
+
+
+def show_date_page(page):
+    if not page:
+        messagebox.showerror("Error", "No SPD timestamps on or before that date.")
         return
+    time_var.set(page[0][0])
+    show_timestamps(page)
+
+
+# Steps the time selection by `step` entries of the combobox, paging in older times past the end
+def step_time(step: int, page_in: bool = True):
+    labels = [label for label, _ in timestamp_options]
+    if time_var.get() in labels:
+        index = labels.index(time_var.get()) + step
+        if index >= len(labels) and page_in:
+            # Steps again once the older page is listed (or clamps to the oldest if there is none)
+            load_older_timestamps(then=lambda _: step_time(step, page_in=False))
+            return
+        index = min(max(index, 0), len(labels) - 1)
+        time_var.set(labels[index])
+        update_spd_plot()
+
+
+def draw_spd_plot(result, selected_time, selected_expiration):
+    moneyness_support, spds, iv_curve, spd_skewness = result
+    status_var.set(f"cache: {len(spd_cache)} entries, {spd_cache.hits} hits / {spd_cache.misses} misses")
 
     ax1.clear()
-    ax1.plot(moneyness_support, spds, linestyle='-', marker='o', color='blue')
+    ax1.plot(moneyness_support, spds, linestyle='-', marker='o' if len(spds) <= 2000 else None, color='blue')
     ax1.set_title(f"SPD at {selected_time} (Exp: {selected_expiration})\nSPD Skewness: {spd_skewness:.4f}")
     ax1.set_xlabel("Log moneyness")
     ax1.set_ylabel("State Price Density")
@@ -205,27 +356,219 @@ def update_spd_plot():
     fig.tight_layout(pad=2.0)
     canvas.draw()
 
-# **7. GUI Setup**
-root = tk.Tk()
-root.title("SPD & Volatility Tracker")
-root.geometry("900x700")
 
-timestamp_options = fetch_available_timestamps()
-expiration_options = fetch_available_expirations()
+# **9. Animation Frames for One Expiration (worker thread; missing entries are fitted in a process pool)**
+frame_cache = SPDResultCache(maxsize=4)
+
+
+def load_frames(unix_exp, start_ms, end_ms):
+    key = (int(unix_exp), int(start_ms), int(end_ms))
+    cached = frame_cache.get(key)
+    if cached is not None:
+        return cached
+
+    pairs = spd_surface.snapshot_pairs(storage, start_ms, end_ms, [unix_exp])
+    if not pairs:
+        raise ValueError("No SPD snapshots for this expiration in the selected range.")
+    if spd_surface.available():
+        # Spawned, not forked: this process runs the Tk loop, the worker thread and Arrow's threads
+        spd_surface.update_surface(storage, pairs=pairs, workers=animation_workers,
+                                   mp_context=multiprocessing.get_context("spawn"))
+        entries = spd_surface.read_surface([unix_exp], start_ms, end_ms).dropna(subset=['skewness'])
+    else:
+        ticks = read_history(storage, TICK_TABLE, spd_surface.TICK_COLUMNS, start_ms - LOOKBACK_MS, end_ms,
+                             expirations=[unix_exp])
+        entries = compute_spd_batch(ticks, pairs)[0].sort_values('timestamp')
+    if entries.empty:
+        raise ValueError("SPD calculation failed for every snapshot in the range.")
+
+    curves = list(zip(entries['curve_log_moneyness'], entries['curve_iv']))
+    grids, spds, _, _, skewness, _ = spd_curves(curves, entries['underlying_price'], entries['remaining_maturity'],
+                                                min(grid_points, ANIMATION_GRID_POINTS))
+    frames = {'timestamps': entries['timestamp'].to_numpy(), 'grids': grids, 'spds': spds,
+              'skewness': skewness, 'curves': curves}
+    frame_cache.put(key, frames)
+    return frames
+
+
+# **10. Time-Scrubbing Animation of One Expiration**
+class AnimationWindow:
+    """
+    SPD and IV curve of one expiration over time, with a slider and play/pause.
+    The frames are precomputed arrays, so scrubbing only moves two lines.
+    """
+    def __init__(self, frames: dict, expiration_label: str) -> None:
+        self.frames = frames
+        self.playing = False
+        self.window = tk.Toplevel(root)
+        self.window.title(f"SPD over time (Exp: {expiration_label})")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        self.fig, (self.ax1, self.ax2) = plt.subplots(2, figsize=(8, 7))
+        self.spd_line, = self.ax1.plot([], [], linestyle='-', color='blue')
+        self.iv_line, = self.ax2.plot([], [], linestyle='-', marker='o', color='red', label="IV")
+        # Fixed limits over all frames, so the motion is the density's and not the axes'
+        all_ivs = np.concatenate([iv for _, iv in frames['curves']])
+        self.ax1.set_xlim(frames['grids'].min(), frames['grids'].max())
+        self.ax1.set_ylim(0, np.nanmax(frames['spds']) * 1.05)
+        self.ax1.set_xlabel("Log moneyness")
+        self.ax1.set_ylabel("State Price Density")
+        self.ax2.set_xlim(frames['grids'].min(), frames['grids'].max())
+        self.ax2.set_ylim(all_ivs.min() * 0.95, all_ivs.max() * 1.05)
+        self.ax2.set_title("Volatility Curve")
+        self.ax2.set_xlabel("Log moneyness")
+        self.ax2.set_ylabel("Implied Volatility")
+        self.ax2.legend()
+        self.fig.tight_layout(pad=2.0)
+        self.canvas = FigureCanvasTkAgg(self.fig, master=self.window)
+        self.canvas.get_tk_widget().pack()
+
+        self.position = tk.IntVar(value=0)
+        tk.Scale(self.window, from_=0, to=len(frames['timestamps']) - 1, orient=tk.HORIZONTAL, showvalue=False,
+                 variable=self.position, command=self.show, length=700).pack(fill=tk.X)
+        controls = ttk.Frame(self.window)
+        controls.pack()
+        self.play_button = tk.Button(controls, text="▶ Play", command=self.toggle)
+        self.play_button.pack(side=tk.LEFT)
+        ttk.Label(controls, text="Frames/s:").pack(side=tk.LEFT)
+        self.fps = tk.IntVar(value=10)
+        tk.Scale(controls, from_=1, to=30, orient=tk.HORIZONTAL, variable=self.fps).pack(side=tk.LEFT)
+        self.show(0)
+
+    def show(self, index) -> None:
+        index = int(index)
+        self.spd_line.set_data(self.frames['grids'][index], self.frames['spds'][index])
+        self.iv_line.set_data(*self.frames['curves'][index])
+        time_label = datetime.fromtimestamp(self.frames['timestamps'][index] / 1000).strftime('%Y-%m-%d %H:%M:%S')
+        self.ax1.set_title(f"SPD at {time_label} ({index + 1}/{len(self.frames['timestamps'])})\n"
+                           f"SPD Skewness: {self.frames['skewness'][index]:.4f}")
+        self.canvas.draw_idle()
+
+    def toggle(self) -> None:
+        self.playing = not self.playing
+        self.play_button.config(text="⏸ Pause" if self.playing else "▶ Play")
+        if self.playing:
+            self.advance()
+
+    def advance(self) -> None:
+        if not self.playing:
+            return
+        index = (self.position.get() + 1) % len(self.frames['timestamps'])
+        self.position.set(index)
+        self.show(index)
+        self.window.after(int(1000 / self.fps.get()), self.advance)
+
+    def close(self) -> None:
+        self.playing = False
+        plt.close(self.fig)
+        self.window.destroy()
+
+
+def open_animation():
+    selected_time = time_var.get()
+    selected_expiration = exp_var.get()
+    if not selected_time or not selected_expiration:
+        messagebox.showerror("Error", "Please select both timestamp and expiration!")
+        return
+    try:
+        hours = float(hours_var.get())
+    except ValueError:
+        messagebox.showerror("Error", "Please enter the range in hours.")
+        return
+
+    # The range ends at the selected time
+    end_ms = dict(timestamp_options)[selected_time] + 1
+    future = worker.submit(load_frames, dict(expiration_options)[selected_expiration],
+                           end_ms - int(hours * 3600 * 1000), end_ms)
+    status_var.set("Computing frames…")
+    wait_for_frames(future, selected_expiration)
 
-time_var = tk.StringVar(value=timestamp_options[0][0])
-exp_var = tk.StringVar(value=expiration_options[0][0])
 
-ttk.Label(root, text="Select SPD Time:").pack()
-ttk.Combobox(root, textvariable=time_var, values=[x[0] for x in timestamp_options]).pack()
+def wait_for_frames(future, selected_expiration):
+    if not future.done():
+        root.after(POLL_MS, wait_for_frames, future, selected_expiration)
+        return
 
-ttk.Label(root, text="Select Expiration:").pack()
-ttk.Combobox(root, textvariable=exp_var, values=[x[0] for x in expiration_options]).pack()
+    status_var.set("")
+    try:
+        frames = future.result()
+    except Exception as e:
+        messagebox.showerror("Error", str(e))
+        return
+    AnimationWindow(frames, selected_expiration)
 
-tk.Button(root, text="Show SPD", command=update_spd_plot).pack()
 
-fig, (ax1, ax2) = plt.subplots(2, figsize=(8, 8))
-canvas = FigureCanvasTkAgg(fig, master=root)
-canvas.get_tk_widget().pack()
+if __name__ == "__main__":
+    logging.basicConfig(
+        level='DEBUG',
+        format='%(asctime)s | %(levelname)s | %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
 
-root.mainloop()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Browse state price densities by time and expiration.")
+    parser.add_argument("--grid-points", type=int, default=DEFAULT_GRID_POINTS,
+                        help="log-moneyness points the SPD is evaluated on")
+    parser.add_argument("--cache-size", type=int, default=128, help="SPD results kept in memory")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processes fitting missing animation frames (default: one per CPU)")
+    args = parser.parse_args()
+    animation_workers = args.workers
+    grid_points = args.grid_points
+    spd_cache = SPDResultCache(args.cache_size)
+    worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="spd-worker")
+
+    storage = shared_storage()
+
+    # **11. GUI Setup**
+    root = tk.Tk()
+    root.title("SPD & Volatility Tracker")
+    root.geometry("900x700")
+
+    timestamp_options = fetch_available_timestamps()
+    expiration_options = fetch_available_expirations()
+
+    time_var = tk.StringVar(value=timestamp_options[0][0])
+    exp_var = tk.StringVar(value=expiration_options[0][0])
+
+    ttk.Label(root, text="Select SPD Time:").pack()
+    time_row = ttk.Frame(root)
+    time_row.pack()
+    tk.Button(time_row, text="◀", command=lambda: step_time(-1)).pack(side=tk.LEFT)
+    time_box = ttk.Combobox(time_row, textvariable=time_var, values=[x[0] for x in timestamp_options])
+    time_box.pack(side=tk.LEFT)
+    time_box.bind("<<ComboboxSelected>>", update_spd_plot)
+    tk.Button(time_row, text="▶", command=lambda: step_time(1)).pack(side=tk.LEFT)
+    tk.Button(time_row, text="Load older", command=load_older_timestamps).pack(side=tk.LEFT)
+
+    date_row = ttk.Frame(root)
+    date_row.pack()
+    ttk.Label(date_row, text="Up to date (YYYY-MM-DD):").pack(side=tk.LEFT)
+    date_var = tk.StringVar(value="")
+    date_entry = ttk.Entry(date_row, textvariable=date_var, width=12)
+    date_entry.pack(side=tk.LEFT)
+    date_entry.bind("<Return>", jump_to_date)
+    tk.Button(date_row, text="Go", command=jump_to_date).pack(side=tk.LEFT)
+
+    ttk.Label(root, text="Select Expiration:").pack()
+    exp_box = ttk.Combobox(root, textvariable=exp_var, values=[x[0] for x in expiration_options])
+    exp_box.pack()
+    exp_box.bind("<<ComboboxSelected>>", update_spd_plot)
+
+    tk.Button(root, text="Show SPD", command=update_spd_plot).pack()
+
+    animate_row = ttk.Frame(root)
+    animate_row.pack()
+    ttk.Label(animate_row, text="Animate the last").pack(side=tk.LEFT)
+    hours_var = tk.StringVar(value="24")
+    ttk.Entry(animate_row, textvariable=hours_var, width=5).pack(side=tk.LEFT)
+    ttk.Label(animate_row, text="hours up to the selected time").pack(side=tk.LEFT)
+    tk.Button(animate_row, text="Animate", command=open_animation).pack(side=tk.LEFT)
+    status_var = tk.StringVar(value="")
+    ttk.Label(root, textvariable=status_var).pack()
+
+    fig, (ax1, ax2) = plt.subplots(2, figsize=(8, 8))
+    canvas = FigureCanvasTkAgg(fig, master=root)
+    canvas.get_tk_widget().pack()
+
+    root.mainloop()
+    worker.shutdown(wait=False, cancel_futures=True)
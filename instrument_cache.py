@@ -0,0 +1,76 @@
+import re
+from collections import OrderedDict
+from datetime import datetime
+
+INSTRUMENT_NAME_PATTERN = re.compile(r'-(\d{2}[A-Z]{3}\d{2})-(\d+)-([CP])')
+NOT_PARSED = (None, None, None, None)
+
+
+# Extract (strike_price, option_type, expiration_timestamp, date_str) from e.g. BTC-28MAR25-90000-C
+def parse_instrument_name(instr_name: str) -> tuple:
+    match = INSTRUMENT_NAME_PATTERN.search(instr_name)
+    if match:
+        date_str = match.group(1)
+        strike_price = float(match.group(2))
+        option_type = "call" if match.group(3) == "C" else "put"
+
+        try:
+            expiration_date = datetime.strptime(date_str, "%d%b%y")
+            expiration_timestamp = int(expiration_date.timestamp())
+        except ValueError:
+            expiration_timestamp = None
+
+        return strike_price, option_type, expiration_timestamp, date_str
+
+    return NOT_PARSED
+
+
+class InstrumentNameCache:
+    """
+    Bounded LRU cache of instrument name -> parse_instrument_name() result.
+    Names whose expiration is not tracked are rejected from the date token alone,
+    without running the regex or strptime, and cached as NOT_PARSED.
+    """
+    def __init__(self, maxsize: int = 4096, tracked_dates=None) -> None:
+        self.maxsize: int = maxsize
+        self.tracked_dates = set(tracked_dates) if tracked_dates is not None else None
+        self._entries: OrderedDict = OrderedDict()
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def set_tracked_dates(self, tracked_dates) -> None:
+        self.tracked_dates = set(tracked_dates) if tracked_dates is not None else None
+        # Cached rejections depend on the tracked set
+        self._entries.clear()
+
+    def get(self, instr_name: str) -> tuple:
+        entry = self._entries.get(instr_name)
+        if entry is not None:
+            self._entries.move_to_end(instr_name)
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        parts = instr_name.split('-')
+        if self.tracked_dates is not None and (len(parts) < 4 or parts[1] not in self.tracked_dates):
+            entry = NOT_PARSED
+        else:
+            entry = parse_instrument_name(instr_name)
+
+        self._entries[instr_name] = entry
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return entry
+
+    def evict_expired(self, now_ts: float) -> int:
+        """
+        Drops instruments whose expiration has passed. Returns the number evicted.
+        """
+        expired = [name for name, entry in self._entries.items()
+                   if entry[2] is not None and entry[2] <= now_ts]
+        for name in expired:
+            del self._entries[name]
+        return len(expired)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,73 @@
+import numpy as np
+
+OPTION_TYPES = ("call", "put")
+
+
+class ExpiryCurve:
+    """
+    Latest mark IV, underlying price and timestamp per (strike, option type)
+    for one expiry, held in strike-indexed NumPy arrays updated in place.
+    """
+    def __init__(self, capacity: int = 64) -> None:
+        self.strike_rows: dict = {}
+        self.strikes = np.full(capacity, np.nan)
+        self.mark_iv = np.full((capacity, 2), np.nan)
+        self.underlying_prices = np.full((capacity, 2), np.nan)
+        self.timestamps = np.zeros((capacity, 2), dtype=np.int64)
+        self.size: int = 0
+
+    def update(self, strike_price: float, option_type: str, mark_iv: float,
+               underlying_price: float, timestamp: int) -> None:
+        row = self.strike_rows.get(strike_price)
+        if row is None:
+            row = self._add_strike(strike_price)
+        column = OPTION_TYPES.index(option_type)
+        self.mark_iv[row, column] = mark_iv
+        self.underlying_prices[row, column] = underlying_price
+        self.timestamps[row, column] = timestamp
+
+    def _add_strike(self, strike_price: float) -> int:
+        if self.size == len(self.strikes):
+            # New strikes are listed rarely; grow by doubling
+            capacity = 2 * len(self.strikes)
+            self.strikes = np.resize(self.strikes, capacity)
+            self.strikes[self.size:] = np.nan
+            for name in ("mark_iv", "underlying_prices"):
+                grown = np.full((capacity, 2), np.nan)
+                grown[:self.size] = getattr(self, name)[:self.size]
+                setattr(self, name, grown)
+            grown = np.zeros((capacity, 2), dtype=np.int64)
+            grown[:self.size] = self.timestamps[:self.size]
+            self.timestamps = grown
+        row = self.size
+        self.strikes[row] = strike_price
+        self.strike_rows[strike_price] = row
+        self.size += 1
+        return row
+
+    def snapshot(self, since_ms: int = 0):
+        """
+        Quotes updated at or after `since_ms`, as
+        {timestamp, underlying_price, call_strikes, call_iv, put_strikes, put_iv},
+        or None when nothing qualifies. `timestamp` and `underlying_price` come
+        from the most recent update, like the newest row of the DB query.
+        """
+        if self.size == 0:
+            return None
+        timestamps = self.timestamps[:self.size]
+        fresh = timestamps >= max(since_ms, 1)
+        if not fresh.any():
+            return None
+
+        latest = np.unravel_index(np.argmax(np.where(fresh, timestamps, -1)), timestamps.shape)
+        snapshot = {
+            "timestamp": int(timestamps[latest]),
+            "underlying_price": float(self.underlying_prices[:self.size][latest]),
+        }
+        for column, option_type in enumerate(OPTION_TYPES):
+            mask = fresh[:, column]
+            strikes = self.strikes[:self.size][mask]
+            order = np.argsort(strikes)
+            snapshot[f"{option_type}_strikes"] = strikes[order]
+            snapshot[f"{option_type}_iv"] = self.mark_iv[:self.size, column][mask][order]
+        return snapshot
@@ -0,0 +1,101 @@
+import argparse
+import logging
+import re
+from datetime import datetime, timedelta, timezone
+
+import mysql.connector
+
+from storage import mysql_connect_args
+
+PARTITIONED_TABLES = ("btc_options_raw", "btc_options_tick")
+DAILY_PARTITION_PATTERN = re.compile(r"^p(\d{8})$")
+
+
+# Millisecond timestamp of 00:00 UTC on `day`
+def day_start_ms(day) -> int:
+    return int(datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def day_of_ms(timestamp_ms: int):
+    return datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc).date()
+
+
+def existing_partitions(cursor, table: str) -> list:
+    cursor.execute("""
+        SELECT PARTITION_NAME, PARTITION_DESCRIPTION
+        FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+        ORDER BY PARTITION_ORDINAL_POSITION
+    """, (table,))
+    return cursor.fetchall()
+
+
+def ensure_daily_partitions(cursor, table: str, first_day, last_day) -> int:
+    """
+    Splits `p_future` so every UTC day from `first_day` to `last_day` has its own
+    partition `pYYYYMMDD`. Days before `first_day` not yet covered go into one
+    catch-all partition. Returns the number of partitions added.
+    """
+    bounds = [int(description) for _, description in existing_partitions(cursor, table)
+              if description != "MAXVALUE"]
+    if not bounds:
+        raise ValueError(f"{table} is not range partitioned on timestamp")
+    covered_until = max(bounds)
+
+    clauses = []
+    day = day_of_ms(covered_until)
+    if day < first_day:
+        clauses.append(f"PARTITION p_until_{first_day:%Y%m%d} VALUES LESS THAN ({day_start_ms(first_day)})")
+        day = first_day
+    while day <= last_day:
+        upper = day_start_ms(day + timedelta(days=1))
+        if upper > covered_until:
+            clauses.append(f"PARTITION p{day:%Y%m%d} VALUES LESS THAN ({upper})")
+        day += timedelta(days=1)
+
+    if not clauses:
+        return 0
+
+    clauses.append("PARTITION p_future VALUES LESS THAN MAXVALUE")
+    cursor.execute(f"ALTER TABLE {table} REORGANIZE PARTITION p_future INTO ({', '.join(clauses)})")
+    return len(clauses) - 1
+
+
+def drop_expired_partitions(cursor, table: str, retention_days: int) -> int:
+    """
+    Drops daily partitions that end before `retention_days` ago. Returns the number dropped.
+    """
+    cutoff = day_start_ms(datetime.now(timezone.utc).date() - timedelta(days=retention_days))
+    expired = [name for name, description in existing_partitions(cursor, table)
+               if DAILY_PARTITION_PATTERN.match(name) and description != "MAXVALUE" and int(description) <= cutoff]
+    if expired:
+        cursor.execute(f"ALTER TABLE {table} DROP PARTITION {', '.join(expired)}")
+    return len(expired)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level='INFO',
+        format='%(asctime)s | %(levelname)s | %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+
+    parser = argparse.ArgumentParser(description="Add upcoming daily partitions to the tick tables (run daily).")
+    parser.add_argument("--days-ahead", type=int, default=7)
+    parser.add_argument("--retention-days", type=int, default=None,
+                        help="drop daily partitions older than this many days")
+    args = parser.parse_args()
+
+    # Partitioning is MySQL-only; connection settings come from STORAGE_URL like the other scripts
+    conn = mysql.connector.connect(**mysql_connect_args())
+    cursor = conn.cursor()
+
+    today = datetime.now(timezone.utc).date()
+    for table in PARTITIONED_TABLES:
+        added = ensure_daily_partitions(cursor, table, today, today + timedelta(days=args.days_ahead))
+        logging.info(f"{table}: added {added} partitions")
+        if args.retention_days is not None:
+            dropped = drop_expired_partitions(cursor, table, args.retention_days)
+            logging.info(f"{table}: dropped {dropped} partitions")
+
+    conn.close()
@@ -0,0 +1,125 @@
+import gzip
+import logging
+import os
+import queue
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+
+JOURNAL_PREFIX = "frames-"
+JOURNAL_SUFFIX = ".log.gz"
+
+
+def journal_files(path: str) -> list:
+    """
+    Journal files under `path` (a directory or a single file), oldest first.
+    """
+    if os.path.isfile(path):
+        return [path]
+    return [os.path.join(path, name) for name in sorted(os.listdir(path))
+            if name.startswith(JOURNAL_PREFIX) and name.endswith(JOURNAL_SUFFIX)]
+
+
+def read_journal(path: str):
+    """
+    Yields the (received_at, frame) pairs of a journal in recording order.
+    A file cut short by a crash is read up to its last complete flush.
+    """
+    for file_path in journal_files(path):
+        with gzip.open(file_path, "rt", encoding="utf-8") as f:
+            try:
+                for line in f:
+                    received_at, _, frame = line.rstrip("\n").partition("\t")
+                    if frame:
+                        yield float(received_at), frame
+            except (EOFError, zlib.error):
+                logging.warning(f"⚠️ {file_path} ends with a truncated block")
+
+
+class FrameRecorder:
+    """
+    Journals raw WebSocket frames with their local receive time to gzip files under
+    `directory`, one `<received_at>\\t<frame>` line each. A file is rotated after
+    `max_bytes` of frames or `max_seconds`. Compression and disk writes run on a
+    background thread, so `record` never blocks the receive loop.
+    """
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024, max_seconds: float = 3600.0,
+                 compresslevel: int = 6, flush_interval: float = 1.0) -> None:
+        self.directory: str = directory
+        self.max_bytes: int = max_bytes
+        self.max_seconds: float = max_seconds
+        self.compresslevel: int = compresslevel
+        self.flush_interval: float = flush_interval
+        self.frames_recorded: int = 0
+        self.files_written: int = 0
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._file = None
+        self._file_bytes: int = 0
+        self._file_opened: float = 0.0
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="frame-recorder", daemon=True)
+        self._thread.start()
+
+    def record(self, received_at: float, frame: str) -> None:
+        self._queue.put((received_at, frame))
+
+    def close(self) -> None:
+        """
+        Writes the frames still queued and closes the current file.
+        """
+        self._queue.put(None)
+        self._thread.join()
+
+    def _open(self, received_at: float) -> None:
+        stamp = datetime.fromtimestamp(received_at, tz=timezone.utc).strftime("%Y%m%dT%H%M%S")
+        path = os.path.join(self.directory, f"{JOURNAL_PREFIX}{stamp}{JOURNAL_SUFFIX}")
+        suffix = 1
+        while os.path.exists(path):
+            path = os.path.join(self.directory, f"{JOURNAL_PREFIX}{stamp}.{suffix}{JOURNAL_SUFFIX}")
+            suffix += 1
+        self._file = gzip.open(path, "wt", encoding="utf-8", compresslevel=self.compresslevel)
+        self._file_bytes = 0
+        self._file_opened = time.monotonic()
+        self.files_written += 1
+        logging.info(f"Recording frames to {path}")
+
+    def _close_file(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write(self, received_at: float, frame: str) -> None:
+        if self._file is not None and (self._file_bytes >= self.max_bytes
+                                       or time.monotonic() - self._file_opened >= self.max_seconds):
+            self._close_file()
+        if self._file is None:
+            self._open(received_at)
+        # One frame per line; JSON never needs a raw newline
+        line = f"{received_at:.6f}\t{frame.replace(chr(10), ' ')}\n"
+        self._file.write(line)
+        self._file_bytes += len(line)
+        self.frames_recorded += 1
+
+    def _run(self) -> None:
+        dirty = False
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = False
+            if item is None:
+                break
+            if item:
+                try:
+                    self._write(*item)
+                    dirty = True
+                except Exception as e:
+                    logging.error(f"⚠️ Could not record frame: {e}")
+            # A sync flush every `flush_interval` keeps the journal readable if the process dies
+            if dirty and self._file is not None and time.monotonic() - last_flush >= self.flush_interval:
+                self._file.flush()
+                dirty = False
+                last_flush = time.monotonic()
+        self._close_file()
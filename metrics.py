@@ -0,0 +1,211 @@
+import asyncio
+import bisect
+import logging
+import time
+from collections import deque
+
+
+class LatencyHistogram:
+    """
+    Fixed-bucket histogram of durations in seconds.
+    Observing is O(log buckets); quantiles interpolate linearly within their bucket,
+    whose upper bound is capped at the largest value seen.
+    """
+    DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                       0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS) -> None:
+        self.buckets: tuple = tuple(sorted(buckets))
+        self.counts: list = [0] * (len(self.buckets) + 1)
+        self.count: int = 0
+        self.total: float = 0.0
+        self.max: float = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float):
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = min(self.buckets[i], self.max) if i < len(self.buckets) else self.max
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    @classmethod
+    def merge(cls, histograms) -> "LatencyHistogram":
+        """
+        One histogram over all observations of `histograms`, which share their buckets.
+        """
+        histograms = list(histograms)
+        merged = cls(histograms[0].buckets) if histograms else cls()
+        for histogram in histograms:
+            merged.counts = [a + b for a, b in zip(merged.counts, histogram.counts)]
+            merged.count += histogram.count
+            merged.total += histogram.total
+            merged.max = max(merged.max, histogram.max)
+        return merged
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.mean(),
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "max": self.max,
+        }
+
+
+class RateCounter:
+    """
+    Counts events and reports their rate per second over a sliding window.
+    """
+    def __init__(self, window: float = 10.0) -> None:
+        self.window: float = window
+        self.total: int = 0
+        self._events: deque = deque()
+        self._window_count: int = 0
+
+    def add(self, n: int = 1, now: float = None) -> None:
+        now = time.monotonic() if now is None else now
+        self.total += n
+        self._events.append((now, n))
+        self._window_count += n
+        self._expire(now)
+
+    def rate(self, now: float = None) -> float:
+        now = time.monotonic() if now is None else now
+        self._expire(now)
+        return self._window_count / self.window
+
+    def _expire(self, now: float) -> None:
+        while self._events and self._events[0][0] <= now - self.window:
+            _, n = self._events.popleft()
+            self._window_count -= n
+
+
+class Counter:
+    """
+    Monotonic event counter; `total` matches RateCounter so either can be exported.
+    """
+    def __init__(self) -> None:
+        self.total: int = 0
+
+    def inc(self, n: int = 1) -> None:
+        self.total += n
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+               for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+
+def _format_value(value) -> str:
+    return "NaN" if value is None else repr(float(value))
+
+
+class MetricsRegistry:
+    """
+    Histograms, counters and gauges by name and labels, rendered in the Prometheus
+    text exposition format. Existing LatencyHistogram/RateCounter objects can be
+    registered as they are, so components keep their own instruments.
+    """
+    def __init__(self, prefix: str = "") -> None:
+        self.prefix: str = prefix
+        self._families: dict = {}  # name -> [type, help, {sorted label items: metric}]
+
+    def _get(self, kind: str, name: str, help: str, labels: dict, factory):
+        family = self._families.setdefault(name, [kind, help, {}])
+        if help and not family[1]:
+            family[1] = help
+        key = tuple(sorted(labels.items()))
+        metric = family[2].get(key)
+        if metric is None:
+            metric = family[2][key] = factory()
+        return metric
+
+    def histogram(self, name: str, help: str = "", buckets: tuple = LatencyHistogram.DEFAULT_BUCKETS,
+                  **labels) -> LatencyHistogram:
+        return self._get("histogram", name, help, labels, lambda: LatencyHistogram(buckets))
+
+    def counter(self, name: str, help: str = "", **labels) -> Counter:
+        return self._get("counter", name, help, labels, Counter)
+
+    # `function` is called at every scrape and returns the current value
+    def gauge(self, name: str, function, help: str = "", **labels) -> None:
+        self._families.setdefault(name, ["gauge", help, {}])[2][tuple(sorted(labels.items()))] = function
+
+    def register(self, name: str, metric, help: str = "", **labels) -> None:
+        kind = "histogram" if isinstance(metric, LatencyHistogram) else "counter"
+        self._families.setdefault(name, [kind, help, {}])[2][tuple(sorted(labels.items()))] = metric
+
+    def render(self) -> str:
+        lines = []
+        for name, (kind, help, metrics) in self._families.items():
+            name = self.prefix + name
+            if help:
+                lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, metric in metrics.items():
+                if kind == "histogram":
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets, metric.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(labels + (('le', repr(bound)),))} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {metric.count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(metric.total)}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {metric.count}")
+                elif kind == "counter":
+                    lines.append(f"{name}{_format_labels(labels)} {metric.total}")
+                else:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(metric())}")
+        return "\n".join(lines) + "\n"
+
+
+async def serve_metrics(registry: MetricsRegistry, host: str = "127.0.0.1", port: int = 9108) -> None:
+    """
+    Minimal HTTP endpoint answering `GET /metrics` with the registry in Prometheus text
+    format. Runs on the caller's event loop; rendering is cheap enough to share it.
+    """
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            # Skip the headers
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            if len(request_line) >= 2 and request_line[0] == "GET" and request_line[1].split("?")[0] == "/metrics":
+                status, content_type, body = "200 OK", "text/plain; version=0.0.4; charset=utf-8", registry.render()
+            else:
+                status, content_type, body = "404 Not Found", "text/plain; charset=utf-8", "Not found\n"
+            body = body.encode()
+            writer.write(f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+                         f"Connection: close\r\n\r\n".encode() + body)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    try:
+        server = await asyncio.start_server(handle, host, port)
+    except OSError as e:
+        logging.error(f"⚠️ Metrics endpoint not started on {host}:{port}: {e}")
+        return
+    logging.info(f"Metrics served at http://{host}:{port}/metrics")
+    async with server:
+        await server.serve_forever()
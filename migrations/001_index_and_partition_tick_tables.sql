@@ -0,0 +1,90 @@
+-- Migrates an existing database to the indexed/partitioned schema in create_tables.sql.
+-- Stop websocket_client.py first: rows written during the copy would be lost.
+-- The copy takes a while on large tables; run it in a maintenance window.
+
+-- 1. btc_iv_spd_skewness: drop duplicate (timestamp, expiration_timestamp) rows, keeping the first
+DELETE s1 FROM btc_iv_spd_skewness s1
+JOIN btc_iv_spd_skewness s2
+  ON s1.timestamp = s2.timestamp
+ AND s1.expiration_timestamp = s2.expiration_timestamp
+ AND s1.id > s2.id;
+
+ALTER TABLE btc_iv_spd_skewness
+    ADD UNIQUE KEY uq_skew_time_expiration (timestamp, expiration_timestamp),
+    ADD KEY idx_skew_expiration_time (expiration_timestamp, timestamp);
+
+-- 2. btc_options_raw: copy into the partitioned layout, then swap
+CREATE TABLE btc_options_raw_new (
+    id BIGINT NOT NULL AUTO_INCREMENT,
+    timestamp BIGINT NOT NULL,
+    instrument_name VARCHAR(50) NOT NULL,
+    expiration_timestamp BIGINT NOT NULL,
+    option_type ENUM('call', 'put') NOT NULL,
+    bid_price FLOAT,
+    ask_price FLOAT,
+    bid_iv FLOAT,
+    ask_iv FLOAT,
+    underlying_price FLOAT,
+    strike_price FLOAT,
+    log_moneyness FLOAT,
+    delta FLOAT,
+    vega FLOAT,
+    theta FLOAT,
+    PRIMARY KEY (id, timestamp),
+    KEY idx_raw_time (timestamp),
+    KEY idx_raw_expiration_type_time (expiration_timestamp, option_type, timestamp)
+)
+PARTITION BY RANGE (timestamp) (
+    PARTITION p_history VALUES LESS THAN (1735689600000),
+    PARTITION p_future VALUES LESS THAN MAXVALUE
+);
+
+INSERT INTO btc_options_raw_new (
+    timestamp, instrument_name, expiration_timestamp, option_type, bid_price, ask_price,
+    bid_iv, ask_iv, underlying_price, strike_price, log_moneyness, delta, vega, theta
+)
+SELECT
+    timestamp, instrument_name, expiration_timestamp, option_type, bid_price, ask_price,
+    bid_iv, ask_iv, underlying_price, strike_price, log_moneyness, delta, vega, theta
+FROM btc_options_raw
+ORDER BY timestamp;
+
+RENAME TABLE btc_options_raw TO btc_options_raw_old, btc_options_raw_new TO btc_options_raw;
+
+-- 3. btc_options_tick: same for the mark IV ticks
+CREATE TABLE btc_options_tick_new (
+    id BIGINT NOT NULL AUTO_INCREMENT,
+    timestamp BIGINT NOT NULL,
+    instrument_name VARCHAR(50) NOT NULL,
+    underlying_price FLOAT,
+    strike_price FLOAT,
+    mid_price FLOAT,
+    mark_iv FLOAT,
+    expiration_timestamp BIGINT NOT NULL,
+    option_type ENUM('call', 'put') NOT NULL,
+    log_moneyness FLOAT,
+    collected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, timestamp),
+    KEY idx_tick_expiration_time (expiration_timestamp, timestamp),
+    KEY idx_tick_time (timestamp)
+)
+PARTITION BY RANGE (timestamp) (
+    PARTITION p_history VALUES LESS THAN (1735689600000),
+    PARTITION p_future VALUES LESS THAN MAXVALUE
+);
+
+INSERT INTO btc_options_tick_new (
+    timestamp, instrument_name, underlying_price, strike_price, mid_price, mark_iv,
+    expiration_timestamp, option_type, log_moneyness, collected_at
+)
+SELECT
+    timestamp, instrument_name, underlying_price, strike_price, mid_price, mark_iv,
+    expiration_timestamp, option_type, log_moneyness, collected_at
+FROM btc_options_tick
+ORDER BY timestamp;
+
+RENAME TABLE btc_options_tick TO btc_options_tick_old, btc_options_tick_new TO btc_options_tick;
+
+-- 4. Split p_future into daily partitions:  python manage_partitions.py --days-ahead 7
+-- Once the new tables are verified:
+-- DROP TABLE btc_options_raw_old, btc_options_tick_old;
@@ -0,0 +1,26 @@
+-- Adds the rollup bar table (see create_tables.sql, Table 4) to an existing database.
+CREATE TABLE btc_options_bar (
+    bar_timestamp BIGINT NOT NULL,
+    resolution_seconds SMALLINT NOT NULL,
+    instrument_name VARCHAR(50) NOT NULL,
+    expiration_timestamp BIGINT NOT NULL,
+    option_type ENUM('call', 'put') NOT NULL,
+    tick_count INT NOT NULL,
+    bid_price_last FLOAT,
+    bid_price_min FLOAT,
+    bid_price_max FLOAT,
+    ask_price_last FLOAT,
+    ask_price_min FLOAT,
+    ask_price_max FLOAT,
+    bid_iv_last FLOAT,
+    bid_iv_min FLOAT,
+    bid_iv_max FLOAT,
+    ask_iv_last FLOAT,
+    ask_iv_min FLOAT,
+    ask_iv_max FLOAT,
+    mark_iv_last FLOAT,
+    mark_iv_min FLOAT,
+    mark_iv_max FLOAT,
+    PRIMARY KEY (instrument_name, resolution_seconds, bar_timestamp),
+    KEY idx_bar_resolution_expiration_time (resolution_seconds, expiration_timestamp, option_type, bar_timestamp)
+);
@@ -0,0 +1,163 @@
+import argparse
+import asyncio
+import contextlib
+import itertools
+import logging
+import os
+import tempfile
+import time
+
+from clock import SimulatedClock
+from market_recorder import read_journal
+from storage import open_storage
+from websocket_client import OPTION_TICKER_CHANNEL_PATTERN, ORDER_METHODS, Strategy_RR
+from ws_pipeline import CONTROL, MARKET, PRIVATE, classify_frame
+
+
+class ReplayStrategy(Strategy_RR):
+    """
+    Strategy_RR fed from a frame journal instead of a WebSocket, on the journal's clock.
+    Requests are recorded and answered with an empty result. The option legs follow
+    the subscriptions acknowledged in the journal, i.e. the strikes chosen live.
+    """
+    def __init__(self, storage, clock: SimulatedClock) -> None:
+        super().__init__(None, None, None, bot_token=None, chat_id=None, storage=storage,
+                         clock=clock, autostart=False)
+        self.sent_requests: list = []  # (simulated time, method, params)
+
+    async def send_request(self, method: str, params: dict, wait: bool = True, timeout: float = None):
+        request_id = next(self.request_ids)
+        self.sent_requests.append((self.clock.time(), method, params))
+        return {"jsonrpc": "2.0", "id": request_id, "result": None} if wait else None
+
+    async def trade_alarm(self, message: str) -> None:
+        logging.info(f"Trade alarm at {self.clock.now()}: {message}")
+
+    async def handle_control_message(self, message: dict, received_at: float) -> None:
+        # (Un)subscribe acknowledgements list the channels
+        if 'id' in message and isinstance(message.get('result'), list):
+            self.follow_subscriptions(message['result'])
+        await super().handle_control_message(message, received_at)
+
+    def follow_subscriptions(self, channels: list) -> None:
+        option_channels = [channel for channel in channels
+                           if isinstance(channel, str) and OPTION_TICKER_CHANNEL_PATTERN.match(channel)]
+        if not option_channels:
+            return
+        for channel in option_channels:
+            date, strike, option_type = OPTION_TICKER_CHANNEL_PATTERN.match(channel).groups()
+            if date in self.selected_expirations_raw:
+                legs = self.otm_call if option_type == "C" else self.otm_put
+                legs[f"BTC-{date}"] = [int(strike)]
+        self.selected_expirations_subscribe = option_channels
+
+        near_far = [f"BTC-{self.expirations_pair[exp_ts]}" for exp_ts in self.selected_expirations[:2]]
+        if len(near_far) == 2 and all(key in self.otm_call and key in self.otm_put for key in near_far):
+            self.update_leg_instruments()
+        self.build_channel_routes()
+
+
+async def replay(strategy: ReplayStrategy, frames, speed: float = None) -> dict:
+    """
+    Feeds (received_at, frame) pairs through the strategy's parse and dispatch path and
+    the batched writer. `speed` is a multiple of real time; None replays as fast as possible.
+    Returns throughput and pipeline counters.
+    """
+    loop = asyncio.get_running_loop()
+    routes = {
+        CONTROL: (strategy.control_queue, strategy.handle_control_message),
+        MARKET: (strategy.market_queue, strategy.handle_market_message),
+        PRIVATE: (strategy.private_queue, strategy.handle_private_message),
+    }
+    writer = loop.create_task(strategy.db_writer.run())
+    tasks = [loop.create_task(strategy.close_stale_bars()),
+             loop.create_task(strategy.compute_spd_skewness()),
+             loop.create_task(strategy.should_execute())]
+
+    counts = dict.fromkeys(routes, 0)
+    first_at = last_at = None
+    started = time.perf_counter()
+    for received_at, frame in frames:
+        if first_at is None:
+            first_at = received_at
+        last_at = received_at
+        if speed:
+            wait = (received_at - first_at) / speed - (time.perf_counter() - started)
+            if wait > 0:
+                await asyncio.sleep(wait)
+        await strategy.clock.advance_to(received_at)
+
+        kind = classify_frame(frame)
+        queue, handler = routes[kind]
+        await strategy.process_frame(queue, handler, received_at, frame)
+        counts[kind] += 1
+        await asyncio.sleep(0)
+
+    for task in tasks:
+        task.cancel()
+    await strategy.queue_bars(strategy.bar_aggregator.close_all())
+    await strategy.db_writer.drain()
+    writer.cancel()
+    elapsed = time.perf_counter() - started
+
+    frames_total = sum(counts.values())
+    processing = strategy.market_queue.processing_latency.summary()
+    return {
+        "frames": frames_total,
+        **{f"{kind}_frames": count for kind, count in counts.items()},
+        "journal_seconds": round((last_at - first_at) if frames_total else 0.0, 3),
+        "wall_seconds": round(elapsed, 3),
+        "messages_per_sec": round(frames_total / elapsed, 1) if elapsed > 0 else None,
+        "rows_written": strategy.db_writer.rows_written.total,
+        "failed_rows": strategy.db_writer.failed_rows,
+        "late_bar_ticks": strategy.bar_aggregator.late_ticks,
+        "market_processing_p50": processing["p50"],
+        "market_processing_p99": processing["p99"],
+        "signal_evaluations": strategy.signal_latency.summary()["count"],
+        "orders_sent": sum(method in ORDER_METHODS for _, method, _ in strategy.sent_requests),
+    }
+
+
+def parse_speed(value: str):
+    return None if value.lower() == "max" else float(value)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level='WARNING',
+        format='%(asctime)s | %(levelname)s | %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+
+    parser = argparse.ArgumentParser(description="Replay a frame journal through the strategy.")
+    parser.add_argument("journal", help="journal directory (FRAME_JOURNAL_DIR) or a single journal file")
+    parser.add_argument("--expirations", required=True, help="DDMMMYY dates separated by commas, as at the prompt")
+    parser.add_argument("--perpetual", default="", help="dates using the PERPETUAL price, separated by commas")
+    parser.add_argument("--way", default="SHORT", choices=["SHORT", "LONG"])
+    parser.add_argument("--enabled", action="store_true", help="evaluate executions; margin checks are assumed to pass")
+    parser.add_argument("--speed", type=parse_speed, default=None, help="multiple of real time, or 'max' (default)")
+    parser.add_argument("--storage", default=None, help="storage URL to replay into (default: a throwaway SQLite file)")
+    parser.add_argument("--verbose", action="store_true", help="keep the per-tick output of the handlers")
+    args = parser.parse_args()
+
+    frames = read_journal(args.journal)
+    first = next(frames, None)
+    if first is None:
+        raise SystemExit(f"No frames in {args.journal}")
+
+    with tempfile.TemporaryDirectory() as scratch:
+        storage = open_storage(args.storage or f"sqlite://{os.path.join(scratch, 'replay.db')}")
+        strategy = ReplayStrategy(storage, SimulatedClock(first[0]))
+        strategy.set_expiration_dates(args.expirations.split(","), args.perpetual.split(","), args.way, args.enabled)
+        if args.enabled:
+            strategy.pre_margin_check_long = strategy.pre_margin_check_short = True
+
+        output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+        with output:
+            strategy.prepare()
+            result = strategy.loop.run_until_complete(
+                replay(strategy, itertools.chain([first], frames), args.speed))
+        storage.close()
+
+    for key, value in result.items():
+        print(f"{key:<24}{value}")
@@ -0,0 +1,181 @@
+import bisect
+import math
+from collections import deque
+
+import numpy as np
+
+# Band statistics selectable by the charts (--band) and the strategy (SPREAD_BAND)
+BAND_KINDS = ("std", "ewma", "quantile")
+
+
+class RollingWindowStats:
+    """
+    Mean and sample variance over a time-based sliding window (Welford updates).
+    Each observation is added and later removed once, so updates are O(1) amortised.
+    """
+    def __init__(self, window_seconds: float) -> None:
+        self.window_seconds: float = window_seconds
+        self.observations: deque = deque()
+        self.count: int = 0
+        self.mean: float = 0.0
+        self._m2: float = 0.0
+
+    def update(self, timestamp: float, value: float) -> None:
+        if value is None or math.isnan(value):
+            self.expire(timestamp)
+            return
+        self.observations.append((timestamp, value))
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        self.expire(timestamp)
+
+    def expire(self, now: float) -> None:
+        while self.observations and self.observations[0][0] <= now - self.window_seconds:
+            _, value = self.observations.popleft()
+            self._remove(value)
+
+    def _remove(self, value: float) -> None:
+        if self.count <= 1:
+            self.count, self.mean, self._m2 = 0, 0.0, 0.0
+            return
+        old_mean = self.mean
+        self.count -= 1
+        self.mean = (old_mean * (self.count + 1) - value) / self.count
+        self._m2 = max(self._m2 - (value - old_mean) * (value - self.mean), 0.0)
+
+    def variance(self):
+        if self.count < 2:
+            return None
+        return self._m2 / (self.count - 1)
+
+    def std(self):
+        variance = self.variance()
+        return math.sqrt(variance) if variance is not None else None
+
+    def center(self):
+        return self.mean if self.count else None
+
+    def band(self, width: float = 2.0):
+        std = self.std()
+        if std is None:
+            return None
+        return self.mean - width * std, self.mean + width * std
+
+
+class EWMA:
+    """
+    Exponentially weighted mean and variance with a time-based half-life,
+    so irregularly spaced ticks are weighted by elapsed time.
+    """
+    def __init__(self, halflife_seconds: float) -> None:
+        self.halflife_seconds: float = halflife_seconds
+        self.mean = None
+        self.variance: float = 0.0
+        self.last_timestamp = None
+        self.count: int = 0
+
+    def update(self, timestamp: float, value: float) -> None:
+        if value is None or math.isnan(value):
+            return
+        self.count += 1
+        if self.mean is None:
+            self.mean, self.last_timestamp = value, timestamp
+            return
+        elapsed = max(timestamp - self.last_timestamp, 0.0)
+        alpha = 1.0 - 0.5 ** (elapsed / self.halflife_seconds)
+        delta = value - self.mean
+        self.mean += alpha * delta
+        self.variance = (1.0 - alpha) * (self.variance + alpha * delta * delta)
+        self.last_timestamp = timestamp
+
+    def std(self):
+        return math.sqrt(self.variance) if self.mean is not None else None
+
+    def center(self):
+        return self.mean
+
+    def band(self, width: float = 2.0):
+        if self.count < 2:
+            return None
+        std = self.std()
+        return self.mean - width * std, self.mean + width * std
+
+
+class RollingQuantile:
+    """
+    Quantiles over a time-based sliding window, kept in a sorted list
+    (O(log n) search per insert/remove).
+    """
+    def __init__(self, window_seconds: float) -> None:
+        self.window_seconds: float = window_seconds
+        self.observations: deque = deque()
+        self.sorted_values: list = []
+
+    def update(self, timestamp: float, value: float) -> None:
+        if value is not None and not math.isnan(value):
+            self.observations.append((timestamp, value))
+            bisect.insort(self.sorted_values, value)
+        while self.observations and self.observations[0][0] <= timestamp - self.window_seconds:
+            _, old = self.observations.popleft()
+            del self.sorted_values[bisect.bisect_left(self.sorted_values, old)]
+
+    def quantile(self, q: float):
+        if not self.sorted_values:
+            return None
+        position = q * (len(self.sorted_values) - 1)
+        lower = math.floor(position)
+        upper = min(lower + 1, len(self.sorted_values) - 1)
+        weight = position - lower
+        return self.sorted_values[lower] * (1 - weight) + self.sorted_values[upper] * weight
+
+    def center(self):
+        return self.quantile(0.5)
+
+    def band(self, width: float = 2.0):
+        """
+        Quantiles with the tail mass of a normal mean ± width·std band (2 -> 2.3% / 97.7%).
+        """
+        if len(self.sorted_values) < 2:
+            return None
+        tail = 0.5 * math.erfc(width / math.sqrt(2))
+        return self.quantile(tail), self.quantile(1 - tail)
+
+
+def band_stats(kind: str, window_seconds: float):
+    """
+    Incremental band statistic for `kind`; for "ewma" the window is the half-life.
+    """
+    if kind == "std":
+        return RollingWindowStats(window_seconds)
+    if kind == "ewma":
+        return EWMA(window_seconds)
+    if kind == "quantile":
+        return RollingQuantile(window_seconds)
+    raise ValueError(f"Unknown band kind {kind!r}, expected one of {BAND_KINDS}")
+
+
+# Seconds since the epoch for a DatetimeIndex or array of datetimes
+def to_epoch_seconds(timestamps) -> np.ndarray:
+    return np.asarray(timestamps, dtype='datetime64[ns]').astype(np.int64) / 1e9
+
+
+def rolling_band(timestamps, values, window_seconds: float, width: float = 2.0, kind: str = "std") -> dict:
+    """
+    Rolling center and band at every observation, for plotting bands.
+    `timestamps` are seconds since the epoch; `kind` is one of BAND_KINDS
+    (mean ± width·std, EWMA mean ± width·std, or median and matching quantiles).
+    """
+    stats = band_stats(kind, window_seconds)
+    n = len(values)
+    mean, lower, upper = np.full(n, np.nan), np.full(n, np.nan), np.full(n, np.nan)
+
+    for i, (timestamp, value) in enumerate(zip(timestamps, values)):
+        stats.update(float(timestamp), float(value))
+        band = stats.band(width)
+        if band is not None:
+            mean[i] = stats.center()
+            lower[i], upper[i] = band
+
+    return {"mean": mean, "lower": lower, "upper": upper}
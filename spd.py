@@ -0,0 +1,170 @@
+import logging
+
+import numpy as np
+import pandas as pd
+from scipy.interpolate import CubicSpline
+
+RISK_FREE_RATE = 0.043
+# Points of the log-moneyness grid the density is evaluated on; 10k+ for smoother tails
+DEFAULT_GRID_POINTS = 1000
+YEAR_SECONDS = 365 * 24 * 60 * 60
+# A snapshot uses the newest row per strike of the day before it
+LOOKBACK_MS = 86400000
+
+
+# Newest mark IV per strike, OTM puts then calls, averaged on duplicate log moneyness
+def curve_points(strikes, mark_iv, is_call, latest_underlying_price):
+    curves = []
+    for mask in (~is_call, is_call):
+        type_strikes, first = np.unique(strikes[mask], return_index=True)  # rows are newest first
+        if len(type_strikes) < 3:
+            return None
+        curves.append((type_strikes, mark_iv[mask][first]))
+    strikes = np.concatenate([curves[0][0], curves[1][0]]).astype(float)
+    ivs = np.concatenate([curves[0][1], curves[1][1]]).astype(float)
+    log_moneyness, inverse = np.unique(np.log(strikes / latest_underlying_price), return_inverse=True)
+    return log_moneyness, np.bincount(inverse, weights=ivs) / np.bincount(inverse)
+
+
+def spd_density(grids, sigmas, underlying_prices, remaining_maturities, risk_free_rate: float = RISK_FREE_RATE):
+    """
+    Volatility-based SPD on log-moneyness `grids`, one row per curve; prices and
+    maturities broadcast against the rows.
+    """
+    sqrt_maturity = np.sqrt(remaining_maturities)
+    d2 = (-grids + (risk_free_rate - sigmas ** 2 / 2) * remaining_maturities) / (sigmas * sqrt_maturity)
+    return np.exp(-d2 ** 2 / 2) / (sigmas * np.exp(grids) * underlying_prices * np.sqrt(2 * np.pi) * sqrt_maturity)
+
+
+def spd_moments(grids, spds) -> tuple:
+    """
+    Normalised densities and their mean, standard deviation, skewness and (non-excess)
+    kurtosis along the last axis, followed by the raw integrals.
+    """
+    integrals = np.trapezoid(spds, grids, axis=-1)
+    spds = spds / integrals[..., None]
+    mean = np.trapezoid(spds * grids, grids, axis=-1)
+    centered = grids - mean[..., None]
+    std = np.sqrt(np.trapezoid(spds * centered ** 2, grids, axis=-1))
+    skewness = np.trapezoid(spds * centered ** 3, grids, axis=-1) / std ** 3
+    kurtosis = np.trapezoid(spds * centered ** 4, grids, axis=-1) / std ** 4
+    return spds, mean, std, skewness, kurtosis, integrals
+
+
+def spd_from_curve(log_moneyness, mark_iv, latest_underlying_price, remaining_maturity,
+                   grid_points: int = DEFAULT_GRID_POINTS) -> tuple:
+    """
+    Spline through the IV curve points, then the normalised SPD on an even grid over
+    them: (grid, spds, mean, std, skewness, kurtosis, raw integral).
+    """
+    cs_iv_curve = CubicSpline(log_moneyness, mark_iv, extrapolate=True)
+    grid = np.linspace(log_moneyness[0], log_moneyness[-1], grid_points)
+    spds = spd_density(grid, cs_iv_curve(grid), latest_underlying_price, remaining_maturity)
+    return (grid, *spd_moments(grid, spds))
+
+
+def spd_curves(curves, underlying_prices, remaining_maturities, grid_points: int = DEFAULT_GRID_POINTS) -> tuple:
+    """
+    spd_from_curve for many (log_moneyness, mark_iv) curves: splines are fitted per
+    curve, the densities and moments evaluated for all of them together.
+    Returns (grids, spds, mean, std, skewness, kurtosis), one row per curve.
+    """
+    grids = np.empty((len(curves), grid_points))
+    sigmas = np.empty_like(grids)
+    for i, (log_moneyness, mark_iv) in enumerate(curves):
+        grids[i] = np.linspace(log_moneyness[0], log_moneyness[-1], grid_points)
+        sigmas[i] = CubicSpline(log_moneyness, mark_iv, extrapolate=True)(grids[i])
+    spds = spd_density(grids, sigmas, np.asarray(underlying_prices, dtype=float)[:, None],
+                       np.asarray(remaining_maturities, dtype=float)[:, None])
+    spds, mean, std, skewness, kurtosis, _ = spd_moments(grids, spds)
+    return grids, spds, mean, std, skewness, kurtosis
+
+
+def compute_spd(df, latest_underlying_price, remaining_maturity, grid_points: int = DEFAULT_GRID_POINTS):
+    points = curve_points(df['strike_price'].to_numpy(), df['mark_iv'].to_numpy(),
+                          df['option_type'].to_numpy() == 'call', latest_underlying_price)
+    if points is None:
+        return None, None, None, None
+
+    try:
+        log_moneyness, mark_iv = points
+        iv_curve = pd.DataFrame({'log_moneyness': log_moneyness, 'mark_iv': mark_iv})
+        print(f'amount of data : {len(iv_curve)}')
+        logging.debug("iv_curve: %s", iv_curve)
+        logging.debug(remaining_maturity)
+
+        # **Calculate SPD Using Volatility-Based Formula**, on the whole grid at once
+        moneyness_support, spds, mean_moneyness, _, spd_skewness, _, spds_integral = spd_from_curve(
+            log_moneyness, mark_iv, latest_underlying_price, remaining_maturity, grid_points)
+        print(f"SPD_Integral_RAW : {spds_integral}")
+        print(f"mean_moneyness: {mean_moneyness}")
+
+        return moneyness_support, spds, iv_curve, float(spd_skewness)
+
+    except Exception as e:
+        print(f"⚠️ Error processing SPD: {e}")
+        return None, None, None, None
+
+
+def compute_spd_batch(df, pairs, grid_points: int = DEFAULT_GRID_POINTS) -> tuple:
+    """
+    SPDs for many (timestamp ms, expiration_timestamp) pairs in one call. `df` holds
+    btc_options_tick rows (timestamp, expiration_timestamp, strike_price, mark_iv,
+    option_type, underlying_price) covering the day before each pair; each pair uses
+    the newest row per strike of that day, as compute_spd does for one snapshot.
+    Splines are fitted per pair, the densities and moments are evaluated for all
+    pairs together. Returns (summary, grids, spds): one summary row per pair with
+    enough data, aligned with the rows of the `grids` and `spds` arrays. The summary
+    keeps the curve points of each pair in `curve_log_moneyness` and `curve_iv`.
+    """
+    columns = ['timestamp', 'expiration_timestamp', 'underlying_price', 'remaining_maturity',
+               'curve_log_moneyness', 'curve_iv']
+    wanted: dict = {}
+    for timestamp, exp_ts in pairs:
+        wanted.setdefault(int(exp_ts), []).append(int(timestamp))
+
+    keys = []
+    for exp_ts, rows in df.groupby('expiration_timestamp'):
+        if int(exp_ts) not in wanted:
+            continue
+        # Oldest first; equal timestamps keep the newest-first input order reversed, so
+        # the last row at or before a time is the one compute_spd would take
+        rows = rows.iloc[::-1].sort_values('timestamp', kind='stable')
+        timestamps = rows['timestamp'].to_numpy(dtype=np.int64)
+        is_call = rows['option_type'].to_numpy() == 'call'
+        strikes = rows['strike_price'].to_numpy(dtype=float)
+        mark_ivs = rows['mark_iv'].to_numpy(dtype=float)
+        underlying_prices = rows['underlying_price'].to_numpy(dtype=float)
+        snapshot_times = np.asarray(wanted[int(exp_ts)], dtype=np.int64)
+
+        # Newest row per (type, strike) at every snapshot: one binary search per strike for all snapshots
+        strike_keys, codes = np.unique(strikes * 2 + is_call, return_inverse=True)
+        codes = codes.ravel()
+        latest_iv = np.full((len(snapshot_times), len(strike_keys)), np.nan)
+        for code in range(len(strike_keys)):
+            rows_of_key = np.flatnonzero(codes == code)
+            position = np.searchsorted(timestamps[rows_of_key], snapshot_times, side='right') - 1
+            found = position >= 0
+            latest = rows_of_key[np.maximum(position, 0)]
+            found &= timestamps[latest] >= snapshot_times - LOOKBACK_MS
+            latest_iv[found, code] = mark_ivs[latest[found]]
+        key_strikes, key_is_call = strike_keys // 2, (strike_keys % 2).astype(bool)
+        newest = np.searchsorted(timestamps, snapshot_times, side='right') - 1
+
+        for i, timestamp in enumerate(snapshot_times):
+            remaining_maturity = (int(exp_ts) - int(timestamp) // 1000) / YEAR_SECONDS
+            if newest[i] < 0 or timestamps[newest[i]] < timestamp - LOOKBACK_MS or remaining_maturity <= 0:
+                continue
+            present = ~np.isnan(latest_iv[i])
+            underlying_price = float(underlying_prices[newest[i]])
+            points = curve_points(key_strikes[present], latest_iv[i, present], key_is_call[present], underlying_price)
+            if points is None:
+                continue
+            log_moneyness, mark_iv = points
+            keys.append((int(timestamp), int(exp_ts), underlying_price, remaining_maturity, log_moneyness, mark_iv))
+
+    summary = pd.DataFrame(keys, columns=columns)
+    grids, spds, mean, std, skewness, kurtosis = spd_curves(
+        list(zip(summary['curve_log_moneyness'], summary['curve_iv'])), summary['underlying_price'],
+        summary['remaining_maturity'], grid_points)
+    return summary.assign(mean=mean, std=std, skewness=skewness, kurtosis=kurtosis), grids, spds
@@ -0,0 +1,290 @@
+import argparse
+import contextlib
+import logging
+import os
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from spd import DEFAULT_GRID_POINTS, LOOKBACK_MS, compute_spd_batch
+from storage import SKEW_TABLE, TICK_TABLE, open_storage
+from tick_archive import read_history
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # the surface is optional; the GUI then computes every SPD from the ticks
+    pa = None
+
+try:
+    import fcntl
+except ImportError:  # no flock on Windows; run a single writer there
+    fcntl = None
+
+SURFACE_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "spd_surface")
+
+MOMENT_COLUMNS = ["mean", "std", "skewness", "kurtosis"]
+SURFACE_COLUMNS = (["timestamp", "underlying_price", "remaining_maturity"] + MOMENT_COLUMNS
+                   + ["curve_log_moneyness", "curve_iv"])
+TICK_COLUMNS = ["timestamp", "expiration_timestamp", "strike_price", "mark_iv", "option_type", "underlying_price"]
+# Snapshots per job are grouped by expiry and this much time, each loading the ticks of the day before
+CHUNK_MS = 6 * 3600 * 1000
+# Part files per expiry before they are merged into one
+MAX_PARTS = 16
+# Reads retried when compaction removes a listed part file
+READ_ATTEMPTS = 5
+
+
+def available() -> bool:
+    return pa is not None
+
+
+def _schema():
+    return pa.schema([("timestamp", pa.int64()), ("underlying_price", pa.float64()),
+                      ("remaining_maturity", pa.float64())]
+                     + [(column, pa.float64()) for column in MOMENT_COLUMNS]
+                     + [("curve_log_moneyness", pa.list_(pa.float64())), ("curve_iv", pa.list_(pa.float64()))])
+
+
+def _expiry_path(root: str, expiration_timestamp: int) -> str:
+    return os.path.join(root, f"expiration_timestamp={int(expiration_timestamp)}")
+
+
+def read_surface(expirations: list = None, start_ms: int = None, end_ms: int = None, columns: list = None,
+                 root: str = SURFACE_ROOT) -> pd.DataFrame:
+    """
+    Stored SPD entries with start_ms <= timestamp < end_ms, oldest first, one row per
+    (timestamp, expiration_timestamp). Snapshots without enough data to fit a curve
+    are stored too, with NaN moments, so they are not recomputed.
+    """
+    columns = list(dict.fromkeys(["timestamp", "expiration_timestamp",
+                                  *(SURFACE_COLUMNS if columns is None else columns)]))
+    if pa is None or not os.path.isdir(root):
+        return pd.DataFrame(columns=columns)
+
+    condition = ds.scalar(True)
+    if expirations is not None:
+        condition &= ds.field("expiration_timestamp").isin([int(exp) for exp in expirations])
+    if start_ms is not None:
+        condition &= ds.field("timestamp") >= int(start_ms)
+    if end_ms is not None:
+        condition &= ds.field("timestamp") < int(end_ms)
+    for attempt in range(READ_ATTEMPTS):
+        try:
+            # An explicit schema: a directory may hold only its lock file while the first part is written
+            dataset = ds.dataset(root, format="parquet", schema=_schema().append(
+                pa.field("expiration_timestamp", pa.int64())), partitioning=ds.partitioning(
+                pa.schema([("expiration_timestamp", pa.int64())]), flavor="hive"))
+            frame = dataset.to_table(columns=columns, filter=condition).to_pandas()
+            break
+        except FileNotFoundError:
+            # A part listed by the dataset was merged away meanwhile; its rows are in the merged file
+            if attempt == READ_ATTEMPTS - 1:
+                raise
+            time.sleep(0.01 * (attempt + 1))
+    return (frame.sort_values("timestamp", kind="stable")
+            .drop_duplicates(["timestamp", "expiration_timestamp"], keep="last").reset_index(drop=True))
+
+
+def _write_part(path: str, table, name: str) -> None:
+    # Readers skip dot files, so a part appears whole or not at all
+    staging = os.path.join(path, f".{name}.tmp")
+    pq.write_table(table, staging)
+    os.replace(staging, os.path.join(path, name))
+
+
+@contextlib.contextmanager
+def _locked(path: str):
+    # Exclusive per expiry directory, across threads and processes (the GUI and the --watch job)
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, ".lock"), "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+def compact(path: str) -> None:
+    """
+    Merges the part files of one expiry into a single time-sorted file.
+    """
+    with _locked(path):
+        _compact(path)
+
+
+def _compact(path: str) -> None:
+    parts = sorted(name for name in os.listdir(path) if name.endswith(".parquet") and not name.startswith("."))
+    if len(parts) < 2:
+        return
+    frame = pd.concat([pq.read_table(os.path.join(path, name)).to_pandas() for name in parts], ignore_index=True)
+    frame = frame.sort_values("timestamp", kind="stable").drop_duplicates("timestamp", keep="last")
+    _write_part(path, pa.Table.from_pandas(frame[SURFACE_COLUMNS], schema=_schema(), preserve_index=False),
+                f"part-{int(frame['timestamp'].iloc[0])}-{uuid.uuid4().hex[:8]}.parquet")
+    for name in parts:
+        os.remove(os.path.join(path, name))
+
+
+def write_surface(entries: pd.DataFrame, root: str = SURFACE_ROOT) -> int:
+    """
+    Appends entries (compute_spd_batch summaries) as one part file per expiry.
+    """
+    for exp_ts, frame in entries.groupby("expiration_timestamp"):
+        path = _expiry_path(root, exp_ts)
+        frame = frame.sort_values("timestamp")
+        with _locked(path):
+            _write_part(path, pa.Table.from_pandas(frame[SURFACE_COLUMNS], schema=_schema(), preserve_index=False),
+                        f"part-{int(frame['timestamp'].iloc[0])}-{uuid.uuid4().hex[:8]}.parquet")
+            if sum(name.endswith(".parquet") for name in os.listdir(path)) > MAX_PARTS:
+                _compact(path)
+    return len(entries)
+
+
+def snapshot_pairs(storage, start_ms: int, end_ms: int, expirations: list = None) -> list:
+    """
+    (timestamp, expiration_timestamp) of the skew snapshots the bot stored, i.e. the times the GUI offers.
+    """
+    frame = read_history(storage, SKEW_TABLE, ["timestamp", "expiration_timestamp"], start_ms, end_ms, expirations)
+    return sorted({(int(ts), int(exp_ts)) for ts, exp_ts in zip(frame["timestamp"], frame["expiration_timestamp"])})
+
+
+# Runs in the worker processes: every requested pair gets a row, NaN when no curve could be fitted
+def compute_chunk(ticks: pd.DataFrame, pairs: list, grid_points: int = DEFAULT_GRID_POINTS) -> pd.DataFrame:
+    summary, _, _ = compute_spd_batch(ticks, pairs, grid_points)
+    computed = {(ts, exp_ts) for ts, exp_ts in zip(summary["timestamp"], summary["expiration_timestamp"])}
+    empty = [(ts, exp_ts) for ts, exp_ts in pairs if (ts, exp_ts) not in computed]
+    if empty:
+        placeholders = pd.DataFrame(empty, columns=["timestamp", "expiration_timestamp"])
+        placeholders["curve_log_moneyness"] = [np.empty(0)] * len(empty)
+        placeholders["curve_iv"] = [np.empty(0)] * len(empty)
+        summary = pd.concat([summary, placeholders], ignore_index=True)
+    return summary
+
+
+class TickWindow:
+    """
+    Ticks of one expiry over a range that slides forward in time. Consecutive chunks
+    share most of their look-back, so only the part not loaded yet is read from storage.
+    """
+    def __init__(self, storage) -> None:
+        self.storage = storage
+        self.expiration = None
+        self.start_ms = None
+        self.end_ms = None
+        self.frame = None
+
+    def load(self, expiration_timestamp: int, start_ms: int, end_ms: int) -> pd.DataFrame:
+        """
+        Ticks in [start_ms, end_ms) or later, newest first, as read_history returns them.
+        """
+        if expiration_timestamp != self.expiration or not self.start_ms <= start_ms <= self.end_ms:
+            self.frame = read_history(self.storage, TICK_TABLE, TICK_COLUMNS, start_ms, end_ms,
+                                      expirations=[expiration_timestamp])
+            self.end_ms = end_ms
+        else:
+            frames = []
+            if end_ms > self.end_ms:
+                frames.append(read_history(self.storage, TICK_TABLE, TICK_COLUMNS, self.end_ms, end_ms,
+                                           expirations=[expiration_timestamp]))
+                self.end_ms = end_ms
+            frames.append(self.frame[self.frame["timestamp"] >= start_ms])
+            self.frame = pd.concat([frame for frame in frames if not frame.empty] or frames[-1:], ignore_index=True)
+        self.expiration, self.start_ms = expiration_timestamp, start_ms
+        return self.frame
+
+
+def _chunks(pairs: list, chunk_ms: int) -> list:
+    by_expiry: dict = {}
+    for ts, exp_ts in sorted(pairs):
+        by_expiry.setdefault(exp_ts, []).append(ts)
+    chunks = []
+    for exp_ts, times in by_expiry.items():
+        start = 0
+        for i in range(1, len(times) + 1):
+            if i == len(times) or times[i] - times[start] >= chunk_ms:
+                chunks.append((exp_ts, times[start:i]))
+                start = i
+    return chunks
+
+
+def update_surface(storage, start_ms: int = 0, end_ms: int = None, expirations: list = None, pairs: list = None,
+                   workers: int = None, grid_points: int = DEFAULT_GRID_POINTS, root: str = SURFACE_ROOT,
+                   chunk_ms: int = CHUNK_MS, mp_context=None) -> int:
+    """
+    Computes the entries missing from the surface, for `pairs` or else every skew
+    snapshot in [start_ms, end_ms). Ticks are read here; the fits run in a pool of
+    `workers` processes (0 computes in this process), started with `mp_context`
+    (e.g. multiprocessing.get_context("spawn") from a threaded GUI, where forking is
+    unsafe). Returns the number of entries written.
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow is required for the SPD surface")
+    if pairs is None:
+        end_ms = end_ms or int(time.time() * 1000) + 1
+        pairs = snapshot_pairs(storage, start_ms, end_ms, expirations)
+    if not pairs:
+        return 0
+    pairs = [(int(ts), int(exp_ts)) for ts, exp_ts in pairs]
+    stored = read_surface(sorted({exp_ts for _, exp_ts in pairs}), min(ts for ts, _ in pairs),
+                          max(ts for ts, _ in pairs) + 1, columns=[], root=root)
+    done = set(zip(stored["timestamp"], stored["expiration_timestamp"]))
+    chunks = _chunks([pair for pair in pairs if pair not in done], chunk_ms)
+    window = TickWindow(storage)
+
+    def load(exp_ts: int, times: list) -> pd.DataFrame:
+        return window.load(exp_ts, times[0] - LOOKBACK_MS, times[-1] + 1)
+
+    written = 0
+    if workers == 0:
+        for exp_ts, times in chunks:
+            written += write_surface(compute_chunk(load(exp_ts, times), [(ts, exp_ts) for ts in times],
+                                                   grid_points), root)
+        return written
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as pool:
+        pending = set()
+        for exp_ts, times in chunks:
+            # Bound the tick frames in flight
+            while len(pending) >= 2 * workers:
+                done_futures, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done_futures:
+                    written += write_surface(future.result(), root)
+            pending.add(pool.submit(compute_chunk, load(exp_ts, times), [(ts, exp_ts) for ts in times],
+                                    grid_points))
+            logging.info(f"Expiry {exp_ts}: {len(times)} snapshots queued")
+        for future in wait(pending).done:
+            written += write_surface(future.result(), root)
+    return written
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level='INFO',
+        format='%(asctime)s | %(levelname)s | %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+
+    parser = argparse.ArgumentParser(description="Precompute SPD moments and IV curves for the stored skew snapshots.")
+    parser.add_argument("--days", type=float, default=7, help="look-back of snapshots to fill in")
+    parser.add_argument("--expirations", nargs="+", type=int, default=None, help="expiration timestamps (seconds)")
+    parser.add_argument("--workers", type=int, default=None, help="processes for the fits (default: one per CPU)")
+    parser.add_argument("--grid-points", type=int, default=DEFAULT_GRID_POINTS)
+    parser.add_argument("--root", default=SURFACE_ROOT)
+    parser.add_argument("--watch", type=float, default=None, help="repeat every this many seconds")
+    args = parser.parse_args()
+
+    storage = open_storage()
+    while True:
+        start_ms = int((datetime.now() - timedelta(days=args.days)).timestamp() * 1000)
+        started = time.perf_counter()
+        written = update_surface(storage, start_ms, expirations=args.expirations, workers=args.workers,
+                                 grid_points=args.grid_points, root=args.root)
+        logging.info(f"SPD surface: {written} entries added in {time.perf_counter() - started:.1f}s")
+        if args.watch is None:
+            break
+        time.sleep(args.watch)
+    storage.close()
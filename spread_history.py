@@ -0,0 +1,149 @@
+import math
+
+import numpy as np
+
+from rolling_stats import band_stats
+
+LEGS = ("near_call", "far_call", "near_put", "far_put")
+QUOTE_FIELDS = ("bid_iv", "ask_iv", "bid_price", "ask_price")
+SPREAD_FIELDS = ("RR_spread", "RR_spread_price")
+# Look-back of the spread band the strategy logs (monitoring only); the charts draw the same band by default
+BAND_WINDOW_SECONDS = 12 * 60 * 60
+
+
+# RR spread of the four legs from bid/ask quotes; `field` is "iv" or "price"
+def rr_spread(spread_way: str, near_call: dict, far_call: dict, near_put: dict, far_put: dict, field: str = "iv"):
+    bid, ask = f"bid_{field}", f"ask_{field}"
+    if spread_way == "LONG":
+        far_spread = - far_call[ask] + far_put[bid]
+        near_spread = - near_put[ask] + near_call[bid]
+    elif spread_way == "SHORT":
+        far_spread = far_call[bid] - far_put[ask]
+        near_spread = near_put[bid] - near_call[ask]
+    else:
+        return None
+    return far_spread + near_spread
+
+
+class RingBuffer:
+    """
+    Fixed-capacity, array-backed buffer of (timestamp, row) pairs.
+    Appending overwrites the oldest row once full.
+    """
+    def __init__(self, capacity: int, fields: tuple) -> None:
+        self.capacity: int = capacity
+        self.fields: tuple = tuple(fields)
+        self.timestamps = np.zeros(capacity, dtype=np.int64)
+        self.values = np.full((capacity, len(self.fields)), np.nan)
+        self.head: int = 0  # next slot to write
+        self.size: int = 0
+
+    def append(self, timestamp: int, row) -> tuple:
+        """
+        Stores a row and returns the (timestamp, row) it evicted, or None.
+        """
+        evicted = None
+        if self.size == self.capacity:
+            evicted = (int(self.timestamps[self.head]), self.values[self.head].copy())
+        else:
+            self.size += 1
+        self.timestamps[self.head] = timestamp
+        self.values[self.head] = row
+        self.head = (self.head + 1) % self.capacity
+        return evicted
+
+    def latest(self):
+        if self.size == 0:
+            return None
+        i = (self.head - 1) % self.capacity
+        return int(self.timestamps[i]), self.values[i]
+
+    def ordered(self) -> tuple:
+        """
+        Copies of the timestamps and rows, oldest first.
+        """
+        if self.size < self.capacity:
+            return self.timestamps[:self.size].copy(), self.values[:self.size].copy()
+        order = np.r_[self.head:self.capacity, 0:self.head]
+        return self.timestamps[order], self.values[order]
+
+    def __len__(self) -> int:
+        return self.size
+
+
+class SpreadHistory:
+    """
+    Resampled leg quotes and RR spreads, maintained incrementally from live ticks.
+    Each closed `bar_seconds` bucket adds one row carrying the forward-filled
+    quotes as of the bucket boundary (like `resample(...).ffill()`), and a
+    rolling statistic over the spread (`band_kind`, see rolling_stats.BAND_KINDS)
+    gives its band incrementally.
+    """
+    def __init__(self, spread_way: str, bar_seconds: int = 20, window_seconds: int = BAND_WINDOW_SECONDS,
+                 band_window_seconds: int = None, band_kind: str = "std") -> None:
+        self.spread_way: str = spread_way
+        self.bar_ms: int = bar_seconds * 1000
+        self.fields: tuple = tuple(f"{field}_{leg}" for leg in LEGS for field in QUOTE_FIELDS) + SPREAD_FIELDS
+        self.buffer = RingBuffer(window_seconds // bar_seconds, self.fields)
+        self.current: dict = {}
+        self.current_bucket = None
+        self.band_kind: str = band_kind
+        self.spread_stats = band_stats(band_kind, band_window_seconds or window_seconds)
+
+    def reset_leg(self, leg: str) -> None:
+        self.current.pop(leg, None)
+
+    def update_leg(self, leg: str, quote: dict, timestamp_ms: int) -> None:
+        bucket = timestamp_ms // self.bar_ms
+        if self.current_bucket is not None and bucket > self.current_bucket:
+            # Close every boundary crossed since the last tick with the quotes held before this one
+            closed = min(bucket - self.current_bucket, self.buffer.capacity)
+            for b in range(bucket - closed + 1, bucket + 1):
+                self._close_bar(b * self.bar_ms)
+        if self.current_bucket is None or bucket > self.current_bucket:
+            self.current_bucket = bucket
+        self.current[leg] = quote
+
+    def live_spreads(self):
+        """
+        (RR_spread, RR_spread_price) from the latest quotes, or None while a leg is missing.
+        """
+        quotes = [self.current.get(leg) for leg in LEGS]
+        if any(quote is None or None in quote.values() for quote in quotes):
+            return None
+        return (rr_spread(self.spread_way, *quotes, field="iv"),
+                rr_spread(self.spread_way, *quotes, field="price"))
+
+    def append_row(self, timestamp_ms: int, quotes: dict) -> None:
+        """
+        Adds a resampled row from {leg: quote}; used to seed the history from the DB.
+        """
+        row = [quotes[leg][field] if quotes.get(leg) is not None and quotes[leg].get(field) is not None else np.nan
+               for leg in LEGS for field in QUOTE_FIELDS]
+        spreads = None
+        if not any(math.isnan(value) for value in row):
+            spreads = (rr_spread(self.spread_way, *[quotes[leg] for leg in LEGS], field="iv"),
+                       rr_spread(self.spread_way, *[quotes[leg] for leg in LEGS], field="price"))
+        if spreads is None or spreads[0] is None:
+            spreads = (np.nan, np.nan)
+        row.extend(spreads)
+
+        self.buffer.append(timestamp_ms, row)
+        self.spread_stats.update(timestamp_ms / 1000, row[-2])
+
+    def _close_bar(self, timestamp_ms: int) -> None:
+        self.append_row(timestamp_ms, self.current)
+
+    def latest(self):
+        """
+        (timestamp_ms, RR_spread, RR_spread_price) of the newest complete row, or None.
+        """
+        for i in range(1, self.buffer.size + 1):
+            slot = (self.buffer.head - i) % self.buffer.capacity
+            spread, spread_price = self.buffer.values[slot, -2], self.buffer.values[slot, -1]
+            if not math.isnan(spread):
+                return int(self.buffer.timestamps[slot]), float(spread), float(spread_price)
+        return None
+
+    def band(self, width: float = 2.0):
+        return self.spread_stats.band(width)
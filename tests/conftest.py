@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The modules live at the repository root; benchmarks/synthetic.py generates the test data
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
@@ -0,0 +1,95 @@
+"""
+BarAggregator closes 1s/20s/1m bars on their boundaries, and a bar re-opened by a
+late tick merges into the stored row as if it had never been closed.
+"""
+import pytest
+
+from bar_rollup import BAR_COLUMNS, BarAggregator
+from storage import BAR_TABLE, TABLES, SQLiteStorage
+
+START_MS = 1_767_225_600_000  # a minute boundary
+NAME = "BTC-16JAN26-90000-C"
+EXPIRATION = 1_768_550_400
+COLUMNS = TABLES[BAR_TABLE][1]
+
+
+def tick(aggregator, offset_ms: int, bid_price: float, ask_price: float = None) -> list:
+    rows = aggregator.update(NAME, EXPIRATION, "call", START_MS + offset_ms,
+                             {"bid_price": bid_price, "ask_price": ask_price})
+    return [dict(zip(COLUMNS, row)) for row in rows]
+
+
+def test_bars_close_on_their_boundaries():
+    aggregator = BarAggregator()
+    assert tick(aggregator, 0, 1.0) == []
+    assert tick(aggregator, 999, 3.0) == []
+
+    closed = tick(aggregator, 1000, 2.0)
+    assert [(row["resolution_seconds"], row["bar_timestamp"]) for row in closed] == [(1, START_MS)]
+    assert closed[0]["tick_count"] == 2
+    assert (closed[0]["bid_price_last"], closed[0]["bid_price_min"], closed[0]["bid_price_max"]) == (3.0, 1.0, 3.0)
+
+    tick(aggregator, 19999, 4.0)
+    closed = tick(aggregator, 20000, 5.0)
+    assert [(row["resolution_seconds"], row["bar_timestamp"]) for row in closed] == [
+        (1, START_MS + 19000), (20, START_MS)]
+    twenty = closed[1]
+    assert twenty["tick_count"] == 4
+    assert (twenty["bid_price_last"], twenty["bid_price_min"], twenty["bid_price_max"]) == (4.0, 1.0, 4.0)
+    assert twenty["ask_price_last"] is None  # no ask was ever quoted
+
+    closed = tick(aggregator, 60000, 6.0)
+    assert [(row["resolution_seconds"], row["bar_timestamp"]) for row in closed] == [
+        (1, START_MS + 20000), (20, START_MS + 20000), (60, START_MS)]
+    assert closed[2]["tick_count"] == 5
+    assert closed[2]["bid_price_max"] == 5.0
+
+
+def test_late_ticks_and_stale_bars():
+    aggregator = BarAggregator(resolutions=(20,))
+    tick(aggregator, 25000, 1.0)
+    # Older than the open bar: dropped and counted
+    assert tick(aggregator, 5000, 9.0) == []
+    assert aggregator.late_ticks == 1
+
+    assert aggregator.close_stale(START_MS + 41000) == []  # within the 2s grace
+    closed = aggregator.close_stale(START_MS + 42000)
+    assert [row[0] for row in closed] == [START_MS + 20000]
+    assert aggregator.close_all() == []
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "test.db"))
+    yield storage
+    storage.close()
+
+
+def test_reopened_bar_upserts_into_one_row(storage):
+    split, whole = BarAggregator(resolutions=(20,)), BarAggregator(resolutions=(20,))
+    ticks = [(1000, 0.03, 0.05), (5000, 0.01, None), (9000, 0.02, 0.04)]
+
+    # The bar is closed as stale before its last tick arrives, which re-opens it
+    rows = []
+    for offset_ms, bid_price, ask_price in ticks[:2]:
+        tick(split, offset_ms, bid_price, ask_price)
+    rows += split.close_stale(START_MS + 30000)
+    tick(split, *ticks[2])
+    rows += split.close_all()
+    assert len(rows) == 2
+    storage.insert(BAR_TABLE, rows)
+    storage.commit()
+
+    for offset_ms, bid_price, ask_price in ticks:
+        tick(whole, offset_ms, bid_price, ask_price)
+    expected = dict(zip(COLUMNS, whole.close_all()[0]))
+
+    columns = ["bar_timestamp", "tick_count", *BAR_COLUMNS]
+    stored = storage.query_range(BAR_TABLE, columns, START_MS)
+    assert len(stored) == 1
+    for column in columns:
+        value = stored[column].iloc[0]
+        if expected[column] is None:
+            assert value is None or value != value
+        else:
+            assert value == pytest.approx(expected[column])
@@ -0,0 +1,107 @@
+"""
+BatchedDBWriter flushes by size and by age, writes everything queued on drain()
+and counts the rows of failed batches without stopping.
+"""
+import asyncio
+
+import pytest
+
+from db_writer import BatchedDBWriter
+from storage import SKEW_TABLE, SQLiteStorage, StorageExecutor
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "test.db"))
+    yield storage
+    storage.close()
+
+
+def skew_row(i: int) -> tuple:
+    return 1_000_000 + i, 1_800_000_000, 0.01 * i
+
+
+def stored_rows(storage) -> int:
+    return len(storage.query_range(SKEW_TABLE, ["timestamp"], 0))
+
+
+async def wait_until(condition, timeout: float = 5.0) -> None:
+    async def poll():
+        while not condition():
+            await asyncio.sleep(0.005)
+    await asyncio.wait_for(poll(), timeout)
+
+
+def run_writer(storage, scenario, **kwargs):
+    async def main():
+        executor = StorageExecutor(storage)
+        writer = BatchedDBWriter(storage, executor=executor, **kwargs)
+        task = asyncio.get_running_loop().create_task(writer.run())
+        try:
+            return await scenario(writer)
+        finally:
+            task.cancel()
+            executor.shutdown()
+    return asyncio.run(main())
+
+
+def test_full_batches_flush_without_waiting(storage):
+    async def scenario(writer):
+        for i in range(7):
+            await writer.put(SKEW_TABLE, skew_row(i))
+        await wait_until(lambda: writer.rows_written.total == 6, timeout=2.0)
+        return writer
+
+    # The interval is far longer than the test, so only the size can trigger these flushes
+    writer = run_writer(storage, scenario, max_batch_size=3, flush_interval=30.0)
+    assert writer.flush_latency.count == 2
+    assert writer.queue.qsize() == 0  # the seventh row waits in the open batch
+    assert stored_rows(storage) == 6
+
+
+def test_partial_batch_flushes_after_interval(storage):
+    async def scenario(writer):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for i in range(2):
+            await writer.put(SKEW_TABLE, skew_row(i))
+        await wait_until(lambda: writer.rows_written.total == 2)
+        return writer, loop.time() - started
+
+    writer, elapsed = run_writer(storage, scenario, max_batch_size=100, flush_interval=0.1)
+    assert elapsed >= 0.09
+    assert writer.flush_latency.count == 1
+    assert stored_rows(storage) == 2
+
+
+def test_drain_writes_everything_queued(storage):
+    async def scenario(writer):
+        for i in range(1234):
+            await writer.put(SKEW_TABLE, skew_row(i))
+        await writer.drain()
+        return writer
+
+    # The last, partial batch is flushed once its interval has passed
+    writer = run_writer(storage, scenario, max_batch_size=100, flush_interval=0.05)
+    assert writer.flush_latency.count == 13
+    assert writer.rows_written.total == 1234
+    assert writer.failed_rows == 0
+    assert stored_rows(storage) == 1234
+
+
+def test_failed_batch_is_counted_and_rolled_back(storage):
+    async def scenario(writer):
+        # The short row fails the whole batch, including the valid row queued with it
+        await writer.put(SKEW_TABLE, skew_row(0))
+        await writer.put(SKEW_TABLE, (1_000_001, 1_800_000_000))
+        await writer.drain()
+        for i in range(2, 5):
+            await writer.put(SKEW_TABLE, skew_row(i))
+        await writer.drain()
+        return writer
+
+    writer = run_writer(storage, scenario, max_batch_size=10, flush_interval=0.05)
+    assert writer.failed_rows == 2
+    assert writer.rows_written.total == 3
+    assert writer.stats()["failed_rows"] == 2
+    assert stored_rows(storage) == 3
@@ -0,0 +1,75 @@
+"""
+InstrumentNameCache returns what parse_instrument_name would, parses each name once
+and rejects untracked expiries without parsing them.
+"""
+from datetime import datetime
+
+import pytest
+
+import instrument_cache
+from instrument_cache import NOT_PARSED, InstrumentNameCache, parse_instrument_name
+
+
+@pytest.fixture
+def parse_calls(monkeypatch):
+    calls = []
+
+    def counting_parse(instr_name):
+        calls.append(instr_name)
+        return parse_instrument_name(instr_name)
+    monkeypatch.setattr(instrument_cache, "parse_instrument_name", counting_parse)
+    return calls
+
+
+def test_parse_instrument_name():
+    assert parse_instrument_name("BTC-28MAR25-90000-C") == (
+        90000.0, "call", int(datetime(2025, 3, 28).timestamp()), "28MAR25")
+    assert parse_instrument_name("BTC-28MAR25-85000-P")[1] == "put"
+    assert parse_instrument_name("BTC-PERPETUAL") == NOT_PARSED
+
+
+def test_repeated_names_hit_the_cache(parse_calls):
+    cache = InstrumentNameCache()
+    first = cache.get("BTC-28MAR25-90000-C")
+    for _ in range(3):
+        assert cache.get("BTC-28MAR25-90000-C") == first
+    assert first == parse_instrument_name("BTC-28MAR25-90000-C")
+    assert parse_calls == ["BTC-28MAR25-90000-C"]
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_untracked_expiries_are_rejected_without_parsing(parse_calls):
+    cache = InstrumentNameCache(tracked_dates=["28MAR25"])
+    assert cache.get("BTC-28MAR25-90000-C")[3] == "28MAR25"
+    assert cache.get("BTC-25APR25-90000-C") == NOT_PARSED
+    assert cache.get("BTC-PERPETUAL") == NOT_PARSED
+    assert parse_calls == ["BTC-28MAR25-90000-C"]
+
+    # The rejection is cached too, and dropped once the expiry becomes tracked
+    assert cache.get("BTC-25APR25-90000-C") == NOT_PARSED
+    assert cache.hits == 1
+    cache.set_tracked_dates(["28MAR25", "25APR25"])
+    assert cache.get("BTC-25APR25-90000-C")[3] == "25APR25"
+
+
+def test_least_recently_used_name_is_evicted():
+    cache = InstrumentNameCache(maxsize=2)
+    cache.get("BTC-28MAR25-90000-C")
+    cache.get("BTC-28MAR25-95000-C")
+    cache.get("BTC-28MAR25-90000-C")  # now the most recently used
+    cache.get("BTC-28MAR25-100000-C")
+    assert len(cache) == 2
+    misses = cache.misses
+    cache.get("BTC-28MAR25-90000-C")
+    assert cache.misses == misses
+    cache.get("BTC-28MAR25-95000-C")
+    assert cache.misses == misses + 1
+
+
+def test_evict_expired():
+    cache = InstrumentNameCache()
+    cache.get("BTC-28MAR25-90000-C")
+    cache.get("BTC-25APR25-90000-C")
+    cache.get("BTC-PERPETUAL")
+    assert cache.evict_expired(datetime(2025, 4, 1).timestamp()) == 1
+    assert len(cache) == 2
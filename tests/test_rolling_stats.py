@@ -0,0 +1,79 @@
+"""
+The incremental band statistics must match what pandas computes over the whole series.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from rolling_stats import EWMA, RollingQuantile, RollingWindowStats, rolling_band, to_epoch_seconds
+
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(0)
+    # Irregular spacing with gaps longer than the window, and a NaN the statistics must skip
+    seconds = np.cumsum(rng.integers(1, 120, 400)).astype(float)
+    seconds[200:] += 3600
+    values = rng.normal(size=400).cumsum()
+    values[50] = np.nan
+    return pd.Series(values, index=pd.to_datetime(seconds, unit="s"))
+
+
+def test_window_stats_match_pandas_rolling(series):
+    stats, means, stds = RollingWindowStats(600), [], []
+    for timestamp, value in zip(to_epoch_seconds(series.index), series):
+        stats.update(timestamp, value)
+        means.append(stats.mean if stats.count else np.nan)
+        stds.append(stats.std() if stats.count > 1 else np.nan)
+
+    rolling = series.rolling("600s")
+    np.testing.assert_allclose(means, rolling.mean(), rtol=1e-9, atol=1e-9)
+    np.testing.assert_allclose(stds, rolling.std(), rtol=1e-6, atol=1e-9)
+
+
+def test_ewma_matches_pandas_ewm():
+    # Regular spacing, so the time-based half-life is a constant alpha
+    values = pd.Series(np.random.default_rng(1).normal(size=300))
+    ewma, means, variances = EWMA(300), [], []
+    for i, value in enumerate(values):
+        ewma.update(i * 20.0, value)
+        means.append(ewma.mean)
+        variances.append(ewma.variance)
+
+    ewm = values.ewm(alpha=1 - 0.5 ** (20 / 300), adjust=False)
+    np.testing.assert_allclose(means, ewm.mean(), rtol=1e-12, atol=1e-12)
+    np.testing.assert_allclose(variances, ewm.var(bias=True), rtol=1e-9, atol=1e-12)
+
+
+def test_ewma_weights_by_elapsed_time():
+    ewma = EWMA(60)
+    ewma.update(0.0, 0.0)
+    ewma.update(60.0, 1.0)
+    assert ewma.mean == pytest.approx(0.5)
+    ewma.update(180.0, 0.5)
+    assert ewma.mean == pytest.approx(0.5)
+
+
+@pytest.mark.parametrize("q", [0.0, 0.023, 0.5, 0.9, 1.0])
+def test_quantile_matches_pandas_rolling(series, q):
+    quantile, result = RollingQuantile(600), []
+    for timestamp, value in zip(to_epoch_seconds(series.index), series):
+        quantile.update(timestamp, value)
+        result.append(quantile.quantile(q))
+
+    expected = series.rolling("600s").quantile(q)
+    np.testing.assert_allclose(np.array(result, dtype=float), expected, rtol=1e-12, atol=1e-12)
+
+
+@pytest.mark.parametrize("kind", ["std", "ewma", "quantile"])
+def test_rolling_band_kinds(series, kind):
+    band = rolling_band(to_epoch_seconds(series.index), series.to_numpy(), 600, width=2, kind=kind)
+    valid = ~np.isnan(band["mean"])
+    assert valid.sum() > len(series) // 2
+    assert np.all(band["lower"][valid] <= band["mean"][valid])
+    assert np.all(band["mean"][valid] <= band["upper"][valid])
+
+
+def test_rolling_band_rejects_unknown_kind(series):
+    with pytest.raises(ValueError):
+        rolling_band(to_epoch_seconds(series.index), series.to_numpy(), 600, kind="mad")
@@ -0,0 +1,59 @@
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import synthetic
+from spd import LOOKBACK_MS, YEAR_SECONDS, compute_spd, compute_spd_batch
+
+END_MS = int(datetime(2026, 1, 5, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+@pytest.fixture(scope="module")
+def ticks():
+    rows = synthetic.curve_rows(["16JAN26", "23JAN26"], 30, 30, END_MS, interval_seconds=900)
+    frame = pd.DataFrame(rows, columns=["timestamp", "instrument_name", "underlying_price", "strike_price",
+                                        "mid_price", "mark_iv", "expiration_timestamp", "option_type", "log_moneyness"])
+    # Sparse, so some strikes were last quoted long before a snapshot or not within its day
+    frame = frame[np.random.default_rng(0).random(len(frame)) < 0.3]
+    return frame.sort_values("timestamp", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def test_batch_matches_single_snapshots(ticks, capsys):
+    pairs = [(int(ts), int(exp_ts)) for ts in sorted(ticks["timestamp"].unique())[::9]
+             for exp_ts in ticks["expiration_timestamp"].unique()]
+    summary, grids, spds = compute_spd_batch(ticks, pairs)
+
+    computed = 0
+    for timestamp, exp_ts in pairs:
+        # What get_spd_pdf_log.fetch_spd_data passes to compute_spd
+        window = ticks[(ticks["expiration_timestamp"] == exp_ts) & (ticks["timestamp"] >= timestamp - LOOKBACK_MS)
+                       & (ticks["timestamp"] <= timestamp)]
+        row = summary.index[(summary["timestamp"] == timestamp) & (summary["expiration_timestamp"] == exp_ts)]
+        if window.empty:
+            assert len(row) == 0
+            continue
+        grid, spd, iv_curve, skewness = compute_spd(window, window["underlying_price"].iloc[0],
+                                                    (exp_ts - timestamp // 1000) / YEAR_SECONDS)
+        if grid is None:
+            assert len(row) == 0
+            continue
+        assert len(row) == 1
+        computed += 1
+        i = row[0]
+        assert np.allclose(grids[i], grid, rtol=1e-12, atol=0)
+        assert np.allclose(spds[i], spd, rtol=1e-12, atol=1e-300)
+        assert np.isclose(summary.loc[i, "skewness"], skewness, rtol=1e-9, atol=1e-12)
+        assert np.allclose(summary.loc[i, "curve_log_moneyness"], iv_curve["log_moneyness"], rtol=1e-12)
+        assert np.allclose(summary.loc[i, "curve_iv"], iv_curve["mark_iv"], rtol=1e-12)
+    assert computed > len(pairs) // 2
+    capsys.readouterr()
+
+
+def test_batch_without_data():
+    empty = pd.DataFrame(columns=["timestamp", "expiration_timestamp", "strike_price", "mark_iv", "option_type",
+                                  "underlying_price"])
+    summary, grids, spds = compute_spd_batch(empty, [(END_MS, 1768550400)], grid_points=50)
+    assert summary.empty and grids.shape == (0, 50) and spds.shape == (0, 50)
+    assert {"mean", "std", "skewness", "kurtosis"} <= set(summary.columns)
@@ -0,0 +1,89 @@
+"""
+The ring buffer keeps the newest rows in order once it wraps, and the incremental
+band of SpreadHistory matches numpy over the rows still inside the window.
+"""
+import numpy as np
+import pytest
+
+from spread_history import LEGS, RingBuffer, SpreadHistory, rr_spread
+
+START_MS = 1_767_225_600_000  # a 20s boundary
+
+
+def test_ring_buffer_wraps_around():
+    ring = RingBuffer(4, ("a", "b"))
+    evicted = [ring.append(i, (i, 10 * i)) for i in range(10)]
+
+    assert evicted[:4] == [None] * 4
+    assert evicted[4][0] == 0 and list(evicted[4][1]) == [0, 0]
+    assert evicted[9][0] == 5
+    assert len(ring) == 4
+    timestamps, values = ring.ordered()
+    assert list(timestamps) == [6, 7, 8, 9]
+    assert values[:, 1].tolist() == [60, 70, 80, 90]
+    assert ring.latest()[0] == 9
+
+
+def quotes_at(i: int, rng) -> dict:
+    quotes = {}
+    for leg in LEGS:
+        bid_iv = 50 + rng.normal(scale=5)
+        bid_price = 0.05 + abs(rng.normal(scale=0.01))
+        quotes[leg] = {"bid_iv": bid_iv, "ask_iv": bid_iv + 1.0,
+                       "bid_price": bid_price, "ask_price": bid_price + 0.001}
+    return quotes
+
+
+@pytest.mark.parametrize("spread_way", ["SHORT", "LONG"])
+def test_band_matches_numpy_over_window(spread_way):
+    rng = np.random.default_rng(0)
+    history = SpreadHistory(spread_way, bar_seconds=20, window_seconds=200, band_window_seconds=600)
+    spreads = []
+    for i in range(200):
+        quotes = quotes_at(i, rng)
+        history.append_row(START_MS + i * 20000, quotes)
+        spreads.append(rr_spread(spread_way, *[quotes[leg] for leg in LEGS], field="iv"))
+
+        # Rows more than 600s old have been removed from the running mean and variance
+        window = np.array(spreads[-30:])
+        if len(window) >= 2:
+            lower, upper = history.band(2)
+            mean, std = window.mean(), window.std(ddof=1)
+            assert (lower + upper) / 2 == pytest.approx(mean, abs=1e-9)
+            assert (upper - lower) / 4 == pytest.approx(std, rel=1e-6)
+
+    # The ring holds the last 10 rows only, while the band spans the last 30
+    assert len(history.buffer) == 10
+    timestamp, spread, _ = history.latest()
+    assert timestamp == START_MS + 199 * 20000
+    assert spread == pytest.approx(spreads[-1])
+
+
+def test_missing_leg_rows_are_skipped_by_the_band():
+    rng = np.random.default_rng(1)
+    history = SpreadHistory("SHORT", window_seconds=600)
+    full = [quotes_at(i, rng) for i in range(3)]
+    history.append_row(START_MS, full[0])
+    history.append_row(START_MS + 20000, {leg: full[1][leg] for leg in LEGS[:3]})
+    history.append_row(START_MS + 40000, full[2])
+
+    spreads = [rr_spread("SHORT", *[quotes[leg] for leg in LEGS]) for quotes in (full[0], full[2])]
+    assert history.spread_stats.count == 2
+    assert history.spread_stats.mean == pytest.approx(np.mean(spreads))
+    assert history.latest()[0] == START_MS + 40000
+
+
+def test_live_ticks_close_every_crossed_bar():
+    rng = np.random.default_rng(2)
+    history = SpreadHistory("SHORT", window_seconds=600)
+    quotes = quotes_at(0, rng)
+    for leg in LEGS:
+        history.update_leg(leg, quotes[leg], START_MS + 1000)
+    assert len(history.buffer) == 0
+    assert history.live_spreads()[0] == pytest.approx(rr_spread("SHORT", *[quotes[leg] for leg in LEGS]))
+
+    # A tick three bars later closes three bars, forward-filled with the earlier quotes
+    history.update_leg("near_call", quotes_at(1, rng)["near_call"], START_MS + 61000)
+    timestamps, values = history.buffer.ordered()
+    assert list(timestamps) == [START_MS + 20000, START_MS + 40000, START_MS + 60000]
+    assert np.allclose(values[:, -2], rr_spread("SHORT", *[quotes[leg] for leg in LEGS]))
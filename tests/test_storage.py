@@ -0,0 +1,134 @@
+"""
+The SQLite and memmap backends must answer the queries of the runner and the scripts
+the same way (MySQL shares SQLStorage's queries with SQLite).
+"""
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import synthetic
+from bar_rollup import BAR_COLUMNS
+from storage import BAR_TABLE, SKEW_TABLE, TICK_TABLE, SQLiteStorage
+from tick_store import MemmapTickStore
+
+# Two hours across a UTC midnight, so the memmap store spans two day files
+END_MS = int(datetime(2026, 1, 5, 1, tzinfo=timezone.utc).timestamp() * 1000)
+DATES = ["16JAN26", "23JAN26"]
+TICK_COLUMNS = ["timestamp", "instrument_name", "strike_price", "mark_iv", "expiration_timestamp", "option_type"]
+
+
+@pytest.fixture(params=["sqlite", "memmap"])
+def store(request, tmp_path):
+    store = SQLiteStorage(str(tmp_path / "test.db")) if request.param == "sqlite" else MemmapTickStore(str(tmp_path))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def tick_rows():
+    return synthetic.curve_rows(DATES, 6, 2, END_MS, interval_seconds=300)
+
+
+def expected_ticks(rows, start_ms, end_ms=None, expirations=None, option_type=None) -> pd.DataFrame:
+    frame = pd.DataFrame(rows, columns=["timestamp", "instrument_name", "underlying_price", "strike_price", "mid_price",
+                                        "mark_iv", "expiration_timestamp", "option_type", "log_moneyness"])
+    keep = frame["timestamp"] >= start_ms
+    if end_ms is not None:
+        keep &= frame["timestamp"] < end_ms
+    if expirations is not None:
+        keep &= frame["expiration_timestamp"].isin(expirations)
+    if option_type is not None:
+        keep &= frame["option_type"] == option_type
+    return frame[keep][TICK_COLUMNS]
+
+
+def assert_same_rows(actual: pd.DataFrame, expected: pd.DataFrame) -> None:
+    # Newest first; rows of one timestamp come back in no particular order
+    assert (np.diff(actual["timestamp"].to_numpy(dtype=np.int64)) <= 0).all()
+    key = ["timestamp", "instrument_name"]
+    actual = actual.sort_values(key).reset_index(drop=True)
+    expected = expected.sort_values(key).reset_index(drop=True)
+    assert actual[key].astype(str).equals(expected[key].astype(str))
+    assert (actual["option_type"].to_numpy() == expected["option_type"].to_numpy()).all()
+    assert np.allclose(actual["mark_iv"].astype(float), expected["mark_iv"], rtol=1e-6)  # memmap keeps float32
+
+
+def test_query_range(store, tick_rows):
+    store.insert(TICK_TABLE, tick_rows)
+    store.commit()
+    start_ms, end_ms = END_MS - 90 * 60 * 1000, END_MS - 30 * 60 * 1000
+    expiration = synthetic.expiration_timestamp(DATES[1])
+
+    assert_same_rows(store.query_range(TICK_TABLE, TICK_COLUMNS, start_ms), expected_ticks(tick_rows, start_ms))
+    assert_same_rows(store.query_range(TICK_TABLE, TICK_COLUMNS, start_ms, end_ms),
+                     expected_ticks(tick_rows, start_ms, end_ms))
+    assert_same_rows(store.query_range(TICK_TABLE, TICK_COLUMNS, start_ms, end_ms, expirations=[expiration],
+                                       filters={"option_type": "put"}),
+                     expected_ticks(tick_rows, start_ms, end_ms, [expiration], "put"))
+
+    # The end bound is exclusive
+    last = max(row[0] for row in tick_rows)
+    assert store.query_range(TICK_TABLE, ["timestamp"], last, last).empty
+    assert (store.query_range(TICK_TABLE, ["timestamp"], last, last + 1)["timestamp"] == last).all()
+
+
+def test_uncommitted_rows_roll_back(store, tick_rows):
+    store.insert(TICK_TABLE, tick_rows[:10])
+    store.commit()
+    store.insert(TICK_TABLE, tick_rows[10:])
+    store.rollback()
+    assert len(store.query_range(TICK_TABLE, ["timestamp"], 0)) == 10
+
+
+def test_distinct_values_paging(store):
+    expirations = [synthetic.expiration_timestamp(date) for date in DATES]
+    timestamps = [END_MS - i * 60 * 1000 for i in range(150)]
+    store.insert(SKEW_TABLE, [(ts, exp, 0.1) for ts in timestamps for exp in expirations])
+    store.commit()
+
+    assert store.distinct_values(SKEW_TABLE, "expiration_timestamp") == sorted(expirations, reverse=True)
+    assert store.distinct_values(SKEW_TABLE, "timestamp", limit=10) == timestamps[:10]
+    pages, before = [], None
+    while True:
+        page = store.distinct_values(SKEW_TABLE, "timestamp", limit=40, before=before)
+        if not page:
+            break
+        assert len(page) <= 40
+        pages += page
+        before = page[-1]
+    assert pages == timestamps
+
+
+def bar_row(bar_timestamp: int, tick_count: int, bid_price, ask_price=None) -> tuple:
+    values = {"bid_price": bid_price, "ask_price": ask_price}
+    return (bar_timestamp, 20, "BTC-16JAN26-90000-C", synthetic.expiration_timestamp("16JAN26"), "call", tick_count,
+            *[values.get(column.rsplit("_", 1)[0]) for column in BAR_COLUMNS])
+
+
+def test_reopened_bar_merges(store):
+    bar = END_MS - 60 * 1000
+    store.insert(BAR_TABLE, [bar_row(bar, 5, 0.01, 0.02), bar_row(bar + 20000, 2, 0.03)])
+    store.commit()
+    # A late tick re-opens the first bar, without an ask
+    store.insert(BAR_TABLE, [bar_row(bar, 1, 0.02)])
+    store.commit()
+
+    columns = ["bar_timestamp", "tick_count", "bid_price_last", "bid_price_min", "bid_price_max", "ask_price_last"]
+    frame = store.query_range(BAR_TABLE, columns, bar)
+    assert frame["bar_timestamp"].tolist() == [bar + 20000, bar]
+    merged = frame.iloc[1]
+    assert merged["tick_count"] == 6
+    assert np.allclose([merged["bid_price_last"], merged["bid_price_min"], merged["bid_price_max"],
+                        merged["ask_price_last"]], [0.02, 0.01, 0.02, 0.02])
+
+
+def test_repeated_skew_snapshot_keeps_first(store):
+    expiration = synthetic.expiration_timestamp(DATES[0])
+    store.insert(SKEW_TABLE, [(END_MS, expiration, 0.1)])
+    store.commit()
+    store.insert(SKEW_TABLE, [(END_MS, expiration, 0.2)])
+    store.commit()
+    frame = store.query_range(SKEW_TABLE, ["timestamp", "atm_slope"], 0)
+    assert len(frame) == 1 and np.isclose(frame["atm_slope"].iloc[0], 0.1)
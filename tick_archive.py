@@ -0,0 +1,167 @@
+import argparse
+import logging
+import os
+import shutil
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+from storage import TABLES, open_storage
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # the archive is optional; readers fall back to the storage backend only
+    pa = None
+
+ARCHIVE_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "archive")
+
+ROW_GROUP_SIZE = 64 * 1024
+DAY_MS = 86400000
+
+
+def day_start_ms(day) -> int:
+    return int(datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def day_of_ms(timestamp_ms: int):
+    return datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc).date()
+
+
+def archived_days(table: str, root: str = ARCHIVE_ROOT) -> set:
+    """
+    UTC days of `table` present in the archive. Days are written whole, so a present day is complete.
+    """
+    path = os.path.join(root, table)
+    if pa is None or not os.path.isdir(path):
+        return set()
+    return {datetime.strptime(name[len("date="):], "%Y-%m-%d").date()
+            for name in os.listdir(path) if name.startswith("date=")}
+
+
+def export_day(storage, table: str, day, root: str = ARCHIVE_ROOT, chunk_hours: int = 1) -> int:
+    """
+    Writes one UTC day of `table` from `storage` to `<root>/<table>/date=YYYY-MM-DD/expiration_timestamp=<ts>/`,
+    sorted by time so row-group statistics prune time ranges. Returns the number of rows.
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow is required to export the archive")
+    time_column, columns = TABLES[table]
+    table_path = os.path.join(root, table)
+    staging = os.path.join(table_path, f".staging-{day:%Y-%m-%d}")  # ignored by readers until renamed
+    shutil.rmtree(staging, ignore_errors=True)
+
+    n_rows, part = 0, 0
+    for lower in range(day_start_ms(day), day_start_ms(day) + DAY_MS, chunk_hours * 3600 * 1000):
+        frame = storage.query_range(table, list(columns), lower, lower + chunk_hours * 3600 * 1000)
+        if frame.empty:
+            continue
+        frame = frame.iloc[::-1].reset_index(drop=True)  # oldest first
+        pq.write_to_dataset(pa.Table.from_pandas(frame, preserve_index=False), staging,
+                            partition_cols=["expiration_timestamp"],
+                            basename_template=f"part-{part}-{{i}}.parquet",
+                            row_group_size=ROW_GROUP_SIZE,
+                            existing_data_behavior="overwrite_or_ignore")
+        n_rows += len(frame)
+        part += 1
+
+    # An empty export (e.g. partitions already dropped) keeps the archived copy
+    if not n_rows:
+        shutil.rmtree(staging, ignore_errors=True)
+        return 0
+    final = os.path.join(table_path, f"date={day:%Y-%m-%d}")
+    previous = os.path.join(table_path, f".previous-{day:%Y-%m-%d}")
+    shutil.rmtree(previous, ignore_errors=True)
+    if os.path.isdir(final):
+        os.replace(final, previous)
+    os.replace(staging, final)
+    shutil.rmtree(previous, ignore_errors=True)
+    return n_rows
+
+
+def _dataset(table: str, root: str):
+    return ds.dataset(os.path.join(root, table), format="parquet", partitioning=ds.partitioning(
+        pa.schema([("date", pa.string()), ("expiration_timestamp", pa.int64())]), flavor="hive"))
+
+
+def read_archive(table: str, columns: list, start_ms: int, end_ms: int, expirations: list = None,
+                 filters: dict = None, root: str = ARCHIVE_ROOT) -> pd.DataFrame:
+    """
+    Rows of `table` with start_ms <= time < end_ms from the archive, loading only `columns`.
+    Date and expiry filters prune partitions; the time range prunes row groups.
+    """
+    time_column, _ = TABLES[table]
+    days = sorted(day for day in archived_days(table, root)
+                  if day_start_ms(day) < end_ms and day_start_ms(day) + DAY_MS > start_ms)
+    if not days:
+        return pd.DataFrame(columns=columns)
+
+    condition = (ds.field("date").isin([f"{day:%Y-%m-%d}" for day in days])
+                 & (ds.field(time_column) >= start_ms) & (ds.field(time_column) < end_ms))
+    if expirations is not None:
+        condition &= ds.field("expiration_timestamp").isin([int(exp) for exp in expirations])
+    for column, value in (filters or {}).items():
+        condition &= ds.field(column) == value
+
+    return _dataset(table, root).to_table(columns=columns, filter=condition).to_pandas()
+
+
+def read_history(storage, table: str, columns: list, start_ms: int, end_ms: int, expirations: list = None,
+                 filters: dict = None, root: str = ARCHIVE_ROOT) -> pd.DataFrame:
+    """
+    Rows of `table` in [start_ms, end_ms), newest first: archived days come from Parquet,
+    the remaining time spans from `storage` (a storage.Storage backend).
+    """
+    time_column, _ = TABLES[table]
+    archived = archived_days(table, root)
+    frames = [read_archive(table, columns, start_ms, end_ms, expirations, filters, root)] if archived else []
+
+    # Contiguous spans of days that are not archived yet
+    spans = []
+    day = day_of_ms(start_ms)
+    while day_start_ms(day) < end_ms:
+        lower, upper = max(start_ms, day_start_ms(day)), min(end_ms, day_start_ms(day) + DAY_MS)
+        if day not in archived:
+            if spans and spans[-1][1] == lower:
+                spans[-1][1] = upper
+            else:
+                spans.append([lower, upper])
+        day += timedelta(days=1)
+
+    for lower, upper in spans:
+        frames.append(storage.query_range(table, columns, lower, upper, expirations, filters))
+
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True).sort_values(time_column, ascending=False, kind="stable").reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level='INFO',
+        format='%(asctime)s | %(levelname)s | %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+
+    parser = argparse.ArgumentParser(description="Export completed UTC days of the tick tables to Parquet.")
+    parser.add_argument("--days", type=int, default=1, help="number of completed days to export, ending yesterday")
+    parser.add_argument("--tables", nargs="+", default=list(TABLES), choices=list(TABLES))
+    parser.add_argument("--root", default=ARCHIVE_ROOT)
+    parser.add_argument("--overwrite", action="store_true", help="re-export days already archived")
+    args = parser.parse_args()
+
+    storage = open_storage()
+
+    today = datetime.now(timezone.utc).date()
+    for table in args.tables:
+        done = archived_days(table, args.root)
+        for offset in range(args.days, 0, -1):
+            day = today - timedelta(days=offset)
+            if day in done and not args.overwrite:
+                continue
+            n_rows = export_day(storage, table, day, args.root)
+            logging.info(f"{table} {day}: archived {n_rows} rows")
+
+    storage.close()
@@ -0,0 +1,340 @@
+import os
+import struct
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from bar_rollup import BAR_COLUMNS
+from storage import BAR_TABLE, INTEGER_COLUMNS, SKEW_TABLE, TABLES, Storage
+
+MAGIC = b"BTCTICK1"
+VERSION = 1
+# magic, version, record size, committed record count, min/max timestamp, flags
+HEADER = struct.Struct("<8sIIqqqI")
+HEADER_SIZE = 64
+UNSORTED = 1
+# The time index keeps the min/max timestamp of every block of records
+BLOCK_RECORDS = 4096
+DAY_MS = 86400000
+
+STRING_WIDTHS = {"instrument_name": 32, "option_type": 4}
+# Unique keys of the SQL schema; rows appended again under a key are merged on read
+UNIQUE_KEYS = {
+    BAR_TABLE: ("instrument_name", "resolution_seconds", "bar_timestamp"),
+    SKEW_TABLE: ("timestamp", "expiration_timestamp"),
+}
+
+
+def record_dtype(table: str) -> np.dtype:
+    _, columns = TABLES[table]
+    return np.dtype([(column, f"S{STRING_WIDTHS[column]}") if column in STRING_WIDTHS else
+                     (column, "<i8") if column in INTEGER_COLUMNS else (column, "<f4")
+                     for column in columns])
+
+
+def to_records(table: str, rows: list) -> np.ndarray:
+    """
+    Row tuples in TABLES column order to a structured array; None becomes NaN (or 0 / b"").
+    """
+    dtype = record_dtype(table)
+    records = np.zeros(len(rows), dtype=dtype)
+    for column, values in zip(dtype.names, zip(*rows)):
+        if column in STRING_WIDTHS:
+            records[column] = [value or "" for value in values]
+        elif column in INTEGER_COLUMNS:
+            records[column] = [value or 0 for value in values]
+        else:
+            records[column] = pd.Series(values, dtype="float64").to_numpy()
+    return records
+
+
+def read_header(path: str) -> tuple:
+    with open(path, "rb") as f:
+        magic, version, record_size, count, min_ts, max_ts, flags = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a tick store file")
+    return record_size, count, min_ts, max_ts, flags
+
+
+def merge_duplicates(table: str, records: np.ndarray) -> np.ndarray:
+    """
+    One record per unique key, as the SQL backends' upserts leave it: a re-opened bar
+    sums tick counts, keeps the latest non-null last and the min/max over all appends;
+    a repeated skew snapshot keeps the first (INSERT IGNORE). Records are in append order.
+    """
+    key = UNIQUE_KEYS.get(table)
+    if key is None or len(records) < 2:
+        return records
+    keys = pd.DataFrame({column: records[column] for column in key})
+    if table == SKEW_TABLE:
+        return records[~keys.duplicated().to_numpy()]
+    repeated = keys.duplicated(keep=False).to_numpy()
+    if not repeated.any():
+        return records
+
+    frame = pd.DataFrame({column: records[repeated][column] for column in records.dtype.names})
+    aggregations = {column: "first" for column in records.dtype.names if column not in key}
+    aggregations["tick_count"] = "sum"
+    # NaN stands for NULL, and groupby last/min/max skip it, like the COALESCEs in storage._bar_merge
+    aggregations.update({column: "last" if column.endswith("_last") else "min" if column.endswith("_min") else "max"
+                         for column in BAR_COLUMNS})
+    merged_frame = frame.groupby(list(key), sort=False).agg(aggregations).reset_index()
+    merged = np.zeros(len(merged_frame), dtype=records.dtype)
+    for column in records.dtype.names:
+        merged[column] = merged_frame[column].to_numpy()
+    return np.concatenate([records[~repeated], merged])
+
+
+def open_records(path: str, dtype: np.dtype) -> tuple:
+    """
+    Read-only memmap of the committed records of one file, and its flags.
+    """
+    record_size, count, _, _, flags = read_header(path)
+    if record_size != dtype.itemsize:
+        raise ValueError(f"{path} has {record_size}-byte records, expected {dtype.itemsize}")
+    if count == 0:
+        return np.zeros(0, dtype=dtype), flags
+    return np.memmap(path, dtype=dtype, mode="r", offset=HEADER_SIZE, shape=(count,)), flags
+
+
+class TickFile:
+    """
+    Append-only file of fixed-width records: a 64-byte header, then the records.
+    The header count only covers flushed records, so readers never see a partial append.
+    Block min/max timestamps go to a `.tidx` sidecar.
+    """
+    def __init__(self, path: str, dtype: np.dtype, time_column: str) -> None:
+        self.path: str = path
+        self.index_path: str = path[:-len(".ticks")] + ".tidx"
+        self.dtype: np.dtype = dtype
+        self.time_column: str = time_column
+
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(HEADER.pack(MAGIC, VERSION, dtype.itemsize, 0, 0, 0, 0).ljust(HEADER_SIZE, b"\0"))
+            open(self.index_path, "wb").close()
+        self.file = open(path, "r+b")
+        self.index_file = open(self.index_path, "r+b")
+        self._load()
+
+    def _load(self) -> None:
+        _, self.count, self.min_ts, self.max_ts, self.flags = read_header(self.path)
+        self.file.truncate(HEADER_SIZE + self.count * self.dtype.itemsize)  # drop an unflushed tail
+        n_blocks = -(-self.count // BLOCK_RECORDS)
+        self.index_file.seek(0)
+        self.block_index = np.fromfile(self.index_file, dtype="<i8", count=2 * n_blocks).reshape(-1, 2).tolist()
+        self.committed_count = self.count
+        self.dirty_from_block = None
+
+    def append(self, records: np.ndarray) -> None:
+        timestamps = records[self.time_column]
+        if self.count and timestamps[0] < self.max_ts or np.any(np.diff(timestamps) < 0):
+            self.flags |= UNSORTED
+        self.min_ts = int(timestamps.min()) if self.count == 0 else min(self.min_ts, int(timestamps.min()))
+        self.max_ts = max(self.max_ts, int(timestamps.max()))
+
+        self.file.seek(HEADER_SIZE + self.count * self.dtype.itemsize)
+        self.file.write(records.tobytes())
+
+        # Extend the per-block min/max for the appended range
+        first_block = self.count // BLOCK_RECORDS
+        position = 0
+        while position < len(records):
+            block = (self.count + position) // BLOCK_RECORDS
+            end = min(len(records), (block + 1) * BLOCK_RECORDS - self.count)
+            lo, hi = int(timestamps[position:end].min()), int(timestamps[position:end].max())
+            if block < len(self.block_index):
+                self.block_index[block] = [min(self.block_index[block][0], lo), max(self.block_index[block][1], hi)]
+            else:
+                self.block_index.append([lo, hi])
+            position = end
+        self.count += len(records)
+        if self.dirty_from_block is None or first_block < self.dirty_from_block:
+            self.dirty_from_block = first_block
+
+    def sync(self) -> None:
+        if self.dirty_from_block is None:
+            return
+        self.file.flush()
+        # Index and records first, then the header that makes them visible
+        self.index_file.seek(self.dirty_from_block * 16)
+        self.index_file.write(np.asarray(self.block_index[self.dirty_from_block:], dtype="<i8").tobytes())
+        self.index_file.flush()
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, VERSION, self.dtype.itemsize, self.count,
+                                    self.min_ts, self.max_ts, self.flags))
+        self.file.flush()
+        self.committed_count = self.count
+        self.dirty_from_block = None
+
+    def rollback(self) -> None:
+        self.file.flush()
+        self._load()
+
+    def close(self) -> None:
+        self.file.close()
+        self.index_file.close()
+
+
+class MemmapTickStore(Storage):
+    """
+    Storage backend without a database server: one file of fixed-width NumPy records
+    per table, expiry and UTC day under `root`, read back through `np.memmap`.
+    Time ranges of time-ordered files are zero-copy slices found by binary search;
+    otherwise the block index limits the scan to overlapping blocks.
+    Re-opened bars and repeated skew snapshots are appended; query_range merges them
+    into one row per unique key, as the SQL backends do on insert.
+    Files with uncommitted appends stay open until commit, so rollback can undo them.
+    """
+    def __init__(self, root: str, max_open_files: int = 64) -> None:
+        self.root: str = root
+        self.max_open_files: int = max_open_files
+        self.open_files: OrderedDict = OrderedDict()
+
+    def path(self, table: str, expiration_timestamp: int, day: int) -> str:
+        # `day` counts UTC days since the epoch
+        day_str = np.datetime64(int(day), "D").astype(str).replace("-", "")
+        return os.path.join(self.root, table, str(int(expiration_timestamp)), f"{day_str}.ticks")
+
+    def _file(self, table: str, expiration_timestamp: int, day: int) -> TickFile:
+        path = self.path(table, expiration_timestamp, day)
+        tick_file = self.open_files.get(path)
+        if tick_file is None:
+            if len(self.open_files) >= self.max_open_files:
+                self._close_clean_files(self.max_open_files - 1)
+            tick_file = self.open_files[path] = TickFile(path, record_dtype(table), TABLES[table][0])
+        else:
+            self.open_files.move_to_end(path)
+        return tick_file
+
+    def _close_clean_files(self, keep: int) -> None:
+        # Least recently used first; files with uncommitted appends are skipped
+        for path in list(self.open_files):
+            if len(self.open_files) <= keep:
+                break
+            if self.open_files[path].dirty_from_block is None:
+                self.open_files.pop(path).close()
+
+    def insert(self, table: str, rows: list) -> None:
+        if not rows:
+            return
+        records = to_records(table, rows)
+        days = records[TABLES[table][0]] // DAY_MS
+        keys = np.stack([records["expiration_timestamp"], days], axis=1)
+        groups, inverse = np.unique(keys, axis=0, return_inverse=True)
+        for i, (expiration_timestamp, day) in enumerate(groups):
+            self._file(table, expiration_timestamp, day).append(records[inverse.ravel() == i])
+
+    def commit(self) -> None:
+        for tick_file in self.open_files.values():
+            tick_file.sync()
+        self._close_clean_files(self.max_open_files)
+
+    def rollback(self) -> None:
+        for tick_file in self.open_files.values():
+            tick_file.rollback()
+
+    def read_records(self, table: str, expiration_timestamp: int, day: int,
+                     start_ms: int = None, end_ms: int = None) -> np.ndarray:
+        """
+        Committed records of one file with start_ms <= time < end_ms. For time-ordered
+        files the result is a view on the memmap, not a copy.
+        """
+        path = self.path(table, expiration_timestamp, day)
+        dtype = record_dtype(table)
+        if not os.path.exists(path):
+            return np.zeros(0, dtype=dtype)
+        records, flags = open_records(path, dtype)
+        timestamps = records[TABLES[table][0]]
+        lower = np.iinfo(np.int64).min if start_ms is None else start_ms
+        upper = np.iinfo(np.int64).max if end_ms is None else end_ms
+
+        if not flags & UNSORTED:
+            return records[np.searchsorted(timestamps, lower, "left"):np.searchsorted(timestamps, upper, "left")]
+
+        n_blocks = -(-len(records) // BLOCK_RECORDS)
+        block_index = np.fromfile(path[:-len(".ticks")] + ".tidx", dtype="<i8", count=2 * n_blocks).reshape(-1, 2)
+        pieces = []
+        for block in np.flatnonzero((block_index[:, 1] >= lower) & (block_index[:, 0] < upper)):
+            chunk = records[block * BLOCK_RECORDS:(block + 1) * BLOCK_RECORDS]
+            chunk_ts = chunk[TABLES[table][0]]
+            pieces.append(chunk[(chunk_ts >= lower) & (chunk_ts < upper)])
+        return np.concatenate(pieces) if pieces else np.zeros(0, dtype=dtype)
+
+    def query_range(self, table: str, columns: list, start_ms: int, end_ms: int = None,
+                    expirations: list = None, filters: dict = None) -> pd.DataFrame:
+        time_column, _ = TABLES[table]
+        table_path = os.path.join(self.root, table)
+        if not os.path.isdir(table_path):
+            return pd.DataFrame(columns=list(columns))
+
+        first_day = start_ms // DAY_MS
+        last_day = None if end_ms is None else (end_ms - 1) // DAY_MS
+        wanted = None if expirations is None else {str(int(exp)) for exp in expirations}
+
+        pieces = []
+        for expiration in os.listdir(table_path):
+            if wanted is not None and expiration not in wanted:
+                continue
+            for name in os.listdir(os.path.join(table_path, expiration)):
+                if not name.endswith(".ticks"):
+                    continue
+                day = int(np.datetime64(f"{name[:4]}-{name[4:6]}-{name[6:8]}", "D").astype(np.int64))
+                if day < first_day or (last_day is not None and day > last_day):
+                    continue
+                records = merge_duplicates(table, self.read_records(table, int(expiration), day, start_ms, end_ms))
+                for column, value in (filters or {}).items():
+                    records = records[records[column] == (value.encode() if isinstance(value, str) else value)]
+                if len(records):
+                    pieces.append(records[list(dict.fromkeys([time_column, *columns]))])
+
+        if not pieces:
+            return pd.DataFrame(columns=list(columns))
+        records = np.concatenate(pieces)
+        records = records[np.argsort(-records[time_column], kind="stable")]
+        frame = pd.DataFrame({column: records[column] for column in columns})
+        for column in columns:
+            if column in STRING_WIDTHS:
+                frame[column] = frame[column].str.decode("ascii")
+        return frame
+
+    def distinct_values(self, table: str, column: str, limit: int = None, before=None) -> list:
+        table_path = os.path.join(self.root, table)
+        if not os.path.isdir(table_path):
+            return []
+        if column == "expiration_timestamp":
+            values = {int(expiration) for expiration in os.listdir(table_path)}
+        else:
+            dtype = record_dtype(table)
+            files: dict = {}
+            for expiration in os.listdir(table_path):
+                for name in os.listdir(os.path.join(table_path, expiration)):
+                    if name.endswith(".ticks"):
+                        files.setdefault(name, []).append(os.path.join(table_path, expiration, name))
+            time_column = column == TABLES[table][0]
+            if time_column and before is not None:
+                last_day = np.datetime64(int((before - 1) // DAY_MS), "D").astype(str).replace("-", "")
+                files = {name: paths for name, paths in files.items() if name[:8] <= last_day}
+
+            values = set()
+            # Newest day first; for the time column an older day cannot add larger values, so stop after a full page
+            for name in sorted(files, reverse=True):
+                for path in files[name]:
+                    records, _ = open_records(path, dtype)
+                    values.update(np.unique(records[column]).tolist())
+                if time_column and limit is not None and sum(before is None or value < before
+                                                             for value in values) >= limit:
+                    break
+            if column in STRING_WIDTHS:
+                values = {value.decode("ascii") for value in values}
+        if before is not None:
+            values = {value for value in values if value < before}
+        return sorted(values, reverse=True)[:limit]
+
+    def close(self) -> None:
+        for tick_file in self.open_files.values():
+            tick_file.sync()
+            tick_file.close()
+        self.open_files.clear()
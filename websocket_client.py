@@ -2,6 +2,9 @@ import asyncio
 import sys
 import json
 import logging
+import itertools
+import os
+import time
 from typing import Dict
 from datetime import datetime, timedelta
 import websockets
@@ -10,13 +13,27 @@ from cryptography.hazmat.primitives.asymmetric import padding
 import secrets  # Secure random nonce generator
 import base64
 import re
-import mysql.connector
 import numpy as np
 import pandas as pd
 from scipy.interpolate import CubicSpline
 from telegram import Update
 import telegram
 from telegram.ext import ApplicationBuilder, CommandHandler, ContextTypes
+from bar_rollup import LEG_BAR_COLUMNS, BarAggregator, leg_frames
+from clock import Clock
+from db_writer import BatchedDBWriter
+from iv_curves import ExpiryCurve
+from instrument_cache import InstrumentNameCache, parse_instrument_name
+from market_recorder import FrameRecorder
+from metrics import LatencyHistogram, MetricsRegistry, serve_metrics
+from spread_history import LEGS, SpreadHistory
+from storage import BAR_TABLE, RAW_TABLE, SKEW_TABLE, TICK_TABLE, StorageExecutor, open_storage
+from ws_pipeline import CONTROL, MARKET, PRIVATE, MonitoredQueue, classify_frame
+
+
+OPTION_TICKER_CHANNEL_PATTERN = re.compile(r"^ticker\.BTC-(\d{2}[A-Z]{3}\d{2})-(\d+)-([CP])\.100ms$")
+ORDER_METHODS = ("private/buy", "private/sell")
+
 
 
 class WebSocketClient:
@@ -34,6 +51,16 @@ class WebSocketClient:
         self.access_token = None
         self.refresh_token = None
         self.refresh_token_expiry_time = None
+        # JSON-RPC request ids and the futures waiting for their responses
+        self.request_ids = itertools.count(1)
+        self.pending_requests: Dict = {}
+        self.request_timeout: float = 10.0
+        # Latency histograms and counters, served in Prometheus format by serve_metrics
+        self.metrics = MetricsRegistry("skew_bot_")
+        self.signal_to_order = self.metrics.histogram(
+            "signal_to_order_seconds", "Trade decision to order request written to the socket")
+        # perf_counter() of the trade decision whose orders are being sent
+        self.signal_at = None
 
     def signature(self) -> None:
         # Generate a timestamp
@@ -52,63 +79,101 @@ class WebSocketClient:
         )
         self.encoded_signature = base64.urlsafe_b64encode(signature).decode('utf-8').rstrip('=')
 
-    async def establish_heartbeat(self) -> None:
+    async def send_request(self, method: str, params: Dict, wait: bool = True, timeout: float = None):
         """
-        Requests DBT's `public/set_heartbeat` to
-        establish a heartbeat connection.
+        Sends a JSON-RPC request under a fresh id. With `wait`, returns the
+        response carrying the same id or raises asyncio.TimeoutError.
         """
+        request_id = next(self.request_ids)
         msg: Dict = {
                     "jsonrpc": "2.0",
-                    "id": 9098,
-                    "method": "public/set_heartbeat",
-                    "params": {
-                              "interval": 10
-                               }
+                    "id": request_id,
+                    "method": method,
+                    "params": params
                     }
 
-        await self.websocket_client.send(
-            json.dumps(
-                msg
-                )
-                )
+        future = None
+        if wait:
+            future = asyncio.get_running_loop().create_future()
+            self.pending_requests[request_id] = future
+
+        sent_at = time.perf_counter()
+        try:
+            await self.websocket_client.send(json.dumps(msg))
+            if self.signal_at is not None and method in ORDER_METHODS:
+                self.signal_to_order.observe(time.perf_counter() - self.signal_at)
+            if future is None:
+                return None
+            response = await asyncio.wait_for(future, timeout or self.request_timeout)
+            self.metrics.histogram("rpc_round_trip_seconds", "Request sent to response handled",
+                                   method=method).observe(time.perf_counter() - sent_at)
+            return response
+        finally:
+            self.pending_requests.pop(request_id, None)
+
+    def resolve_response(self, message: Dict) -> bool:
+        """
+        Hands a response to the request waiting for its id.
+        Returns False when nobody is waiting (fire-and-forget or timed out).
+        """
+        future = self.pending_requests.pop(message.get('id'), None)
+        if future is None or future.done():
+            return False
+        future.set_result(message)
+        return True
+
+    async def establish_heartbeat(self) -> None:
+        """
+        Requests DBT's `public/set_heartbeat` to
+        establish a heartbeat connection.
+        """
+        await self.send_request("public/set_heartbeat", {"interval": 10})
 
     async def heartbeat_response(self) -> None:
         """
         Sends the required WebSocket response to
         the Deribit API Heartbeat message.
         """
-        msg: Dict = {
-                    "jsonrpc": "2.0",
-                    "id": 8212,
-                    "method": "public/test",
-                    "params": {}
-                    }
-
-        await self.websocket_client.send(
-            json.dumps(
-                msg
-                )
-                )
+        # Never wait here: responses are resolved by the same worker that answers heartbeats
+        await self.send_request("public/test", {}, wait=False)
 
     async def ws_auth(self):
         """
         Authenticate WebSocket Connection.
         """
-        msg = {
-            "jsonrpc": "2.0",
-            "id": 9929,
-            "method": "public/auth",
-            "params": {
-                "grant_type": "client_signature",
-                "client_id": self.client_id,
-                "timestamp": self.timestamp,
-                "signature": self.encoded_signature,
-                "nonce": self.nonce,  # Secure random nonce
-                "data": self.data
-            }
+        params = {
+            "grant_type": "client_signature",
+            "client_id": self.client_id,
+            "timestamp": self.timestamp,
+            "signature": self.encoded_signature,
+            "nonce": self.nonce,  # Secure random nonce
+            "data": self.data
         }
-        await self.websocket_client.send(json.dumps(msg))
-        logging.info(f"Request for auth: {msg}")
+        logging.info(f"Request for auth: {params}")
+        message = await self.send_request("public/auth", params)
+        self.handle_auth_response(message)
+
+    def handle_auth_response(self, message: Dict) -> None:
+        if self.refresh_token is None:
+            if message.get("result") is not None:
+                logging.info('Successfully authenticated WebSocket Connection')
+                logging.info(message)
+            else:
+                logging.info('Failed to authenticate WebSocket Connection')
+                logging.info(message)
+                sys.exit(1)
+        else:
+            logging.info('Successfully refreshed the authentication of the WebSocket Connection')
+        self.access_token = message['result']['access_token']
+        self.refresh_token = message['result']['refresh_token']
+
+        # Refresh Authentication well before the required datetime
+        if message['testnet']:
+            expires_in: int = 300
+        else:
+            expires_in: int = message['result']['expires_in'] - 240
+
+        self.refresh_token_expiry_time = datetime.now() + timedelta(seconds=expires_in)
 
     async def ws_refresh_auth(self) -> None:
         """
@@ -118,21 +183,14 @@ class WebSocketClient:
         while True:
             if self.refresh_token_expiry_time is not None:
                 if datetime.now() > self.refresh_token_expiry_time:
-                    msg: Dict = {
-                                "jsonrpc": "2.0",
-                                "id": 9929,
-                                "method": "public/auth",
-                                "params": {
-                                          "grant_type": "refresh_token",
-                                          "refresh_token": self.refresh_token
-                                            }
-                                }
-
-                    await self.websocket_client.send(
-                        json.dumps(
-                            msg
-                            )
-                            )
+                    try:
+                        message = await self.send_request("public/auth", {
+                                                          "grant_type": "refresh_token",
+                                                          "refresh_token": self.refresh_token
+                                                          })
+                        self.handle_auth_response(message)
+                    except Exception as e:
+                        logging.info(f"Failed to refresh the authentication: {e}")
 
             await asyncio.sleep(5)
 
@@ -141,25 +199,9 @@ class WebSocketClient:
         Requests `public/subscribe` or `public/unsubscribe`
         to DBT's API for the specific WebSocket Channel.
         """
-        await asyncio.sleep(1)
-
-        msg: Dict = {
-                    "jsonrpc": "2.0",
-                    "method": f"private/{operation}",
-                    "id": 42,
-                    "params": {
-                        "channels": ws_channel
-                        }
-                    }
-
-        await self.websocket_client.send(
-            json.dumps(
-                msg
-                )
-            )
-        logging.info(f"Request for subscribe: {msg}")
-
-        await asyncio.sleep(5)
+        logging.info(f"Request for {operation}: {ws_channel}")
+        message = await self.send_request(f"private/{operation}", {"channels": ws_channel})
+        logging.info(f"Result of {operation}: {message}")
 
     async def place_order_buy(self, instrument_name: str, amount: float, price: float = None, time_in_force: str = "fill_or_kill",
                               reduce_only: str = 'false', advanced: str = None , order_type: str = "market", label: str = None, post_only: bool = False):
@@ -168,24 +210,21 @@ class WebSocketClient:
         direction: "buy" or "sell"
         order_type: "limit" or "market"
         """
-        msg = {
-            "jsonrpc": "2.0",
-            "id": 1001,
-            "method": "private/buy",
-            "params": {
-                "instrument_name": instrument_name,
-                "amount": amount,
-                "type": order_type,
-                "price": price,
-                "post_only": post_only,
-                "reduce_only": reduce_only,
-            }
+        params = {
+            "instrument_name": instrument_name,
+            "amount": amount,
+            "type": order_type,
+            "price": price,
+            "post_only": post_only,
+            "reduce_only": reduce_only,
         }
         if label:
-            msg["params"]["label"] = label
+            params["label"] = label
 
-        await self.websocket_client.send(json.dumps(msg))
-        logging.info(f"Buy order sent: {msg}")
+        logging.info(f"Buy order sent: {params}")
+        message = await self.send_request("private/buy", params)
+        logging.info(f"Result of executes: {message}")
+        return message
 
     async def place_order_sell(self, instrument_name: str, amount: float, price: float = None, time_in_force: str = "fill_or_kill",
                               reduce_only: str = 'false', advanced: str = None, order_type: str = "market", label: str = None, post_only: bool = False):
@@ -194,39 +233,28 @@ class WebSocketClient:
         direction: "buy" or "sell"
         order_type: "limit" or "market"
         """
-        msg = {
-            "jsonrpc": "2.0",
-            "id": 1001,
-            "method": "private/sell",
-            "params": {
-                "instrument_name": instrument_name,
-                "amount": amount,
-                "type": order_type,
-                "price": price,
-                "post_only": post_only,
-                "reduce_only": reduce_only,
-            }
+        params = {
+            "instrument_name": instrument_name,
+            "amount": amount,
+            "type": order_type,
+            "price": price,
+            "post_only": post_only,
+            "reduce_only": reduce_only,
         }
         if label:
-            msg["params"]["label"] = label
+            params["label"] = label
 
-        await self.websocket_client.send(json.dumps(msg))
-        logging.info(f"Sell order sent: {msg}")
+        logging.info(f"Sell order sent: {params}")
+        message = await self.send_request("private/sell", params)
+        logging.info(f"Result of executes: {message}")
+        return message
 
     async def cancel_order(self, order_id: str):
         """
         Cancel a single order.
         """
-        msg = {
-            "jsonrpc": "2.0",
-            "id": 1002,
-            "method": "private/cancel",
-            "params": {
-                "order_id": order_id
-            }
-        }
-        await self.websocket_client.send(json.dumps(msg))
-        logging.info(f"Cancel order sent: {msg}")
+        logging.info(f"Cancel order sent: {order_id}")
+        return await self.send_request("private/cancel", {"order_id": order_id})
 
     async def edit_order(self, order_id: str, price: float = None, amount: float = None):
         """
@@ -240,14 +268,8 @@ class WebSocketClient:
         if amount is not None:
             params["amount"] = amount
 
-        msg = {
-            "jsonrpc": "2.0",
-            "id": 1003,
-            "method": "private/edit",
-            "params": params
-        }
-        await self.websocket_client.send(json.dumps(msg))
-        logging.info(f"Edit order sent: {msg}")
+        logging.info(f"Edit order sent: {params}")
+        return await self.send_request("private/edit", params)
 
     async def create_combo(self, order_list: list):
         """
@@ -263,33 +285,21 @@ class WebSocketClient:
                 "direction": leg["direction"]
             })
 
-        msg = {
-            "jsonrpc": "2.0",
-            "id": 1004,
-            "method": "private/create_combo_order",
-            "params": {
-                "combo_order": combo
-            }
-        }
-
-        await self.websocket_client.send(json.dumps(msg))
-        logging.info(f"Combo order sent: {msg}")
+        logging.info(f"Combo order sent: {combo}")
+        return await self.send_request("private/create_combo_order", {"combo_order": combo})
 
     async def simulate_portfolio(self, simulated_positions: dict, add_positions: str="false"):
 
-        msg = {
-            "jsonrpc": "2.0",
-            "id": 1005,
-            "method": "private/simulate_portfolio",
-            "params": {
-                "currency": "BTC",
-                "add_positions": add_positions,
-                "simulated_positions": simulated_positions
-            }
+        params = {
+            "currency": "BTC",
+            "add_positions": add_positions,
+            "simulated_positions": simulated_positions
         }
 
-        await self.websocket_client.send(json.dumps(msg))
         logging.info(f"🔍 Sent simulate_portfolio request with positions: {simulated_positions}")
+        message = await self.send_request("private/simulate_portfolio", params)
+        logging.info(f"Result of Simulation: {message}")
+        return message
 
     async def get_positions(self, kind: str = "option", currency: str = "BTC"):
 
@@ -299,44 +309,31 @@ class WebSocketClient:
         if kind:
             params["kind"] = kind
 
-        msg = {
-            "jsonrpc": "2.0",
-            "id": 1006,
-            "method": "private/get_positions",
-            "params": params
-        }
-        await self.websocket_client.send(json.dumps(msg))
         logging.info(f"📦 get_positions request sent (kind={kind})")
+        message = await self.send_request("private/get_positions", params)
+        logging.info(f"Position: {message}")
+        return message
 
     async def get_account_summary(self, currency: str = "BTC"):
 
-        params = {"currency": currency}
-
-        msg = {
-            "jsonrpc": "2.0",
-            "id": 1007,
-            "method": "private/get_account_summary",
-            "params": params
-        }
-        await self.websocket_client.send(json.dumps(msg))
         logging.info(f"📦 get_account_summary request sent")
+        message = await self.send_request("private/get_account_summary", {"currency": currency})
+        logging.info(f"Account summary: {message}")
+        return message
 
     async def close_position(self, instrument_name: str, type: str = "market", price: float = None):
 
-        msg = {
-            "jsonrpc": "2.0",
-            "id": 1008,
-            "method": "private/close_position",
-            "params": {
-                "instrument_name": instrument_name,
-                "type": type,
-                "price": price
-            }
+        params = {
+            "instrument_name": instrument_name,
+            "type": type,
+            "price": price
         }
-        await self.websocket_client.send(json.dumps(msg))
-        logging.info(f"close_position order sent: {msg}")
+        logging.info(f"close_position order sent: {params}")
+        return await self.send_request("private/close_position", params)
 class Strategy_RR(WebSocketClient):
-    def __init__(self, *args, bot_token, chat_id, **kwargs):
+    def __init__(self, *args, bot_token, chat_id, storage, signal_min_interval: float = 0.5,
+                 clock: Clock = None, recorder: FrameRecorder = None, metrics_port: int = None,
+                 band_kind: str = "std", autostart: bool = True, **kwargs):
         super().__init__(*args, **kwargs)
         self.spread_lower_bound = None
         self.spread_upper_bound = None
@@ -356,42 +353,98 @@ class Strategy_RR(WebSocketClient):
         self.perpetual_expirations_raw: list = []
         self.selected_expirations_raw: list = []
         self.selected_expirations_subscribe: list = []
+        self.channel_routes: dict = {}
+        self.instrument_cache = InstrumentNameCache()
         self.spread_way = "SHORT"
         self.bot_token = bot_token
         self.chat_id = chat_id
+        self.bot = None
         self.loop = asyncio.new_event_loop()
-        self.start()
+        # Every DB call runs on the executor's threads; coroutines await the results
+        self.storage = storage
+        self.storage_executor = StorageExecutor(self.storage)
+        # Ticks are written in batches by a dedicated flusher instead of one commit per row
+        self.db_writer = BatchedDBWriter(self.storage, executor=self.storage_executor)
+        # 1s/20s/1m bars per instrument, written to btc_options_bar as they close
+        self.bar_aggregator = BarAggregator()
+        # Time and periodic sleeps go through the clock; a replay substitutes recorded time
+        self.clock = clock or Clock()
+        # Frames are read by one task and processed by per-type workers
+        self.control_queue = MonitoredQueue(CONTROL, clock=self.clock)
+        self.market_queue = MonitoredQueue(MARKET, maxsize=10000, drop_oldest=True, clock=self.clock)
+        self.private_queue = MonitoredQueue(PRIVATE, clock=self.clock)
+        # Signals are evaluated on leg ticks, at most once per `signal_min_interval` seconds
+        self.leg_instruments: dict = {}
+        self.leg_roles: dict = {}
+        # Resampled leg quotes and RR spreads for the last 12 hours, fed by the live stream
+        self.spread_history = None
+        self.band_kind: str = band_kind
+        # Per-expiry live IV curves fed by markprice.options.btc_usd
+        self.iv_curves: dict = {}
+        self.signal_event = asyncio.Event()
+        self.signal_min_interval: float = signal_min_interval
+        self.pending_tick_received_at = None
+        self.signal_latency = LatencyHistogram()
+        # Per-stage latencies; `metrics_port` serves them on localhost for Prometheus
+        self.metrics_port = metrics_port
+        self.parse_latency: dict = {}
+        self.dispatch_latency: dict = {}
+        for queue in (self.control_queue, self.market_queue, self.private_queue):
+            self.parse_latency[queue.name] = self.metrics.histogram(
+                "parse_seconds", "JSON decoding of one frame", queue=queue.name)
+            self.dispatch_latency[queue.name] = self.metrics.histogram(
+                "dispatch_seconds", "Handler time for one decoded frame", queue=queue.name)
+            self.metrics.register("queue_wait_seconds", queue.wait_latency,
+                                  "Receive to dequeue by the worker", queue=queue.name)
+            self.metrics.gauge("queue_depth", queue.qsize, "Frames waiting in the queue", queue=queue.name)
+            self.metrics.gauge("queue_dropped_frames", lambda queue=queue: queue.dropped,
+                               "Frames discarded by a full queue", queue=queue.name)
+        self.channel_metrics: dict = {}  # channel -> (message counter, exchange lag histogram)
+        self.spline_fit_latency = self.metrics.histogram("spline_fit_seconds", "IV curve spline fit and ATM slope")
+        self.metrics.register("db_write_seconds", self.db_writer.flush_latency, "Insert and commit of one batch")
+        self.metrics.register("db_rows_written_total", self.db_writer.rows_written, "Rows committed")
+        self.metrics.gauge("db_failed_rows", lambda: self.db_writer.failed_rows, "Rows lost to failed batches")
+        self.metrics.gauge("db_queue_depth", self.db_writer.queue.qsize, "Rows waiting for the writer")
+        self.metrics.register("tick_to_decision_seconds", self.signal_latency, "Leg tick received to signal evaluated")
+        # Optional journal of every received frame, replayable with replay.py
+        self.recorder = recorder
+        if autostart:
+            self.start()
 
     # Start the loop
     def start(self):
         print("Hi")
         self.get_user_expiration_dates()
-        self.generate_subscribe()
+        self.prepare()
+        self.run()
+
+    # Run every task and the WebSocket session until the connection breaks
+    def run(self):
         self.signature()
+        self.loop.create_task(self.db_writer.run())
+        self.loop.create_task(self.close_stale_bars())
         self.loop.create_task(self.update_subscribe())
         self.loop.create_task(self.compute_spd_skewness())
         self.loop.create_task(self.risk_manager())
         self.loop.create_task(self.should_execute())
-        self.loop.create_task(self.initialize_telegram_bot())
+        if self.bot_token:
+            self.loop.create_task(self.initialize_telegram_bot())
+        self.loop.create_task(self.log_pipeline_stats())
+        if self.metrics_port:
+            self.loop.create_task(serve_metrics(self.metrics, "127.0.0.1", self.metrics_port))
         self.loop.run_until_complete(self.ws_manager())
 
+    # State derived from the selected expirations, before any frame is handled
+    def prepare(self):
+        self.instrument_cache.set_tracked_dates(self.selected_expirations_raw)
+        self.spread_history = SpreadHistory(self.spread_way, band_kind=self.band_kind)
+        self.iv_curves = {exp_ts: ExpiryCurve() for exp_ts in self.selected_expirations}
+        self.loop.run_until_complete(self.seed_spread_history())
+        self.generate_subscribe()
+
     # Extract elements from a title of instrument
     def extract_strike_price_type_expiration(self, instr_name):
-        match = re.search(r'-(\d{2}[A-Z]{3}\d{2})-(\d+)-([CP])', instr_name)
-        if match:
-            date_str = match.group(1)
-            strike_price = float(match.group(2))
-            option_type = "call" if match.group(3) == "C" else "put"
-
-            try:
-                expiration_date = datetime.strptime(date_str, "%d%b%y")
-                expiration_timestamp = int(expiration_date.timestamp())
-            except ValueError:
-                expiration_timestamp = None
-
-            return strike_price, option_type, expiration_timestamp, date_str
-
-        return None, None, None, None
+        return parse_instrument_name(instr_name)
 
     # Obtain user inputs
     def get_user_expiration_dates(self):
@@ -399,9 +452,13 @@ class Strategy_RR(WebSocketClient):
         user_input_2 = input("Please input any expiration dates using PERPETUAL price (format: DDMMMYY, separated by commas): ").strip()
         user_input_3 = input("Please input way. SHORT? LONG?: ").upper()
         user_input_4 = input("Execute enabled?: ").upper()
+        self.set_expiration_dates(user_input.split(","), user_input_2.split(","), user_input_3, user_input_4 == "TRUE")
+
+    # Expirations, direction and execution flag; the replay driver sets them without prompting
+    def set_expiration_dates(self, dates: list, perpetual_dates: list, spread_way: str, enabled: bool):
         expiration_dates = []
 
-        for date_str in user_input.split(","):
+        for date_str in dates:
             date_str = date_str.strip().upper()
             try:
                 self.selected_expirations_raw.append(date_str)
@@ -412,7 +469,7 @@ class Strategy_RR(WebSocketClient):
             except ValueError:
                 print(f"⚠️ Invalid date format: {date_str}. Please use DDMMMYY (e.g., 28MAR25).")
 
-        for date_str in user_input_2.split(","):
+        for date_str in perpetual_dates:
             date_str = date_str.strip().upper()
             try:
                 self.perpetual_expirations_raw.append(date_str)
@@ -421,12 +478,8 @@ class Strategy_RR(WebSocketClient):
 
         expiration_dates.sort()
         self.selected_expirations = expiration_dates
-        self.spread_way = user_input_3
-
-        if user_input_4 == "TRUE":
-            self.enabled = True
-        else:
-            self.enabled = False
+        self.spread_way = spread_way.upper()
+        self.enabled = enabled
 
     # Generate initial subscribe list consisting of futures and general options
     def generate_subscribe(self):
@@ -435,10 +488,52 @@ class Strategy_RR(WebSocketClient):
             self.latest_underlying_prices[f"BTC-{date}"] = False
         self.selected_expirations_subscribe.append("markprice.options.btc_usd")
         self.selected_expirations_subscribe.append("ticker.BTC-PERPETUAL.100ms")
+        self.build_channel_routes()
+
+    # Instrument names of the four RR legs for the current strikes
+    def update_leg_instruments(self):
+        near_date = self.expirations_pair[self.selected_expirations[0]]
+        far_date = self.expirations_pair[self.selected_expirations[1]]
+        self.leg_instruments = {
+            "near_call": "BTC-{0}-{1}-C".format(near_date, self.otm_call[f"BTC-{near_date}"][0]),
+            "far_call": "BTC-{0}-{1}-C".format(far_date, self.otm_call[f"BTC-{far_date}"][0]),
+            "near_put": "BTC-{0}-{1}-P".format(near_date, self.otm_put[f"BTC-{near_date}"][0]),
+            "far_put": "BTC-{0}-{1}-P".format(far_date, self.otm_put[f"BTC-{far_date}"][0]),
+        }
+        # Quotes of a replaced strike must not be mixed with the new leg
+        for leg, instrument_name in self.leg_instruments.items():
+            if self.leg_roles.get(instrument_name) != leg:
+                self.spread_history.reset_leg(leg)
+        self.leg_roles = {instrument_name: leg for leg, instrument_name in self.leg_instruments.items()}
+
+    # Map every channel we may receive to its handler and the metadata parsed from its name
+    def build_channel_routes(self):
+        routes: dict = {}
+
+        for date in self.selected_expirations_raw:
+            routes[f"ticker.BTC-{date}.100ms"] = (self.handle_future_ticker, {"dates": [date]})
+
+        perpetual_dates = [date for date in self.selected_expirations_raw if date in self.perpetual_expirations_raw]
+        routes["ticker.BTC-PERPETUAL.100ms"] = (self.handle_future_ticker, {"dates": perpetual_dates})
+        routes["markprice.options.btc_usd"] = (self.handle_markprice, {})
+
+        for channel in self.selected_expirations_subscribe:
+            match = OPTION_TICKER_CHANNEL_PATTERN.match(channel)
+            if not match or match.group(1) not in self.selected_expirations_raw:
+                continue
+            date = match.group(1)
+            routes[channel] = (self.handle_option_ticker, {
+                "date": date,
+                "strike_price": float(match.group(2)),
+                "option_type": "call" if match.group(3) == "C" else "put",
+                "expiration_timestamp": int(datetime.strptime(date, "%d%b%y").timestamp()),
+            })
+
+        self.channel_routes = routes
 
     # Adopting strike prices whose log moneyness is closest to 0.1 and -0.1, respectively
     async def update_subscribe(self):
-        await asyncio.sleep(20)
+        await self.clock.sleep(20)
 
         while True:
             pre_selected_expirations_subscribe = self.selected_expirations_subscribe
@@ -446,12 +541,12 @@ class Strategy_RR(WebSocketClient):
 
             if len(self.latest_underlying_prices) != len(self.selected_expirations_raw):
                 print(f"⚠️ Underlying prices are needed.Please wait...")
-                await asyncio.sleep(20)
+                await self.clock.sleep(20)
                 continue
 
             if self.strike_prices == {}:
                 print(f"⚠️ Strike prices are needed. Please wait...")
-                await asyncio.sleep(20)
+                await self.clock.sleep(20)
                 continue
 
             for date in self.selected_expirations_raw:
@@ -473,197 +568,154 @@ class Strategy_RR(WebSocketClient):
                     self.selected_expirations_subscribe.append(
                         "ticker.BTC-{0}-{1}-P.100ms".format(date, level))
 
+            self.update_leg_instruments()
+            self.build_channel_routes()
+            self.instrument_cache.evict_expired(self.clock.time())
             await self.ws_subscribe(operation='unsubscribe', ws_channel= pre_selected_expirations_subscribe)
             await self.ws_subscribe(operation='subscribe', ws_channel=self.selected_expirations_subscribe)
             print(f"Subscriptions are updated. {self.selected_expirations_subscribe}")
-            await asyncio.sleep(600)
+            await self.clock.sleep(600)
+
+    # Latest mark IV per strike of one expiry from btc_options_tick; cold-start fallback for the live curves
+    async def fetch_curve_snapshot(self, exp_ts):
+        # btc_option_tick using 13digit unix time
+        since_ms = int((self.clock.now() - timedelta(days=1)).timestamp() * 1000)
+        exp_data = await self.storage_executor.query_range(
+            TICK_TABLE, ['timestamp', 'strike_price', 'mark_iv', 'option_type', 'underlying_price'],
+            since_ms, expirations=[exp_ts])
+        logging.debug(exp_data)
+
+        if exp_data.empty:
+            return None
+
+        snapshot = {
+            "timestamp": int(exp_data['timestamp'].iloc[0]),
+            "underlying_price": float(exp_data['underlying_price'].iloc[0]),
+        }
+        # **Ensure Unique Strike Prices and Sort**
+        for option_type in ("call", "put"):
+            data = exp_data[exp_data['option_type'] == option_type].drop_duplicates('strike_price', keep='first').sort_values(
+                'strike_price')
+            snapshot[f"{option_type}_strikes"] = data['strike_price'].to_numpy(dtype=float)
+            snapshot[f"{option_type}_iv"] = data['mark_iv'].to_numpy(dtype=float)
+        return snapshot
 
     # Compute options' skewness; regarding ATM slope as skewness
     async def compute_spd_skewness(self):
         while True:
-            await asyncio.sleep(60)
-
-            for exp_ts in self.selected_expirations:
-                # btc_option_tick using 13digit unix time
-                sql = """
-                    SELECT timestamp, strike_price, mark_iv, option_type, underlying_price
-                    FROM btc_options_tick 
-                    WHERE expiration_timestamp = %s
-                    and timestamp >= UNIX_TIMESTAMP(NOW()-INTERVAL 1 DAY) * 1000
-                    ORDER BY timestamp DESC 
-                    ;
-                """
-                cursor.execute(sql, (exp_ts,))
-                rows = cursor.fetchall()
-                logging.debug(rows)
-
-                if not rows:
-                    continue
+            await self.clock.sleep(60)
+            await self.update_skewness()
+
+    # One ATM-slope update for every selected expiry
+    async def update_skewness(self):
+        for exp_ts in self.selected_expirations:
+            formatted_date = self.expirations_pair[exp_ts]
+
+            # Live curve maintained by the markprice handler; MySQL is only read on a cold start
+            since_ms = int((self.clock.now() - timedelta(days=1)).timestamp() * 1000)
+            snapshot = self.iv_curves[exp_ts].snapshot(since_ms)
+            if snapshot is None:
+                snapshot = await self.fetch_curve_snapshot(exp_ts)
+            if snapshot is None:
+                continue
 
-                exp_data = pd.DataFrame(rows, columns=['timestamp', 'strike_price', 'mark_iv', 'option_type', 'underlying_price'])
+            local_latest_underlying_price = snapshot['underlying_price']
+            current_time = snapshot['timestamp']
 
-                local_latest_underlying_price = exp_data['underlying_price'].iloc[0] if not exp_data.empty else None
-                current_time = exp_data['timestamp'].iloc[0] if not exp_data.empty else None
+            # **Check for Minimum Data Requirement**
+            if len(snapshot['call_strikes']) < 4 or len(snapshot['put_strikes']) < 4:
+                print(f"⚠️ Not enough unique data for expiration {formatted_date}. Skipping...")
+                continue
 
-                formatted_date = self.expirations_pair[exp_ts]
+            try:
+                # **Get Remaining Maturity (T-t) in Years**
+                remaining_maturity = (int(exp_ts) - (int(current_time)/1000)) / (
+                            365 * 24 * 60 * 60)  # Convert seconds to years
 
-                if exp_data.empty:
+                if remaining_maturity <= 0:
+                    print(f"⚠️ Expiry {formatted_date} already passed. Skipping...")
                     continue
 
-                # **Ensure Unique Strike Prices and Sort**
-                call_data = exp_data[exp_data['option_type'] == 'call'].drop_duplicates('strike_price', keep='first').sort_values(
-                    'strike_price')
-                call_data['log_moneyness'] = np.log(call_data["strike_price"] / local_latest_underlying_price)
-                put_data = exp_data[exp_data['option_type'] == 'put'].drop_duplicates('strike_price', keep='first').sort_values(
-                    'strike_price')
-                put_data['log_moneyness'] = np.log(put_data["strike_price"] / local_latest_underlying_price)
-
-                # **Check for Minimum Data Requirement**
-                if len(call_data) < 4 or len(put_data) < 4:
-                    print(f"⚠️ Not enough unique data for expiration {formatted_date}. Skipping...")
-                    continue
+                # **Interpolate Volatility Curve**
+                strikes = np.concatenate([snapshot['put_strikes'], snapshot['call_strikes']])
+                mark_iv = np.concatenate([snapshot['put_iv'], snapshot['call_iv']])
+                self.strike_prices[formatted_date] = list(np.unique(strikes))
+                # Average mark_iv for duplicate moneyness
+                log_moneyness, inverse = np.unique(np.log(strikes / local_latest_underlying_price), return_inverse=True)
+                curve_iv = np.bincount(inverse, weights=mark_iv) / np.bincount(inverse)
+                print(f'amount of data : {len(log_moneyness)}')
+                logging.debug(remaining_maturity)
+                fit_started = time.perf_counter()
+                cs_iv_curve = CubicSpline(log_moneyness, curve_iv, extrapolate=True)
+                atm_slope = cs_iv_curve.derivative()(0)
+                self.spline_fit_latency.observe(time.perf_counter() - fit_started)
+                print("ATM Slope:", float(atm_slope))
+
+                # **Save SPD Skewness with a timestamp**
+                values = (int(current_time), exp_ts, float(atm_slope)) # current_time already in ms
+                await self.db_writer.put(SKEW_TABLE, values)
+
+                print(f"📊 SPD Skewness for Expiry {formatted_date} at {self.clock.now()} : {float(atm_slope)}")
 
-                try:
-                    # **Get Remaining Maturity (T-t) in Years**
-                    remaining_maturity = (int(exp_ts) - (int(current_time)/1000)) / (
-                                365 * 24 * 60 * 60)  # Convert seconds to years
-
-                    if remaining_maturity <= 0:
-                        print(f"⚠️ Expiry {formatted_date} already passed. Skipping...")
-                        continue
-
-                    # **Interpolate Volatility Curve**
-                    iv_curve = pd.concat([put_data, call_data]).sort_values('log_moneyness')
-                    self.strike_prices[self.expirations_pair[exp_ts]] = sorted(iv_curve["strike_price"].unique())
-                    iv_curve = iv_curve.groupby('log_moneyness', as_index=False)['mark_iv'].mean()
-                    print(f'amount of data : {len(iv_curve)}')
-                    logging.debug(iv_curve)
-                    logging.debug(remaining_maturity)
-                    cs_iv_curve = CubicSpline(iv_curve['log_moneyness'].astype(float), iv_curve['mark_iv'].astype(float),
-                                              extrapolate=True)
-                    atm_slope = cs_iv_curve.derivative()(0)
-                    print("ATM Slope:", float(atm_slope))
-
-                    # **Save SPD Skewness to MySQL with a timestamp**
-                    sql = """
-                        INSERT IGNORE INTO btc_iv_spd_skewness (timestamp, expiration_timestamp, atm_slope) 
-                        VALUES (%s, %s, %s)
-                    """
-                    values = (int(current_time), exp_ts, float(atm_slope)) # current_time already in ms
-                    cursor.execute(sql, values)
-                    conn.commit()
-
-                    print(f"📊 SPD Skewness for Expiry {formatted_date} at {datetime.now()} : {float(atm_slope)}")
-
-                except Exception as e:
-                    print(f"⚠️ Error processing expiration {formatted_date}: {e}")
-                    continue
+            except Exception as e:
+                print(f"⚠️ Error processing expiration {formatted_date}: {e}")
+                continue
 
     # Fetching target data from the past 12 hours
-    def fetch_data(self):
-        sql = """
-                SELECT timestamp, expiration_timestamp, option_type, bid_price, ask_price, bid_iv, ask_iv, log_moneyness, delta, theta
-                FROM btc_options_raw
-                WHERE timestamp >= UNIX_TIMESTAMP(NOW() - INTERVAL 0.5 DAY) * 1000
-                ORDER BY timestamp DESC;
-        """
-        cursor.execute(sql)
-        rows = cursor.fetchall()
-
-        if not rows:
-            return None
-
-        df = pd.DataFrame(rows, columns=['timestamp', 'expiration_timestamp', 'option_type','bid_price', 'ask_price', 'bid_iv', 'ask_iv', 'log_moneyness', 'delta', 'theta'])
-        df['timestamp'] = df['timestamp'].apply(lambda x: datetime.fromtimestamp(int(x)/1000).replace(microsecond=0))
-
-        near_call_data = (
-            df[(df['option_type'] == 'call') & (df['expiration_timestamp'] == self.selected_expirations[0])]
-            .drop_duplicates('timestamp', keep='first').sort_values('timestamp'))
-        near_call_data = near_call_data.set_index('timestamp')
-        near_call_data = near_call_data.resample('20s').ffill()
-
-        far_call_data = (
-            df[(df['option_type'] == 'call') & (df['expiration_timestamp'] == self.selected_expirations[1])]
-            .drop_duplicates('timestamp', keep='first').sort_values('timestamp'))
-        far_call_data = far_call_data.set_index('timestamp')
-        far_call_data = far_call_data.resample('20s').ffill()
-
-        near_put_data = (
-            df[(df['option_type'] == 'put') & (df['expiration_timestamp'] == self.selected_expirations[0])]
-            .drop_duplicates('timestamp', keep='first').sort_values('timestamp')
-        )
-        near_put_data = near_put_data.set_index('timestamp')
-        near_put_data = near_put_data.resample('20s').ffill()
-
-        far_put_data = (
-            df[(df['option_type'] == 'put') & (df['expiration_timestamp'] == self.selected_expirations[1])]
-            .drop_duplicates('timestamp', keep='first').sort_values('timestamp')
-        )
-        far_put_data = far_put_data.set_index('timestamp')
-        far_put_data = far_put_data.resample('20s').ffill()
-
-        df['expiration_timestamp'] = df['expiration_timestamp'].apply(lambda x: datetime.fromtimestamp(int(x)))
-
-        near_call_data['mid_price'] = (near_call_data['bid_price'] + near_call_data['ask_price']) / 2
-        far_call_data['mid_price'] = (far_call_data['bid_price'] + far_call_data['ask_price']) / 2
-        near_put_data['mid_price'] = (near_put_data['bid_price'] + near_put_data['ask_price']) / 2
-        far_put_data['mid_price'] = (far_put_data['bid_price'] + far_put_data['ask_price']) / 2
-
-        near_call_data['mid_iv'] = (near_call_data['bid_iv'] + near_call_data['ask_iv']) / 2
-        far_call_data['mid_iv'] = (far_call_data['bid_iv'] + far_call_data['ask_iv']) / 2
-        near_put_data['mid_iv'] = (near_put_data['bid_iv'] + near_put_data['ask_iv']) / 2
-        far_put_data['mid_iv'] = (far_put_data['bid_iv'] + far_put_data['ask_iv']) / 2
-
-        return near_call_data, far_call_data, near_put_data, far_put_data
+    async def fetch_data(self):
+        # 20s bars rolled up at ingest: one row per leg per bar instead of every tick
+        since_ms = int((self.clock.now() - timedelta(hours=12)).timestamp() * 1000)
+        bars = await self.storage_executor.query_range(
+            BAR_TABLE, LEG_BAR_COLUMNS, since_ms, expirations=self.selected_expirations[:2],
+            filters={'resolution_seconds': 20})
+        # UTC index, so the seeded rows line up with the epoch buckets of the live stream
+        return leg_frames(bars, self.selected_expirations, local_time=False)
+
+    # Seed the spread history once from the DB; afterwards it is maintained from the live stream
+    async def seed_spread_history(self):
+        try:
+            data = await self.fetch_data()
+        except Exception as e:
+            print(f"⚠️ Could not seed the spread history: {e}")
+            return
+        if data is None:
+            return
+        near_call, far_call, near_put, far_put = data
+
+        merged_far = pd.merge(far_call, far_put, on='timestamp', suffixes=('_far_call', '_far_put'))
+        merged_near = pd.merge(near_put, near_call, on='timestamp', suffixes=('_near_put', '_near_call'))
+        final_df = pd.merge(merged_far, merged_near, on='timestamp')
+        if 'timestamp' in final_df.index.names:
+            final_df = final_df.reset_index()
+        final_df = final_df.sort_values('timestamp')
+
+        for _, row in final_df.iterrows():
+            quotes = {leg: {field: row[f"{field}_{leg}"]
+                            for field in ("bid_iv", "ask_iv", "bid_price", "ask_price")}
+                      for leg in LEGS}
+            self.spread_history.append_row(int(row['timestamp'].timestamp() * 1000), quotes)
+        print(f"Spread history seeded with {len(self.spread_history.buffer)} rows")
 
     # Check the margin
     async def risk_manager(self):
         while True:
-            await asyncio.sleep(60)
+            await self.clock.sleep(60)
             try:
-                near_call, far_call, near_put, far_put = self.fetch_data()
-
-                # Merge far_call and far_put
-                merged_far = pd.merge(far_call, far_put, on='timestamp', suffixes=('_far_call', '_far_put'))
-
-                # Merge near_put and near_call
-                merged_near = pd.merge(near_put, near_call, on='timestamp', suffixes=('_near_put', '_near_call'))
-
-                # Merge far and near results on timestamp
-                final_df = pd.merge(merged_far, merged_near, on='timestamp')
-
-                # Calculate spread using bid/ask
-                if self.spread_way == "LONG":
-                    final_df['far_spread'] = - final_df['ask_iv_far_call'] + final_df['bid_iv_far_put']
-                    final_df['near_spread'] = - final_df['ask_iv_near_put'] + final_df['bid_iv_near_call']
-                    final_df['RR_spread'] = final_df['far_spread'] + final_df['near_spread']
-                    final_df['far_spread_price'] = - final_df['ask_price_far_call'] + final_df['bid_price_far_put']
-                    final_df['near_spread_price'] = - final_df['ask_price_near_put'] + final_df['bid_price_near_call']
-                    final_df['RR_spread_price'] = final_df['far_spread_price'] + final_df['near_spread_price']
-                elif self.spread_way == "SHORT":
-                    final_df['far_spread'] = final_df['bid_iv_far_call'] - final_df['ask_iv_far_put']
-                    final_df['near_spread'] = final_df['bid_iv_near_put'] - final_df['ask_iv_near_call']
-                    final_df['RR_spread'] = final_df['far_spread'] + final_df['near_spread']
-                    final_df['far_spread_price'] = final_df['bid_price_far_call'] - final_df['ask_price_far_put']
-                    final_df['near_spread_price'] = final_df['bid_price_near_put'] - final_df['ask_price_near_call']
-                    final_df['RR_spread_price'] = final_df['far_spread_price'] + final_df['near_spread_price']
-                else:
-                    print("Please check the way.")
-                    return
-
-                final_df = final_df.dropna()
-                final_df = final_df.sort_values("timestamp")
-                latest_row = final_df.sort_values("timestamp").iloc[-1]
-                self.latest_rr_spread = latest_row["RR_spread"]
-                self.latest_rr_spread_price = latest_row["RR_spread_price"]
-                print(f'latest_rr_spread: {self.latest_rr_spread}')
-                print(f'latest_rr_spread_price: {self.latest_rr_spread_price}')
-
-                # Calculate mean and standard deviation (You can use it as a threshold)
-                mean_spread = final_df['RR_spread'].mean()
-                std_dev = final_df['RR_spread'].std()
-                self.spread_lower_bound = mean_spread - 2 * std_dev
-                self.spread_upper_bound = mean_spread + 2 * std_dev
+                # Latest resampled spread and its band, maintained from the live stream
+                latest = self.spread_history.latest()
+                if latest is not None:
+                    _, latest_bar_spread, latest_bar_spread_price = latest
+                    print(f'latest_rr_spread (20s bar): {latest_bar_spread}')
+                    print(f'latest_rr_spread_price (20s bar): {latest_bar_spread_price}')
+                    if self.latest_rr_spread is None:
+                        self.latest_rr_spread = latest_bar_spread
+                        self.latest_rr_spread_price = latest_bar_spread_price
+
+                # Band of the spread, for monitoring only: entries are gated on the spread's sign
+                band = self.spread_history.band(2)
+                if band is not None:
+                    self.spread_lower_bound, self.spread_upper_bound = band
+                    print(f'spread band ({self.band_kind}): {self.spread_lower_bound} .. {self.spread_upper_bound}')
 
                 if (self.otm_call == {}) or (self.otm_put == {}):
                     print("⚠️ Simulation: Please wait until getting the strike prices")
@@ -671,7 +723,7 @@ class Strategy_RR(WebSocketClient):
 
                 # Simulate the strategy to check margin
                 if self.spread_way == "SHORT":
-                    await self.simulate_portfolio({
+                    simulation = await self.simulate_portfolio({
                                                    "BTC-{0}-{1}-C".format(
                                                        self.expirations_pair[self.selected_expirations[1]],
                                                        self.otm_call[
@@ -690,23 +742,13 @@ class Strategy_RR(WebSocketClient):
                                                            f"BTC-{self.expirations_pair[self.selected_expirations[0]]}"][0]): -0.1,
                                                    })
 
-                    await asyncio.sleep(5)
                     # Check margin status
-                    if self.portfolio_status == None:
-                        self.pre_margin_check_short = False
-                    elif self.portfolio_status['result']['equity'] < self.portfolio_status['result'][
-                        'projected_maintenance_margin'] * 1.2:
-                        self.pre_margin_check_short = False
-                    elif self.portfolio_status['result']['margin_balance'] < self.portfolio_status['result'][
-                        'projected_initial_margin']:
-                        self.pre_margin_check_short = False
-                    else:
-                        self.pre_margin_check_short = True
+                    self.pre_margin_check_short = self.margin_check_passed(simulation)
                     print(f"pre_margin_check: {self.pre_margin_check_short}")
 
 
                 elif self.spread_way == "LONG":
-                    await self.simulate_portfolio({
+                    simulation = await self.simulate_portfolio({
                         "BTC-{0}-{1}-C".format(
                             self.expirations_pair[self.selected_expirations[1]],
                             self.otm_call[
@@ -725,98 +767,441 @@ class Strategy_RR(WebSocketClient):
                                 f"BTC-{self.expirations_pair[self.selected_expirations[0]]}"][0]): 0.1,
                     })
 
-                    await asyncio.sleep(5)
                     # Check margin status
-                    if self.portfolio_status == None:
-                        self.pre_margin_check_long = False
-                    elif self.portfolio_status['result']['equity'] < self.portfolio_status['result'][
-                        'projected_maintenance_margin'] * 1.2:
-                        self.pre_margin_check_long = False
-                    elif self.portfolio_status['result']['margin_balance'] < self.portfolio_status['result'][
-                        'projected_initial_margin']:
-                        self.pre_margin_check_long = False
-                    else:
-                        self.pre_margin_check_long = True
+                    self.pre_margin_check_long = self.margin_check_passed(simulation)
                     print(f"pre_margin_check: {self.pre_margin_check_long}")
 
                 print(f"enabled? :{self.enabled}")
 
-                await self.get_positions()
-                await self.get_account_summary()
+                positions = await self.get_positions()
+                if positions.get('result') is not None:
+                    self.portfolio_position = positions["result"]
+
+                account_summary = await self.get_account_summary()
+                await self.check_account_margin(account_summary)
 
             except Exception as e:
                 print(f"⚠️ Error processing while simulation: {e}")
                 continue
 
-    # Detect signals for trades
+    # Margin check on a simulate_portfolio response
+    def margin_check_passed(self, simulation: Dict) -> bool:
+        if simulation.get('result') is None:
+            return False
+        self.portfolio_status = simulation
+        if simulation['result']['equity'] < simulation['result']['projected_maintenance_margin'] * 1.2:
+            return False
+        if simulation['result']['margin_balance'] < simulation['result']['projected_initial_margin']:
+            return False
+        return True
+
+    # Close all legs when the account gets close to maintenance margin
+    async def check_account_margin(self, account_summary: Dict) -> None:
+        if account_summary.get('result') is None:
+            return
+        if account_summary["result"]['margin_balance'] < account_summary["result"]['maintenance_margin'] * 1.1:
+            await asyncio.gather(
+                self.close_position(instrument_name="BTC-{0}-{1}-C".format(
+                    self.expirations_pair[self.selected_expirations[1]],
+                    self.otm_call[
+                        f"BTC-{self.expirations_pair[self.selected_expirations[1]]}"][0])),
+                self.close_position(instrument_name="BTC-{0}-{1}-P".format(
+                    self.expirations_pair[self.selected_expirations[1]],
+                    self.otm_put[
+                        f"BTC-{self.expirations_pair[self.selected_expirations[1]]}"][0])),
+                self.close_position(instrument_name="BTC-{0}-{1}-C".format(
+                    self.expirations_pair[self.selected_expirations[0]],
+                    self.otm_call[
+                        f"BTC-{self.expirations_pair[self.selected_expirations[0]]}"][0])),
+                self.close_position(instrument_name="BTC-{0}-{1}-P".format(
+                    self.expirations_pair[self.selected_expirations[0]],
+                    self.otm_put[
+                        f"BTC-{self.expirations_pair[self.selected_expirations[0]]}"][0])),
+            )
+
+            print("Trades are closed.")
+
+    # Notify the fills of one order response
+    async def report_order_result(self, message: Dict) -> None:
+        if message.get('result') is None:
+            await self.trade_alarm(f"⚠️ Order failed at {self.trade_time}: {message.get('error')}")
+            return
+
+        amount = 0
+        weighted_price = 0
+        profit_loss = 0
+        contracts = 0
+        fee = 0
+        for i in range(len(message["result"]["trades"])):
+            state = message["result"]["trades"][i]["state"]
+            amount += message["result"]["trades"][i]["amount"]
+            weighted_price += message["result"]["trades"][i]["price"] * \
+                              message["result"]["trades"][i]["amount"]
+            direction = message["result"]["trades"][i]["direction"]
+            instrument_name = message["result"]["trades"][i]["instrument_name"]
+            profit_loss += message["result"]["trades"][i]["profit_loss"]
+            contracts += message["result"]["trades"][i]["contracts"]
+            fee += message["result"]["trades"][i]["fee"]
+
+        if amount == 0:
+            return
+
+        average_price = weighted_price / amount
+
+        await self.trade_alarm(
+            f"{state}: {direction} {instrument_name} {contracts} at {self.trade_time}.\n"
+            f" Average price:{average_price}\n"
+            f" pnl:{profit_loss}")
+        print("✅ Trades data inserted at {0} for {1}".format(self.clock.now(), instrument_name))
+
+    # Wake the signal evaluation for a tick on one of the four legs
+    def request_signal_evaluation(self, received_at: float) -> None:
+        if self.pending_tick_received_at is None:
+            self.pending_tick_received_at = received_at
+        self.signal_event.set()
+
+    # Detect signals for trades on every leg update, debounced by `signal_min_interval`
     async def should_execute(self):
+        last_evaluation = 0.0
         while True:
-            await asyncio.sleep(60)
+            await self.signal_event.wait()
+            wait = last_evaluation + self.signal_min_interval - self.clock.monotonic()
+            if wait > 0:
+                await self.clock.sleep(wait)
+            self.signal_event.clear()
+            last_evaluation = self.clock.monotonic()
+
+            received_at = self.pending_tick_received_at
+            self.pending_tick_received_at = None
             try:
-                if self.enabled:
-                    # Execute a 0.1-unit Risk Reversal position conditional on positive spreads
-                    # in both implied volatility and underlying price.
-                    # Potential improvement: refine the signal detection methodology
-
-                    if (self.latest_rr_spread > 0) & (self.latest_rr_spread_price > 0):
-                        logging.info(f"pre_margin_check_long = {self.pre_margin_check_long}")
-                        logging.info(f"pre_margin_check_short = {self.pre_margin_check_short}")
-
-                        if (self.spread_way == "SHORT") & (self.pre_margin_check_short == True):
-                            self.trade_time = datetime.now()
-                            await self.place_order_sell(instrument_name ="BTC-{0}-{1}-C".format(
-                                    self.expirations_pair[self.selected_expirations[1]],
-                                    self.otm_call[
-                                        f"BTC-{self.expirations_pair[self.selected_expirations[1]]}"][0]), amount=0.1)
-                            await self.place_order_buy(instrument_name="BTC-{0}-{1}-P".format(
-                                    self.expirations_pair[self.selected_expirations[1]],
-                                    self.otm_put[
-                                        f"BTC-{self.expirations_pair[self.selected_expirations[1]]}"][0]), amount=0.1)
-                            await self.place_order_buy(instrument_name="BTC-{0}-{1}-C".format(
-                                    self.expirations_pair[self.selected_expirations[0]],
-                                    self.otm_call[
-                                        f"BTC-{self.expirations_pair[self.selected_expirations[0]]}"][0]), amount=0.1)
-                            await self.place_order_sell(instrument_name="BTC-{0}-{1}-P".format(
-                                    self.expirations_pair[self.selected_expirations[0]],
-                                    self.otm_put[
-                                        f"BTC-{self.expirations_pair[self.selected_expirations[0]]}"][0]), amount=0.1)
-                            print("SHORT EXECUTE!!!")
-                            self.enabled = False
-                            continue
-
-                        if (self.spread_way == "LONG") & (self.pre_margin_check_long == True):
-                            self.trade_time = datetime.now()
-                            await self.place_order_buy(instrument_name="BTC-{0}-{1}-C".format(
+                await self.evaluate_signal(received_at)
+            except Exception as e:
+                print(f"⚠️ Error processing while simulation: {e}")
+
+    async def evaluate_signal(self, received_at: float = None):
+        spreads = self.spread_history.live_spreads()
+        if spreads is None or spreads[0] is None:
+            return
+        self.latest_rr_spread, self.latest_rr_spread_price = spreads
+
+        # Tick-to-decision latency: the decision inputs are ready, orders (if any) follow
+        if received_at is not None:
+            self.signal_latency.observe(self.clock.time() - received_at)
+
+        if self.enabled:
+            # Execute a 0.1-unit Risk Reversal position conditional on positive spreads
+            # in both implied volatility and underlying price.
+            # Potential improvement: refine the signal detection methodology
+
+            if (self.latest_rr_spread > 0) & (self.latest_rr_spread_price > 0):
+                logging.info(f"pre_margin_check_long = {self.pre_margin_check_long}")
+                logging.info(f"pre_margin_check_short = {self.pre_margin_check_short}")
+
+                if (self.spread_way == "SHORT") & (self.pre_margin_check_short == True):
+                    self.trade_time = self.clock.now()
+                    label = f"{self.trade_time}"
+                    self.signal_at = time.perf_counter()
+                    # All four legs are in flight at once; each response is matched by its request id
+                    results = await asyncio.gather(
+                        self.place_order_sell(instrument_name ="BTC-{0}-{1}-C".format(
                                 self.expirations_pair[self.selected_expirations[1]],
                                 self.otm_call[
-                                    f"BTC-{self.expirations_pair[self.selected_expirations[1]]}"][0]), amount=0.1)
-                            await self.place_order_sell(instrument_name="BTC-{0}-{1}-P".format(
+                                    f"BTC-{self.expirations_pair[self.selected_expirations[1]]}"][0]), amount=0.1, label=label),
+                        self.place_order_buy(instrument_name="BTC-{0}-{1}-P".format(
                                 self.expirations_pair[self.selected_expirations[1]],
                                 self.otm_put[
-                                    f"BTC-{self.expirations_pair[self.selected_expirations[1]]}"][0]), amount=0.1)
-                            await self.place_order_sell(instrument_name="BTC-{0}-{1}-C".format(
+                                    f"BTC-{self.expirations_pair[self.selected_expirations[1]]}"][0]), amount=0.1, label=label),
+                        self.place_order_buy(instrument_name="BTC-{0}-{1}-C".format(
                                 self.expirations_pair[self.selected_expirations[0]],
                                 self.otm_call[
-                                    f"BTC-{self.expirations_pair[self.selected_expirations[0]]}"][0]), amount=0.1)
-                            await self.place_order_buy(instrument_name="BTC-{0}-{1}-P".format(
+                                    f"BTC-{self.expirations_pair[self.selected_expirations[0]]}"][0]), amount=0.1, label=label),
+                        self.place_order_sell(instrument_name="BTC-{0}-{1}-P".format(
                                 self.expirations_pair[self.selected_expirations[0]],
                                 self.otm_put[
-                                    f"BTC-{self.expirations_pair[self.selected_expirations[0]]}"][0]), amount=0.1)
-                            print("LONG EXECUTE!!!")
-                            self.enabled = False
-                            continue
-                else:
-                    continue
+                                    f"BTC-{self.expirations_pair[self.selected_expirations[0]]}"][0]), amount=0.1, label=label),
+                    )
+                    self.signal_at = None
+                    for result in results:
+                        await self.report_order_result(result)
+                    print("SHORT EXECUTE!!!")
+                    self.enabled = False
+                    return
 
-            except Exception as e:
-                print(f"⚠️ Error processing while simulation: {e}")
+                if (self.spread_way == "LONG") & (self.pre_margin_check_long == True):
+                    self.trade_time = self.clock.now()
+                    label = f"{self.trade_time}"
+                    self.signal_at = time.perf_counter()
+                    # All four legs are in flight at once; each response is matched by its request id
+                    results = await asyncio.gather(
+                        self.place_order_buy(instrument_name="BTC-{0}-{1}-C".format(
+                            self.expirations_pair[self.selected_expirations[1]],
+                            self.otm_call[
+                                f"BTC-{self.expirations_pair[self.selected_expirations[1]]}"][0]), amount=0.1, label=label),
+                        self.place_order_sell(instrument_name="BTC-{0}-{1}-P".format(
+                            self.expirations_pair[self.selected_expirations[1]],
+                            self.otm_put[
+                                f"BTC-{self.expirations_pair[self.selected_expirations[1]]}"][0]), amount=0.1, label=label),
+                        self.place_order_sell(instrument_name="BTC-{0}-{1}-C".format(
+                            self.expirations_pair[self.selected_expirations[0]],
+                            self.otm_call[
+                                f"BTC-{self.expirations_pair[self.selected_expirations[0]]}"][0]), amount=0.1, label=label),
+                        self.place_order_buy(instrument_name="BTC-{0}-{1}-P".format(
+                            self.expirations_pair[self.selected_expirations[0]],
+                            self.otm_put[
+                                f"BTC-{self.expirations_pair[self.selected_expirations[0]]}"][0]), amount=0.1, label=label),
+                    )
+                    self.signal_at = None
+                    for result in results:
+                        await self.report_order_result(result)
+                    print("LONG EXECUTE!!!")
+                    self.enabled = False
+                    return
+
+    # Updating BTC price from a futures or perpetual ticker
+    async def handle_future_ticker(self, data: Dict, channel_info: Dict, received_at: float) -> None:
+        for date in channel_info["dates"]:
+            self.latest_underlying_prices[f"BTC-{date}"] = data.get("mark_price", None)
+            print("🔹 Updated BTC Future Price For {0}: {1}".format(date, self.latest_underlying_prices[f"BTC-{date}"]))
+
+    # Updating options for calculating spread
+    async def handle_option_ticker(self, option_data: Dict, channel_info: Dict, received_at: float) -> None:
+        logging.debug(option_data)
+
+        date_str = channel_info["date"]
+        strike_price = channel_info["strike_price"]
+        option_type = channel_info["option_type"]
+        expiration_timestamp = channel_info["expiration_timestamp"]
+        underlying_price = self.latest_underlying_prices.get(f"BTC-{date_str}")
+
+        if not underlying_price:
+            return
+        if option_type == "call" and strike_price < underlying_price:
+            return
+        if option_type == "put" and strike_price > underlying_price:
+            return
+
+        timestamp = option_data.get('timestamp', None)
+        instrument_name = option_data.get('instrument_name', None)
+        bid_price = option_data.get('best_bid_price', None)
+        ask_price = option_data.get('best_ask_price', None)
+        bid_iv = option_data.get('bid_iv', None)
+        ask_iv = option_data.get('ask_iv', None)
+        delta = option_data['greeks'].get('delta', None)
+        vega = option_data['greeks'].get('vega', None)
+        theta = option_data['greeks'].get('theta', None)
+
+        log_moneyness = np.log(strike_price / underlying_price)
+
+        # Storing through SQL; queued for the batched writer
+        values = (timestamp, instrument_name, expiration_timestamp, option_type,
+                  bid_price, ask_price, bid_iv, ask_iv,
+                  underlying_price,
+                  strike_price, log_moneyness,
+                  delta, vega, theta)
+        await self.db_writer.put(RAW_TABLE, values)
+        await self.queue_bars(self.bar_aggregator.update(
+            instrument_name, expiration_timestamp, option_type, timestamp,
+            {"bid_price": bid_price, "ask_price": ask_price, "bid_iv": bid_iv, "ask_iv": ask_iv,
+             "mark_iv": option_data.get('mark_iv', None)}))
+
+        leg = self.leg_roles.get(instrument_name)
+        if leg is not None:
+            self.spread_history.update_leg(leg, {"bid_iv": bid_iv, "ask_iv": ask_iv,
+                                                 "bid_price": bid_price, "ask_price": ask_price}, timestamp)
+            self.request_signal_evaluation(received_at)
+
+        print("✅ Tick data queued at {0} for {1}".format(self.clock.now(), f"BTC-{date_str}"))
+
+    # Updating options for generating IV curve
+    async def handle_markprice(self, curve_data: list, channel_info: Dict, received_at: float) -> None:
+        queued_rows = 0
+
+        for element in curve_data:
+            instrument_name = element.get('instrument_name', None)
+            timestamp = element.get('timestamp', None)
+            mark_price = element.get('mark_price', None)
+            mark_iv = element.get('iv', None)
+
+            if not instrument_name or not timestamp or not mark_price or not mark_iv:
+                continue
+            # Extract elements from instrument name; untracked expirations come back as None
+            strike_price, option_type, expiration_timestamp, date_str = self.instrument_cache.get(instrument_name)
+
+            if strike_price is None or expiration_timestamp is None:
+                continue
+
+            # **Filter Only Selected Expiration Dates**
+            if expiration_timestamp not in self.selected_expirations:
                 continue
 
+            underlying_price = self.latest_underlying_prices[f"BTC-{date_str}"]
+            if not underlying_price:
+                continue
+
+            if option_type == "call" and strike_price < underlying_price:
+                continue
+            if option_type == "put" and strike_price > underlying_price:
+                continue
+
+            log_moneyness = np.log(strike_price / underlying_price)
+
+            values = (
+                timestamp, instrument_name, underlying_price,
+                strike_price,
+                mark_price, mark_iv, expiration_timestamp, option_type, log_moneyness)
+            await self.db_writer.put(TICK_TABLE, values)
+            await self.queue_bars(self.bar_aggregator.update(
+                instrument_name, expiration_timestamp, option_type, timestamp, {"mark_iv": mark_iv}))
+            self.iv_curves[expiration_timestamp].update(strike_price, option_type, mark_iv, underlying_price, timestamp)
+            queued_rows += 1
+
+        print("✅ Curve data queued at {0}: {1} rows".format(self.clock.now(), queued_rows))
+
+    async def queue_bars(self, rows: list) -> None:
+        for row in rows:
+            await self.db_writer.put(BAR_TABLE, row)
+
+    # Close the bars of instruments that stopped ticking, so every bar is written shortly after it ends
+    async def close_stale_bars(self, interval: float = 1.0) -> None:
+        while True:
+            await self.clock.sleep(interval)
+            await self.queue_bars(self.bar_aggregator.close_stale(int(self.clock.time() * 1000)))
+
+    # Receive frames only; stamp the local receive time and hand them to the typed queues
+    async def receive_frames(self) -> None:
+        queues = {CONTROL: self.control_queue, MARKET: self.market_queue, PRIVATE: self.private_queue}
+        while self.websocket_client.state == websockets.protocol.State.OPEN:
+            try:
+                frame = await self.websocket_client.recv()
+            except websockets.exceptions.ConnectionClosed:
+                break
+            received_at = self.clock.time()
+            if isinstance(frame, bytes):
+                frame = frame.decode()
+            if self.recorder is not None:
+                self.recorder.record(received_at, frame)
+            await queues[classify_frame(frame)].put(received_at, frame)
+
+    # Worker draining one queue; yields after every frame so heartbeats and RPC responses are never starved
+    async def process_queue(self, queue: MonitoredQueue, handler) -> None:
+        while True:
+            received_at, frame = await queue.get()
+            await self.process_frame(queue, handler, received_at, frame)
+            await asyncio.sleep(0)
+
+    # Parse and dispatch one frame; shared by the queue workers and the replay driver
+    async def process_frame(self, queue: MonitoredQueue, handler, received_at: float, frame: str) -> None:
+        started = time.perf_counter()
+        try:
+            message = json.loads(frame)
+            parsed = time.perf_counter()
+            self.parse_latency[queue.name].observe(parsed - started)
+            await handler(message, received_at)
+            self.dispatch_latency[queue.name].observe(time.perf_counter() - parsed)
+        except Exception as e:
+            print(f"⚠️ Error processing {queue.name} message: {e}")
+        queue.processing_latency.observe(time.perf_counter() - started)
+
+    # RPC responses and heartbeats
+    async def handle_control_message(self, message: Dict, received_at: float) -> None:
+        if 'id' in list(message):
+            # Responses go to the request awaiting their id; unmatched ones are heartbeat acks or timed out
+            if not self.resolve_response(message):
+                logging.debug(f"Unmatched response: {message}")
+
+        elif 'method' in list(message):
+            # Respond to Heartbeat Message
+            if message['method'] == 'heartbeat':
+                await self.heartbeat_response()
+
+    # Market data subscriptions
+    async def handle_market_message(self, message: Dict, received_at: float) -> None:
+        logging.debug(f"Market Data Received: {message}")
+        channel = message["params"]["channel"]
+        data = message["params"]["data"]
+        self.observe_channel(channel, data, received_at)
+        # Single lookup in the routing table built from the current subscriptions
+        route = self.channel_routes.get(channel)
+        if route is None:
+            return
+        handler, channel_info = route
+        await handler(data, channel_info, received_at)
+
+    # Count a market message and its lag behind the exchange timestamp, per channel
+    def observe_channel(self, channel: str, data, received_at: float) -> None:
+        metrics = self.channel_metrics.get(channel)
+        if metrics is None:
+            metrics = self.channel_metrics[channel] = (
+                self.metrics.counter("messages_total", "Market messages received", channel=channel),
+                self.metrics.histogram("exchange_lag_seconds", "Exchange timestamp to local receive", channel=channel))
+        counter, lag = metrics
+        counter.inc()
+        # markprice payloads carry one timestamp per instrument, all from the same snapshot
+        sample = data[0] if isinstance(data, list) and data else data
+        timestamp = sample.get("timestamp") if isinstance(sample, dict) else None
+        if timestamp:
+            lag.observe(max(received_at - timestamp / 1000, 0.0))
+
+    # Private `user.*` subscriptions
+    async def handle_private_message(self, message: Dict, received_at: float) -> None:
+        logging.info(f"Private event: {message}")
+
+    def pipeline_stats(self) -> dict:
+        return {
+            "control": self.control_queue.stats(),
+            "market": self.market_queue.stats(),
+            "private": self.private_queue.stats(),
+            "db_writer": self.db_writer.stats(),
+            "open_bars": len(self.bar_aggregator.open_bars),
+            "late_bar_ticks": self.bar_aggregator.late_ticks,
+            "signal_latency": self.signal_latency.summary(),
+            "parse": self.parse_latency[MARKET].summary(),
+            "dispatch": self.dispatch_latency[MARKET].summary(),
+            "spline_fit": self.spline_fit_latency.summary(),
+            "signal_to_order": self.signal_to_order.summary(),
+            "messages_by_channel": {channel: counter.total for channel, (counter, _) in self.channel_metrics.items()},
+        }
+
+    # One line per stage: count, p50 and p99 in milliseconds
+    def stage_summary(self) -> str:
+        def stage(name: str, histogram: LatencyHistogram) -> str:
+            summary = histogram.summary()
+            if not summary["count"]:
+                return f"{name} -"
+            return f"{name} n={summary['count']} p50={summary['p50'] * 1e3:.2f}ms p99={summary['p99'] * 1e3:.2f}ms"
+
+        lag = LatencyHistogram.merge(channel_lag for _, channel_lag in self.channel_metrics.values())
+        orders = LatencyHistogram.merge(self.metrics.histogram("rpc_round_trip_seconds", method=method)
+                                        for method in ORDER_METHODS)
+        return " | ".join([
+            f"market frames {self.market_queue.processing_latency.count} (dropped {self.market_queue.dropped})",
+            stage("lag", lag),
+            stage("parse", self.parse_latency[MARKET]),
+            stage("dispatch", self.dispatch_latency[MARKET]),
+            stage("db write", self.db_writer.flush_latency),
+            stage("spline fit", self.spline_fit_latency),
+            stage("tick-to-decision", self.signal_latency),
+            stage("signal-to-order", self.signal_to_order),
+            stage("order round-trip", orders),
+        ])
+
+    async def log_pipeline_stats(self, interval: float = 60.0) -> None:
+        while True:
+            await self.clock.sleep(interval)
+            logging.info(f"Pipeline: {self.stage_summary()}")
+
     # Manage websocket; receiving data and save
     async def ws_manager(self) -> None:
         async with (websockets.connect(self.ws_connection_url, ping_interval=None, compression=None, close_timeout=60)
                     as self.websocket_client):
 
+            receiver = self.loop.create_task(self.receive_frames())
+            workers = [
+                self.loop.create_task(self.process_queue(self.control_queue, self.handle_control_message)),
+                self.loop.create_task(self.process_queue(self.market_queue, self.handle_market_message)),
+                self.loop.create_task(self.process_queue(self.private_queue, self.handle_private_message)),
+            ]
+
             # Authenticate WebSocket Connection
             await self.ws_auth()
 
@@ -827,221 +1212,18 @@ class Strategy_RR(WebSocketClient):
 
             await self.ws_subscribe(operation='subscribe', ws_channel=self.selected_expirations_subscribe)
 
-            while self.websocket_client.state == websockets.protocol.State.OPEN:
-                message: bytes = await self.websocket_client.recv()
-                message: Dict = json.loads(message)
-
-                if 'id' in list(message):
-                    if message['id'] == 9929:
-                        if self.refresh_token is None:
-                            if message.get("result") is not None:
-                                logging.info('Successfully authenticated WebSocket Connection')
-                                logging.info(message)
-                            else:
-                                logging.info('Failed to authenticate WebSocket Connection')
-                                logging.info(message)
-                                sys.exit(1)
-                        else:
-                            logging.info('Successfully refreshed the authentication of the WebSocket Connection')
-                        self.access_token = message['result']['access_token']
-                        self.refresh_token = message['result']['refresh_token']
-
-                        # Refresh Authentication well before the required datetime
-                        if message['testnet']:
-                            expires_in: int = 300
-                        else:
-                            expires_in: int = message['result']['expires_in'] - 240
-
-                        self.refresh_token_expiry_time = datetime.now() + timedelta(seconds=expires_in)
-
-                    elif message['id'] == 8212:
-                        # Avoid logging Heartbeat messages
-                        continue
-
-                    elif message['id'] == 1005:
-                        logging.info(f"Result of Simulation: {message}")
-                        if message['result'] is not None:
-                            self.portfolio_status = message
-
-                    elif message['id'] == 1006:
-                        logging.info(f"Position: {message}")
-                        if message['result'] is not None:
-                            self.portfolio_position = message["result"]
-
-                    elif message['id'] == 1001:
-                        logging.info(f"Result of executes: {message}")
-                        if message['result']["order"]["label"] == f"{self.trade_time}":
-                            amount = 0
-                            weighted_price = 0
-                            profit_loss = 0
-                            contracts = 0
-                            fee = 0
-                            for i in range(len(message["result"]["trades"])):
-                                state = message["result"]["trades"][i]["state"]
-                                amount += message["result"]["trades"][i]["amount"]
-                                weighted_price += message["result"]["trades"][i]["price"] * \
-                                                  message["result"]["trades"][i]["amount"]
-                                direction = message["result"]["trades"][i]["direction"]
-                                instrument_name = message["result"]["trades"][i]["instrument_name"]
-                                profit_loss += message["result"]["trades"][i]["profit_loss"]
-                                contracts += message["result"]["trades"][i]["contracts"]
-                                fee += message["result"]["trades"][i]["fee"]
-
-                            average_price = weighted_price / amount
-
-                            await self.trade_alarm(
-                                f"{state}: {direction} {instrument_name} {contracts} at {self.trade_time}.\n"
-                                f" Average price:{average_price}\n"
-                                f" pnl:{profit_loss}")
-                            print("✅ Trades data inserted at {0} for {1}".format(datetime.now(), instrument_name))
-
-                    elif message['id'] == 1007:
-                        logging.info(f"Account summary: {message}")
-                        if message['result'] is not None:
-                            if message["result"]['margin_balance'] < message["result"]['maintenance_margin'] * 1.1:
-                                await self.close_position(instrument_name = "BTC-{0}-{1}-C".format(
-                                    self.expirations_pair[self.selected_expirations[1]],
-                                    self.otm_call[
-                                        f"BTC-{self.expirations_pair[self.selected_expirations[1]]}"][0]))
-                                await self.close_position(instrument_name="BTC-{0}-{1}-C".format(
-                                    self.expirations_pair[self.selected_expirations[1]],
-                                    self.otm_put[
-                                        f"BTC-{self.expirations_pair[self.selected_expirations[1]]}"][0]))
-                                await self.close_position(instrument_name="BTC-{0}-{1}-C".format(
-                                    self.expirations_pair[self.selected_expirations[0]],
-                                    self.otm_call[
-                                        f"BTC-{self.expirations_pair[self.selected_expirations[0]]}"][0]))
-                                await self.close_position(instrument_name="BTC-{0}-{1}-C".format(
-                                    self.expirations_pair[self.selected_expirations[0]],
-                                    self.otm_put[
-                                        f"BTC-{self.expirations_pair[self.selected_expirations[0]]}"][0]))
-
-                                print("Trades are closed.")
-
-                elif 'method' in list(message):
-                    # Respond to Heartbeat Message
-                    if message['method'] == 'heartbeat':
-                        await self.heartbeat_response()
-
-                    elif message['method'] == 'subscription':
-                        logging.debug(f"Market Data Received: {message}")
-                        channel = message["params"]["channel"]
-
-                        for date in self.selected_expirations_raw:
-                            # Updating BTC price
-                            if channel == f"ticker.BTC-{date}.100ms":
-                                self.latest_underlying_prices[f"BTC-{date}"] = message["params"]["data"].get(
-                                    "mark_price", None)
-                                print("🔹 Updated BTC Future Price For {0}: {1}".format(date,
-                                                                                       self.latest_underlying_prices[
-                                                                                           f"BTC-{date}"]))
-
-                            if channel == "ticker.BTC-PERPETUAL.100ms":
-                                if date in self.perpetual_expirations_raw:
-                                    self.latest_underlying_prices[f"BTC-{date}"] = message["params"]["data"].get(
-                                        "mark_price", None)
-                                    print("🔹 Updated BTC Future Price For {0}: {1}".format(date,
-                                                                                           self.latest_underlying_prices[
-                                                                                               f"BTC-{date}"]))
-                            # Updating options for calculating spread
-                            if bool(re.match(fr"^ticker\.BTC-{date}-(\d+)-([CP])\.100ms", channel)):
-                                option_data = message["params"]["data"]
-                                logging.debug(option_data)
-
-                                timestamp = option_data.get('timestamp', None)
-                                instrument_name = option_data.get('instrument_name', None)
-                                bid_price = option_data.get('best_bid_price', None)
-                                ask_price = option_data.get('best_ask_price', None)
-                                bid_iv = option_data.get('bid_iv', None)
-                                ask_iv = option_data.get('ask_iv', None)
-                                delta = option_data['greeks'].get('delta', None)
-                                vega = option_data['greeks'].get('vega', None)
-                                theta = option_data['greeks'].get('theta', None)
-
-                                strike_price, option_type, expiration_timestamp, date_str = self.extract_strike_price_type_expiration(
-                                    instrument_name)
-
-                                if strike_price is None or expiration_timestamp is None:
-                                    continue
-
-                                if option_type == "call" and strike_price < self.latest_underlying_prices[
-                                    f"BTC-{date_str}"]:
-                                    continue
-                                if option_type == "put" and strike_price > self.latest_underlying_prices[
-                                    f"BTC-{date_str}"]:
-                                    continue
-
-                                log_moneyness = np.log(strike_price / self.latest_underlying_prices[f"BTC-{date_str}"])
-
-                                # Storing through SQL
-                                sql = """INSERT INTO btc_options_raw (timestamp, instrument_name, expiration_timestamp, option_type,
-                                                                         bid_price, ask_price, bid_iv, ask_iv, 
-                                                                         underlying_price, strike_price, log_moneyness,
-                                                                         delta, vega, theta) 
-                                              VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"""
-                                values = (timestamp, instrument_name, expiration_timestamp, option_type,
-                                          bid_price, ask_price, bid_iv, ask_iv,
-                                          self.latest_underlying_prices[f"BTC-{date_str}"],
-                                          strike_price, log_moneyness,
-                                          delta, vega, theta)
-                                cursor.execute(sql, values)
-                                conn.commit()
-
-                                print("✅ Tick data inserted at {0} for {1}".format(datetime.now(), f"BTC-{date_str}"))
-
-                            # Updating options for generating IV curve
-                            if channel == 'markprice.options.btc_usd':
-                                curve_data = message["params"]["data"]
-
-                                for element in curve_data:
-                                    instrument_name = element.get('instrument_name', None)
-                                    timestamp = element.get('timestamp', None)
-                                    mark_price = element.get('mark_price', None)
-                                    mark_iv = element.get('iv', None)
-
-                                    if not instrument_name or not timestamp or not mark_price or not mark_iv:
-                                        continue
-                                    # Extract elements from instrument name
-                                    strike_price, option_type, expiration_timestamp, date_str = self.extract_strike_price_type_expiration(
-                                        instrument_name)
-
-                                    if strike_price is None or expiration_timestamp is None:
-                                        continue
-
-                                    # **Filter Only Selected Expiration Dates**
-                                    if expiration_timestamp not in self.selected_expirations:
-                                        continue
-
-                                    if self.latest_underlying_prices[f"BTC-{date_str}"] is None:
-                                        continue
-
-                                    if option_type == "call" and strike_price < self.latest_underlying_prices[
-                                        f"BTC-{date_str}"]:
-                                        continue
-                                    if option_type == "put" and strike_price > self.latest_underlying_prices[
-                                        f"BTC-{date_str}"]:
-                                        continue
-
-                                    log_moneyness = np.log(
-                                        strike_price / self.latest_underlying_prices[f"BTC-{date_str}"])
-
-                                    sql = """INSERT INTO btc_options_tick (timestamp, instrument_name, underlying_price, strike_price, 
-                                                                                mid_price, mark_iv, expiration_timestamp, option_type, log_moneyness) 
-                                                  VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)"""
-                                    values = (
-                                        timestamp, instrument_name, self.latest_underlying_prices[f"BTC-{date_str}"],
-                                        strike_price,
-                                        mark_price, mark_iv, expiration_timestamp, option_type, log_moneyness)
-                                    cursor.execute(sql, values)
-                                    conn.commit()
-
-                                    print(
-                                        "✅ Curve data inserted at {0} for {1}".format(datetime.now(),
-                                                                                      f"BTC-{date_str}"))
+            await receiver
+            for worker in workers:
+                worker.cancel()
 
-            else:
-                logging.info('WebSocket connection has broken.')
-                sys.exit(1)
+            logging.info('WebSocket connection has broken.')
+            await self.queue_bars(self.bar_aggregator.close_all())
+            await self.db_writer.drain()
+            self.storage_executor.shutdown()
+            self.storage.close()
+            if self.recorder is not None:
+                self.recorder.close()
+            sys.exit(1)
 
     # **1. Start Command**
     async def telegram_start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -1072,11 +1254,15 @@ class Strategy_RR(WebSocketClient):
                 return
 
             if direction == 'buy':
-                await self.place_order_buy(instrument, amount, price)
-            elif direction == 'sell':
-                await self.place_order_sell(instrument, amount, price)
+                result = await self.place_order_buy(instrument, amount, price)
+            else:
+                result = await self.place_order_sell(instrument, amount, price)
+
+            if result.get('result') is None:
+                await update.message.reply_text(f"⚠️ Order rejected: {result.get('error')}")
+                return
 
-            await update.message.reply_text("✅ Order placed!")
+            await update.message.reply_text(f"✅ Order placed! State: {result['result']['order']['order_state']}")
 
         except Exception as e:
             await update.message.reply_text(f"⚠️ Error: {str(e)}")
@@ -1090,7 +1276,10 @@ class Strategy_RR(WebSocketClient):
                 return
 
             order_id = args[0]
-            await self.cancel_order(order_id)
+            result = await self.cancel_order(order_id)
+            if result.get('result') is None:
+                await update.message.reply_text(f"⚠️ Cancel rejected: {result.get('error')}")
+                return
             await update.message.reply_text("❌ Order Canceled")
 
         except Exception as e:
@@ -1125,6 +1314,9 @@ class Strategy_RR(WebSocketClient):
         await update.message.reply_text(f"⚙️ Risk Reversal is now {'ENABLED' if enabled else 'DISABLED'}.")
 
     async def trade_alarm(self, message: str) -> None:
+        if self.bot is None:
+            logging.info(message)
+            return
         try:
             await self.bot.send_message(self.chat_id, text=message)
         except Exception as e:
@@ -1157,14 +1349,12 @@ if __name__ == "__main__":
         datefmt='%Y-%m-%d %H:%M:%S'
         )
 
-    # Connect to MySQL**
-    conn = mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="1234",
-        database="btc_options_db"
-    )
-    cursor = conn.cursor()
+    # Storage backend from STORAGE_URL (MySQL by default; sqlite:// or memmap:// need no server)
+    storage = open_storage()
+
+    # Journal every received frame when FRAME_JOURNAL_DIR is set
+    journal_dir = os.environ.get("FRAME_JOURNAL_DIR")
+    recorder = FrameRecorder(journal_dir) if journal_dir else None
 
     # Load the client ID and private key from the PEM file
     with open('key/client_id.txt', 'r') as f:
@@ -1173,7 +1363,14 @@ if __name__ == "__main__":
     with open('key/private.pem', 'rb') as private_pem:
         private_key = serialization.load_pem_private_key(private_pem.read(), password=None)
 
-    ws_url = "wss://www.deribit.com/ws/api/v2"
+    # DERIBIT_WS_URL points the runner elsewhere, e.g. testnet or deribit_stub.py
+    ws_url = os.environ.get("DERIBIT_WS_URL", "wss://www.deribit.com/ws/api/v2")
+
+    # Prometheus metrics on http://127.0.0.1:METRICS_PORT/metrics; METRICS_PORT=0 turns them off
+    metrics_port = int(os.environ.get("METRICS_PORT", "9108"))
+
+    # Statistic of the monitored spread band: std (default), ewma or quantile
+    band_kind = os.environ.get("SPREAD_BAND", "std")
 
     # Telegram bot token
     with open('key/bot_token.txt', 'r') as f:
@@ -1186,4 +1383,5 @@ if __name__ == "__main__":
             raise ValueError("chat_id.txt must contain a valid integer.")
 
     # Initialization
-    test = Strategy_RR(ws_url, client_id, private_key, bot_token=bot_token, chat_id = chat_id)
+    test = Strategy_RR(ws_url, client_id, private_key, bot_token=bot_token, chat_id = chat_id, storage=storage,
+                       recorder=recorder, metrics_port=metrics_port, band_kind=band_kind)
@@ -0,0 +1,70 @@
+import asyncio
+import re
+
+from clock import Clock
+from metrics import LatencyHistogram
+
+CONTROL = "control"
+MARKET = "market"
+PRIVATE = "private"
+
+FRAME_METHOD_PATTERN = re.compile(r'"method"\s*:\s*"([a-z_/]+)"')
+PRIVATE_CHANNEL_PATTERN = re.compile(r'"channel"\s*:\s*"user\.')
+
+
+# Sort a raw frame into control (RPC responses, heartbeats), market or private without decoding the JSON
+def classify_frame(frame: str) -> str:
+    head = frame[:256]
+    match = FRAME_METHOD_PATTERN.search(head)
+    if match and match.group(1) == "subscription":
+        return PRIVATE if PRIVATE_CHANNEL_PATTERN.search(head) else MARKET
+    return CONTROL
+
+
+class MonitoredQueue:
+    """
+    asyncio.Queue of (receive_time, frame) items that records depth, time spent
+    waiting in the queue and handler processing time.
+    With `drop_oldest`, a full queue discards its oldest frame instead of
+    blocking the receiver. Receive times come from `clock`, which also times the wait.
+    """
+    def __init__(self, name: str, maxsize: int = 0, drop_oldest: bool = False, clock: Clock = None) -> None:
+        self.name: str = name
+        self.clock = clock or Clock()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.drop_oldest: bool = drop_oldest
+        self.wait_latency = LatencyHistogram()
+        self.processing_latency = LatencyHistogram()
+        self.max_depth: int = 0
+        self.dropped: int = 0
+
+    async def put(self, received_at: float, frame: str) -> None:
+        if self.drop_oldest and self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        await self.queue.put((received_at, frame))
+        depth = self.queue.qsize()
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    async def get(self) -> tuple:
+        received_at, frame = await self.queue.get()
+        self.wait_latency.observe(self.clock.time() - received_at)
+        return received_at, frame
+
+    def qsize(self) -> int:
+        return self.queue.qsize()
+
+    def stats(self) -> dict:
+        wait = self.wait_latency.summary()
+        processing = self.processing_latency.summary()
+        return {
+            "depth": self.queue.qsize(),
+            "max_depth": self.max_depth,
+            "dropped": self.dropped,
+            "processed": processing["count"],
+            "wait_p50": wait["p50"],
+            "wait_p99": wait["p99"],
+            "processing_p50": processing["p50"],
+            "processing_p99": processing["p99"],
+        }